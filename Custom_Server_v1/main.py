@@ -1,12 +1,16 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Header, status
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response
 from pydantic import BaseModel
 from typing import List, Optional
+from cache import TTLCache, AUTH_CACHE_SIZE, AUTH_CACHE_TTL, CATALOG_CACHE_TTL
 import sqlite3
 import hashlib
-import os
+import hmac
+import json
+import secrets
+import threading
 
 app = FastAPI(title="Simple Marketplace")
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -92,7 +96,27 @@ def hash_password(password: str) -> str:
     return hashlib.sha256(password.encode()).hexdigest()
 
 
+# Кэш проверенных учетных данных (LRU + TTL). Ключ - HMAC от логина и пароля,
+# пароли в памяти не хранятся
+credential_cache = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+credential_secret = secrets.token_bytes(32)
+
+
+def credentials_digest(username: str, password: str) -> bytes:
+    return hmac.new(credential_secret, username.encode() + b"\0" + password.encode(), hashlib.sha256).digest()
+
+
+# Вызывать при регистрации, удалении пользователя или смене роли
+def invalidate_user(username: str):
+    credential_cache.invalidate_where(lambda user: user.username == username)
+
+
 def get_current_user(credentials: HTTPBasicCredentials = Depends(security)):
+    cache_key = credentials_digest(credentials.username, credentials.password)
+    cached_user = credential_cache.get(cache_key)
+    if cached_user is not None:
+        return cached_user
+
     conn = sqlite3.connect('marketplace.db')
     cursor = conn.cursor()
 
@@ -107,7 +131,9 @@ def get_current_user(credentials: HTTPBasicCredentials = Depends(security)):
             detail="Неверные учетные данные"
         )
 
-    return User(id=user[0], username=user[1], role=user[2])
+    current_user = User(id=user[0], username=user[1], role=user[2])
+    credential_cache.set(cache_key, current_user)
+    return current_user
 
 
 # API endpoints
@@ -120,6 +146,7 @@ def register(username: str, password: str, role: str = "customer"):
         cursor.execute("INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
                        (username, hash_password(password), role))
         conn.commit()
+        invalidate_user(username)
         return {"message": "Пользователь создан"}
     except sqlite3.IntegrityError:
         raise HTTPException(status_code=400, detail="Пользователь уже существует")
@@ -127,15 +154,47 @@ def register(username: str, password: str, role: str = "customer"):
         conn.close()
 
 
+# Кэш каталога: готовый JSON списка товаров и его ETag, сбрасывается при добавлении товара
+catalog_cache = TTLCache(1, CATALOG_CACHE_TTL)
+catalog_generation = 0
+catalog_lock = threading.Lock()
+
+
+def store_catalog(body: bytes, generation: int) -> tuple:
+    etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+    with catalog_lock:
+        # Список, прочитанный до добавления товара, не сохраняем
+        if generation == catalog_generation:
+            catalog_cache.set("products", (body, etag))
+    return body, etag
+
+
+def invalidate_catalog():
+    global catalog_generation
+    with catalog_lock:
+        catalog_generation += 1
+        catalog_cache.clear()
+
+
 @app.get("/products", response_model=List[Product])
-def get_products():
-    conn = sqlite3.connect('marketplace.db')
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, name, price, seller_id, description FROM products")
-    products = [Product(id=row[0], name=row[1], price=row[2], seller_id=row[3], description=row[4])
-                for row in cursor.fetchall()]
-    conn.close()
-    return products
+def get_products(if_none_match: Optional[str] = Header(None)):
+    cached = catalog_cache.get("products")
+    if cached is None:
+        generation = catalog_generation
+        conn = sqlite3.connect('marketplace.db')
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, name, price, seller_id, description FROM products")
+        products = [Product(id=row[0], name=row[1], price=row[2], seller_id=row[3], description=row[4])
+                    for row in cursor.fetchall()]
+        conn.close()
+        body = json.dumps([product.model_dump() for product in products], ensure_ascii=False).encode()
+        cached = store_catalog(body, generation)
+
+    body, etag = cached
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match and etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 @app.post("/products")
@@ -149,6 +208,7 @@ def create_product(name: str, price: float, description: str, user: User = Depen
                    (name, price, user.id, description))
     conn.commit()
     conn.close()
+    invalidate_catalog()
     return {"message": "Товар добавлен"}
 
 
@@ -182,6 +242,14 @@ def get_my_orders(user: User = Depends(get_current_user)):
     return orders
 
 
+@app.get("/stats")
+def get_stats(user: User = Depends(get_current_user)):
+    # Внутренности кэшей - только администратору
+    if user.role != "admin":
+        raise HTTPException(status_code=403, detail="Только для администратора")
+    return {"auth_cache": credential_cache.stats(), "catalog_cache": catalog_cache.stats()}
+
+
 @app.get("/")
 def read_root():
     with open("static/index.html", "r", encoding="utf-8") as f:
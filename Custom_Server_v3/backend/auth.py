@@ -1,25 +1,48 @@
+import hmac
+import hashlib
+import secrets
 import sqlite3
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from models import User, UserCreate
-from database import Database
+from database import db, async_db
+from cache import TTLCache, AUTH_CACHE_SIZE, AUTH_CACHE_TTL
 
 security = HTTPBasic()
-db = Database()
 
 
 class AuthService:
     def __init__(self):
         self.db = db
+        # Кэш проверенных учетных данных: ключ - HMAC от логина и пароля,
+        # поэтому пароли в открытом виде в памяти не хранятся
+        self.credentials_cache = TTLCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+        self._cache_key = secrets.token_bytes(32)
+
+    def _credentials_digest(self, username: str, password: str) -> bytes:
+        message = username.encode() + b"\0" + password.encode()
+        return hmac.new(self._cache_key, message, hashlib.sha256).digest()
 
     def get_current_user(self, credentials: HTTPBasicCredentials = Depends(security)) -> User:
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
+        cache_key = self._credentials_digest(credentials.username, credentials.password)
+        user = self.credentials_cache.get(cache_key)
+        if user is not None:
+            return user
+        return self._load_user(cache_key, credentials)
+
+    async def get_current_user_async(self, credentials: HTTPBasicCredentials = Depends(security)) -> User:
+        # Попадание в кэш обслуживается прямо в event loop, промах - в потоке БД
+        cache_key = self._credentials_digest(credentials.username, credentials.password)
+        user = self.credentials_cache.get(cache_key)
+        if user is not None:
+            return user
+        return await async_db.run(self._load_user, cache_key, credentials)
 
-        cursor.execute("SELECT id, username, role FROM users WHERE username = ? AND password = ?",
-                       (credentials.username, self.db.hash_password(credentials.password)))
-        user_data = cursor.fetchone()
-        conn.close()
+    def _load_user(self, cache_key: bytes, credentials: HTTPBasicCredentials) -> User:
+        with self.db.connection() as conn:
+            cursor = conn.execute("SELECT id, username, role FROM users WHERE username = ? AND password = ?",
+                                  (credentials.username, self.db.hash_password(credentials.password)))
+            user_data = cursor.fetchone()
 
         if not user_data:
             raise HTTPException(
@@ -27,21 +50,36 @@ class AuthService:
                 detail="Неверные учетные данные"
             )
 
-        return User(id=user_data[0], username=user_data[1], role=user_data[2])
+        user = User(id=user_data[0], username=user_data[1], role=user_data[2])
+        self.credentials_cache.set(cache_key, user)
+        return user
 
     def register_user(self, user_data: UserCreate) -> dict:
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-
         try:
-            cursor.execute("INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
-                           (user_data.username, self.db.hash_password(user_data.password), user_data.role))
-            conn.commit()
-            return {"message": "Пользователь создан"}
+            with self.db.connection() as conn:
+                conn.execute("INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
+                             (user_data.username, self.db.hash_password(user_data.password), user_data.role))
         except sqlite3.IntegrityError:
             raise HTTPException(status_code=400, detail="Пользователь уже существует")
-        finally:
-            conn.close()
+
+        self.invalidate_user(user_data.username)
+        return {"message": "Пользователь создан"}
+
+    async def register_user_async(self, user_data: UserCreate) -> dict:
+        return await async_db.run(self.register_user, user_data)
+
+    # ИНВАЛИДАЦИЯ: вызывать при удалении пользователя, смене роли или пароля
+    def invalidate_user(self, username: str) -> int:
+        return self.credentials_cache.invalidate_where(lambda user: user.username == username)
+
+    def invalidate_user_id(self, user_id: int) -> int:
+        return self.credentials_cache.invalidate_where(lambda user: user.id == user_id)
+
+    def invalidate_all(self):
+        self.credentials_cache.clear()
+
+    def cache_stats(self) -> dict:
+        return self.credentials_cache.stats()
 
 
 auth_service = AuthService()
@@ -0,0 +1,73 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", 10000))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", 300))
+
+# Кэш каталога: число закэшированных страниц, TTL (страховка для нескольких
+# процессов uvicorn, где инвалидация видна только своему процессу) и предел
+# размера одного ответа - более крупные ответы отдаются потоком без кэша
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", 256))
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", 30))
+CATALOG_CACHE_MAX_BYTES = int(os.getenv("CATALOG_CACHE_MAX_BYTES", 8 * 1024 * 1024))
+
+
+class TTLCache:
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            # Вытесняем самые давно использованные записи
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Any], bool]) -> int:
+        with self._lock:
+            stale = [key for key, (_, value) in self._data.items() if predicate(value)]
+            for key in stale:
+                del self._data[key]
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
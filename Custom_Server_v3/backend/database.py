@@ -1,58 +1,280 @@
+import asyncio
 import sqlite3
 import hashlib
+import functools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# Настройки пула можно переопределить через переменные окружения
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 16))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 5.0))
+DB_STATEMENT_CACHE = int(os.getenv("DB_STATEMENT_CACHE", 256))
+# Потоки отдельного исполнителя для async-эндпоинтов: не больше, чем соединений в пуле
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", DB_POOL_SIZE))
+# NORMAL в режиме WAL не делает fsync на каждый коммит; FULL - максимальная надёжность
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL")
+
+# PRAGMA применяются к каждому новому соединению пула
+CONNECTION_PRAGMAS = (
+    "PRAGMA foreign_keys = ON",
+    f"PRAGMA synchronous = {DB_SYNCHRONOUS}",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+)
+
+# STRICT-таблицы поддерживаются начиная с SQLite 3.37
+STRICT = " STRICT" if sqlite3.sqlite_version_info >= (3, 37, 0) else ""
+
+
+def _migration_initial_schema(conn: sqlite3.Connection):
+    # Таблица пользователей
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE,
+            password TEXT,
+            role TEXT
+        )
+    ''')
+
+    # Таблица товаров
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            price REAL,
+            seller_id INTEGER,
+            description TEXT
+        )
+    ''')
+
+    # Таблица заказов
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            product_id INTEGER,
+            status TEXT
+        )
+    ''')
+
+
+def _migration_foreign_keys(conn: sqlite3.Connection):
+    # SQLite не умеет ALTER TABLE ADD FOREIGN KEY - пересобираем таблицы.
+    # id остаются rowid-ключами: WITHOUT ROWID несовместим с AUTOINCREMENT,
+    # а для целочисленного ключа был бы только медленнее
+    conn.execute(f'''
+        CREATE TABLE products_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            price REAL,
+            seller_id INTEGER REFERENCES users (id),
+            description TEXT
+        ){STRICT}
+    ''')
+    conn.execute("INSERT INTO products_new SELECT id, name, price, seller_id, description FROM products")
+    conn.execute("DROP TABLE products")
+    conn.execute("ALTER TABLE products_new RENAME TO products")
+
+    conn.execute(f'''
+        CREATE TABLE orders_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            product_id INTEGER NOT NULL REFERENCES products (id),
+            status TEXT
+        ){STRICT}
+    ''')
+    conn.execute("INSERT INTO orders_new SELECT id, user_id, product_id, status FROM orders")
+    conn.execute("DROP TABLE orders")
+    conn.execute("ALTER TABLE orders_new RENAME TO orders")
+
+
+def _migration_indexes(conn: sqlite3.Connection):
+    # Покрывающий индекс (id входит в него как rowid): /my-orders читается
+    # только из индекса, без обращения к таблице
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_user ON orders (user_id, product_id, status)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_product ON orders (product_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_products_seller ON products (seller_id)")
+
+
+# Порядок важен: новые миграции добавляются только в конец списка
+MIGRATIONS = (
+    (1, "initial schema", _migration_initial_schema),
+    (2, "foreign keys and strict tables", _migration_foreign_keys),
+    (3, "orders and products indexes", _migration_indexes),
+)
+
+
+class ConnectionPool:
+    def __init__(self, db_name: str, max_size: int = DB_POOL_SIZE, timeout: float = DB_POOL_TIMEOUT,
+                 cached_statements: int = DB_STATEMENT_CACHE):
+        self.db_name = db_name
+        self.max_size = max_size
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+
+        # LIFO: поток чаще получает "тёплое" соединение с заполненным кэшем
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_name,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        with self._lock:
+            self._created += 1
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No free database connection after {self.timeout}s")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            conn.close()
+        else:
+            self._idle.put(conn)
+        self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        # Повторный вход из того же потока использует уже выданное соединение
+        local = self._local
+        if getattr(local, "depth", 0):
+            local.depth += 1
+            try:
+                yield local.conn
+            finally:
+                local.depth -= 1
+            return
+
+        conn = self.acquire()
+        local.conn, local.depth = conn, 1
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except BaseException:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            local.conn, local.depth = None, 0
+            self.release(conn)
+
+    def stats(self) -> dict:
+        idle = self._idle.qsize()
+        return {
+            "max_size": self.max_size,
+            "created": self._created,
+            "idle": idle,
+            "in_use": self._created - idle,
+        }
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
 
 
 class Database:
-    def __init__(self, db_name='marketplace.db'):
+    def __init__(self, db_name='marketplace.db', pool_size: int = DB_POOL_SIZE):
         self.db_name = db_name
         self.init_db()
+        self.pool = ConnectionPool(db_name, max_size=pool_size)
 
     def get_connection(self):
+        # Одиночное соединение без пула (инициализация схемы, утилиты)
         return sqlite3.connect(self.db_name)
 
+    def connection(self):
+        # Соединение из пула: коммит при успешном выходе, откат при исключении
+        return self.pool.connection()
+
     def init_db(self):
         conn = self.get_connection()
-        cursor = conn.cursor()
-
-        # Таблица пользователей
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE,
-                password TEXT,
-                role TEXT
-            )
-        ''')
+        # Миграции сами управляют транзакциями
+        conn.isolation_level = None
 
-        # Таблица товаров
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT,
-                price REAL,
-                seller_id INTEGER,
-                description TEXT
-            )
-        ''')
-
-        # Таблица заказов
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS orders (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                product_id INTEGER,
-                status TEXT
-            )
-        ''')
+        # WAL сохраняется в файле БД: читатели не блокируют писателя
+        conn.execute("PRAGMA journal_mode = WAL")
+        self.migrate(conn)
 
         # ДАННЫЕ ДЛЯ ТЕСТОВ
-        cursor.execute("SELECT COUNT(*) FROM users")
-        if cursor.fetchone()[0] == 0:
-            self._create_test_data(cursor)
+        if conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0:
+            conn.execute("BEGIN")
+            self._create_test_data(conn.cursor())
+            conn.execute("COMMIT")
 
-        conn.commit()
         conn.close()
 
+    def migrate(self, conn: sqlite3.Connection) -> int:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        current = conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+        # Пересборка таблиц требует отключенных внешних ключей (вне транзакции)
+        conn.execute("PRAGMA foreign_keys = OFF")
+        try:
+            for version, name, migration in MIGRATIONS:
+                if version <= current:
+                    continue
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    migration(conn)
+                    # Пока внешние ключи отключены, пересборка перенесёт осиротевшие строки молча:
+                    # проверяем их до COMMIT, при нарушениях миграция откатывается
+                    violations = conn.execute("PRAGMA foreign_key_check").fetchall()
+                    if violations:
+                        examples = ", ".join(f"{table}.rowid={rowid} -> {parent}"
+                                             for table, rowid, parent, _ in violations[:5])
+                        raise sqlite3.IntegrityError(
+                            f"Migration {version} ({name}): {len(violations)} foreign key violations ({examples})")
+                    conn.execute("INSERT INTO schema_version (version, name) VALUES (?, ?)", (version, name))
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+                current = version
+        finally:
+            conn.execute("PRAGMA foreign_keys = ON")
+        return current
+
     def _create_test_data(self, cursor):
         cursor.execute("INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
                        ("admin", self.hash_password("admin"), "admin"))
@@ -68,4 +290,53 @@ class Database:
 
     @staticmethod
     def hash_password(password: str) -> str:
-        return hashlib.sha256(password.encode()).hexdigest()
\ No newline at end of file
+        return hashlib.sha256(password.encode()).hexdigest()
+
+
+db = Database()
+
+
+class AsyncDatabase:
+    # Асинхронный доступ к БД: блокирующие вызовы sqlite3 выполняются в отдельном
+    # пуле потоков, а не в общем threadpool Starlette, и не блокируют event loop
+    def __init__(self, database: Database, workers: int = DB_EXECUTOR_WORKERS):
+        self.db = database
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db")
+        # Вызывается из event loop с длительностью каждого обращения к БД (метрики запроса)
+        self.on_query = None
+
+    async def run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+        finally:
+            if self.on_query is not None:
+                self.on_query(time.perf_counter() - started)
+
+    def _execute(self, query: str, params: tuple) -> int:
+        with self.db.connection() as conn:
+            return conn.execute(query, params).rowcount
+
+    def _fetch_one(self, query: str, params: tuple):
+        with self.db.connection() as conn:
+            return conn.execute(query, params).fetchone()
+
+    def _fetch_all(self, query: str, params: tuple) -> list:
+        with self.db.connection() as conn:
+            return conn.execute(query, params).fetchall()
+
+    async def execute(self, query: str, params: tuple = ()) -> int:
+        return await self.run(self._execute, query, params)
+
+    async def fetch_one(self, query: str, params: tuple = ()):
+        return await self.run(self._fetch_one, query, params)
+
+    async def fetch_all(self, query: str, params: tuple = ()) -> list:
+        return await self.run(self._fetch_all, query, params)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+async_db = AsyncDatabase(db)
@@ -1,10 +1,14 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Header, Query, Response
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
+from typing import Optional
+from contextlib import asynccontextmanager
 from models import User, UserCreate
 from auth import auth_service
 from products import product_service
 from orders import order_service
+from database import db, async_db
+from metrics import MetricsMiddleware, metrics_registry, instrument_database
 from pathlib import Path
 import os
 
@@ -16,12 +20,26 @@ PORT = int(os.getenv("PORT", 8000))
 BASE_DIR = Path(__file__).parent.parent
 FRONTEND_DIR = BASE_DIR / "frontend"
 
+
+@asynccontextmanager
+async def lifespan(main: FastAPI):
+    yield
+    # Shutdown
+    async_db.close()
+    db.pool.close()
+
+
 app = FastAPI(
     title="Simple Marketplace",
     description="Educational marketplace example",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Время запросов по маршрутам; время в async_db выделяется отдельно
+app.add_middleware(MetricsMiddleware, registry=metrics_registry)
+instrument_database(async_db)
+
 # Монтируем статические файлы фронтенда
 if FRONTEND_DIR.exists():
     app.mount("/static", StaticFiles(directory=FRONTEND_DIR), name="static")
@@ -31,38 +49,81 @@ else:
     app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
 
-# API endpoints
+# API endpoints: async-обработчики, работа с SQLite идёт через async_db
 @app.post("/register")
-def register(user_data: UserCreate):
-    return auth_service.register_user(user_data)
+async def register(user_data: UserCreate):
+    return await auth_service.register_user_async(user_data)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
 
 
 @app.get("/products")
-def get_products():
-    return product_service.get_all_products()
+async def get_products(
+        after_id: int = Query(0, ge=0),
+        limit: Optional[int] = Query(None, ge=1, le=1000),
+        fmt: str = Query("json", alias="format", pattern="^(json|ndjson)$"),
+        if_none_match: Optional[str] = Header(None)
+):
+    media_type = "application/x-ndjson" if fmt == "ndjson" else "application/json"
+
+    # Готовые байты из кэша каталога; ETag позволяет клиенту получить 304 без тела
+    cached = product_service.get_cached_catalog(after_id, limit, fmt)
+    if cached is not None:
+        headers = {"ETag": cached.etag, "Cache-Control": "no-cache"}
+        # Страница по курсору: следующий курсор передаётся в заголовке X-Next-Cursor
+        if cached.next_cursor is not None:
+            headers["X-Next-Cursor"] = str(cached.next_cursor)
+        if etag_matches(if_none_match, cached.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=cached.body, media_type=media_type, headers=headers)
+
+    # Промах: ответ отдаётся потоком и попадает в кэш, если уложился в предел размера
+    headers = {}
+    if limit is not None:
+        next_cursor = await product_service.get_next_cursor_async(after_id, limit)
+        if next_cursor is not None:
+            headers["X-Next-Cursor"] = str(next_cursor)
+    return StreamingResponse(product_service.stream_catalog_async(after_id, limit, fmt),
+                             media_type=media_type, headers=headers)
 
 
 @app.post("/products")
-def create_product(name: str, price: float, description: str, user: User = Depends(auth_service.get_current_user)):
+async def create_product(name: str, price: float, description: str,
+                         user: User = Depends(auth_service.get_current_user_async)):
     if user.role not in ['seller', 'admin']:
         raise HTTPException(status_code=403, detail="Только продавцы могут добавлять товары")
 
-    return product_service.create_product(name, price, description, user.id)
+    return await product_service.create_product_async(name, price, description, user.id)
 
 
 @app.post("/buy/{product_id}")
-def buy_product(product_id: int, user: User = Depends(auth_service.get_current_user)):
-    return order_service.create_order(user.id, product_id)
+async def buy_product(product_id: int, user: User = Depends(auth_service.get_current_user_async)):
+    return await order_service.create_order_async(user.id, product_id)
 
 
 @app.get("/my-orders")
-def get_my_orders(user: User = Depends(auth_service.get_current_user)):
-    return order_service.get_user_orders(user.id)
+async def get_my_orders(user: User = Depends(auth_service.get_current_user_async)):
+    return await order_service.get_user_orders_async(user.id)
 
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy", "service": "marketplace"}
+    return {
+        "status": "healthy",
+        "service": "marketplace",
+        "auth_cache": auth_service.cache_stats(),
+        "catalog_cache": product_service.cache_stats()
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
 
 
 @app.get("/")
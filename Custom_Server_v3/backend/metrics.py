@@ -0,0 +1,229 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Фиксированные логарифмические корзины (секунды и байты), как у prometheus_client
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class Histogram:
+    # Число наблюдений не хранится отдельно: это сумма counts, считается при рендере
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def observe(self, value: float):
+        # bisect_left: значение, равное границе, попадает в корзину le=граница
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class RouteMetrics:
+    # Всё по одной паре (method, route): счётчики по статусам без кортежей-ключей на запрос
+    __slots__ = ("duration", "db_duration", "handler_duration", "response_size", "db_queries", "statuses")
+
+    def __init__(self):
+        self.duration = Histogram(LATENCY_BUCKETS)
+        self.db_duration = Histogram(LATENCY_BUCKETS)
+        self.handler_duration = Histogram(LATENCY_BUCKETS)
+        self.response_size = Histogram(SIZE_BUCKETS)
+        self.db_queries = 0
+        self.statuses: Dict[int, int] = {}
+
+    def observe(self, status: int, duration: float, db_seconds: float, db_queries: int, size: int):
+        # Корзины обновляются без вызова Histogram.observe: это горячий путь каждого запроса
+        statuses = self.statuses
+        statuses[status] = statuses.get(status, 0) + 1
+        handler_seconds = duration - db_seconds if duration > db_seconds else 0.0
+        histogram = self.duration
+        histogram.counts[bisect_left(LATENCY_BUCKETS, duration)] += 1
+        histogram.sum += duration
+        histogram = self.db_duration
+        histogram.counts[bisect_left(LATENCY_BUCKETS, db_seconds)] += 1
+        histogram.sum += db_seconds
+        histogram = self.handler_duration
+        histogram.counts[bisect_left(LATENCY_BUCKETS, handler_seconds)] += 1
+        histogram.sum += handler_seconds
+        histogram = self.response_size
+        histogram.counts[bisect_left(SIZE_BUCKETS, size)] += 1
+        histogram.sum += size
+        self.db_queries += db_queries
+
+
+class RequestTimings:
+    # Накопитель на один запрос: слой БД добавляет сюда время своих вызовов
+    __slots__ = ("db_seconds", "db_queries")
+
+    def __init__(self):
+        self.db_seconds = 0.0
+        self.db_queries = 0
+
+
+_current_request: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def record_db_time(elapsed: float):
+    timings = _current_request.get()
+    if timings is not None:
+        timings.db_seconds += elapsed
+        timings.db_queries += 1
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names: Iterable[str], values: Iterable[str]) -> str:
+    return ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+
+
+def _format_float(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class MetricsRegistry:
+    # Все обновления идут из event loop (middleware), поэтому без блокировок.
+    # Метрики на процесс: при нескольких воркерах uvicorn Prometheus опрашивает каждый
+    ROUTE_LABELS = ("method", "route")
+
+    def __init__(self):
+        self.in_flight = 0
+        # route -> method -> RouteMetrics: на запросе два поиска по строкам с кэшированным хэшем
+        self.routes: Dict[str, Dict[str, RouteMetrics]] = {}
+
+    def route_metrics(self, method: str, route: str) -> RouteMetrics:
+        by_method = self.routes.get(route)
+        if by_method is None:
+            by_method = self.routes[route] = {}
+        metrics = by_method.get(method)
+        if metrics is None:
+            metrics = by_method[method] = RouteMetrics()
+        return metrics
+
+    def observe_request(self, method: str, route: str, status: int, duration: float,
+                        db_seconds: float, db_queries: int, size: int):
+        self.route_metrics(method, route).observe(status, duration, db_seconds, db_queries, size)
+
+    def _series(self) -> List[Tuple[Tuple[str, str], RouteMetrics]]:
+        # Метки строятся только при рендере /metrics, не на запросе
+        return sorted(((method, route), metrics)
+                      for route, by_method in self.routes.items()
+                      for method, metrics in by_method.items())
+
+    def _render_histograms(self, lines: List[str], series, name: str, help_text: str, attribute: str):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for key, metrics in series:
+            histogram: Histogram = getattr(metrics, attribute)
+            labels = _labels(self.ROUTE_LABELS, key)
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{labels},le="{_format_float(bound)}"}} {cumulative}')
+            cumulative += histogram.counts[-1]
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+            lines.append(f"{name}_sum{{{labels}}} {histogram.sum!r}")
+            lines.append(f"{name}_count{{{labels}}} {cumulative}")
+
+    def render(self) -> str:
+        # Текстовый формат Prometheus 0.0.4
+        series = self._series()
+        lines = [
+            "# HELP http_requests_in_flight Requests currently being processed",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+            "# HELP http_requests_total Completed HTTP requests",
+            "# TYPE http_requests_total counter",
+        ]
+        for key, metrics in series:
+            for status, count in sorted(metrics.statuses.items()):
+                lines.append(f"http_requests_total{{{_labels(('method', 'route', 'status'), (*key, status))}}} {count}")
+
+        lines.append("# HELP http_request_db_queries_total Database calls made while handling requests")
+        lines.append("# TYPE http_request_db_queries_total counter")
+        for key, metrics in series:
+            lines.append(f"http_request_db_queries_total{{{_labels(self.ROUTE_LABELS, key)}}} {metrics.db_queries}")
+
+        self._render_histograms(lines, series, "http_request_duration_seconds",
+                                "Time from request start to the last response byte", "duration")
+        self._render_histograms(lines, series, "http_request_db_seconds",
+                                "Time spent waiting for the database per request", "db_duration")
+        self._render_histograms(lines, series, "http_request_handler_seconds",
+                                "Request time excluding database calls", "handler_duration")
+        self._render_histograms(lines, series, "http_response_size_bytes",
+                                "Response body size", "response_size")
+        return "\n".join(lines) + "\n"
+
+
+def route_label(scope: dict) -> str:
+    # Шаблон пути ("/api/users/{user_id}"), а не сам путь: число серий не растёт с числом id
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if "endpoint" in scope:
+        # Mount (статика): префикс монтирования
+        mount = scope.get("root_path", "")[len(scope.get("app_root_path", "")):]
+        return f"{mount}/*" if mount else UNMATCHED_ROUTE
+    return UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    # Чистый ASGI middleware: не буферизует тело (в отличие от BaseHTTPMiddleware),
+    # поэтому не ломает потоковые ответы. Не бесплатен: на минимальном эндпоинте FastAPI
+    # около 5 us сам по себе и 11-13 us (12-13%) в полном стеке (FastAPI_Lite_v2/tests/bench_metrics.py)
+
+    def __init__(self, app, registry: MetricsRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        registry = self.registry
+        timings = RequestTimings()
+        token = _current_request.set(timings)
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            # Тело чаще: у потоковых ответов сообщений body много, start - одно
+            message_type = message["type"]
+            if message_type == "http.response.body":
+                size += len(message.get("body", b""))
+            elif message_type == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        registry.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - started
+            registry.in_flight -= 1
+            _current_request.reset(token)
+            registry.route_metrics(scope["method"], route_label(scope)).observe(
+                status, duration, timings.db_seconds, timings.db_queries, size)
+
+
+metrics_registry = MetricsRegistry()
+
+
+
+def instrument_database(database):
+    # AsyncDatabase.run сообщает длительность каждого вызова в пуле потоков БД
+    database.on_query = record_db_time
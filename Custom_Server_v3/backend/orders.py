@@ -1,39 +1,160 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from fastapi import HTTPException
 from models import Order
-from database import Database
+from database import db, async_db
 
-db = Database()
+# Групповая фиксация: заказы из параллельных запросов пишутся одной транзакцией
+ORDER_GROUP_COMMIT = os.getenv("ORDER_GROUP_COMMIT", "false").lower() == "true"
+ORDER_BATCH_WINDOW_MS = float(os.getenv("ORDER_BATCH_WINDOW_MS", 2))
+ORDER_BATCH_MAX_SIZE = int(os.getenv("ORDER_BATCH_MAX_SIZE", 256))
+# Сколько запрос ждёт подтверждения от группового писателя, прежде чем ответить 503
+ORDER_WRITE_TIMEOUT = float(os.getenv("ORDER_WRITE_TIMEOUT", 10))
+
+# Проверка товара и вставка одним запросом: если товара нет, вставляется 0 строк
+INSERT_ORDER_QUERY = '''
+    INSERT INTO orders (user_id, product_id, status)
+    SELECT ?, id, 'paid' FROM products WHERE id = ?
+'''
+
+
+class OrderBatchWriter:
+    def __init__(self, database, window_ms: float = ORDER_BATCH_WINDOW_MS, max_size: int = ORDER_BATCH_MAX_SIZE):
+        self.db = database
+        self.window = window_ms / 1000
+        self.max_size = max_size
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.orders = 0
+        self.restarts = 0
+
+    def _ensure_started(self):
+        # Живой ли поток, проверяем перед каждой постановкой: если писатель упал,
+        # очередь подхватит новый поток, а не копит заказы, которые никто не запишет
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    if self._thread is not None:
+                        self.restarts += 1
+                    self._thread = threading.Thread(target=self._run, name="order-batch-writer", daemon=True)
+                    self._thread.start()
+
+    def submit(self, user_id: int, product_id: int) -> Future:
+        self._ensure_started()
+        future = Future()
+        self._queue.put((user_id, product_id, future))
+        return future
+
+    def _collect(self) -> list:
+        # Ждём первый заказ, затем добираем остальные в пределах окна
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_size:
+            timeout = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Заказы, чьи запросы уже ответили по таймауту (Future отменён), не пишем
+            batch = [item for item in self._collect() if item[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                with self.db.connection() as conn:
+                    results = [conn.execute(INSERT_ORDER_QUERY, (user_id, product_id)).rowcount == 1
+                               for user_id, product_id, _ in batch]
+            except Exception:
+                # Ошибка одного заказа не должна ронять всю пачку - пишем по одному
+                for user_id, product_id, future in batch:
+                    try:
+                        future.set_result(insert_order(self.db, user_id, product_id))
+                    except Exception as error:
+                        future.set_exception(error)
+                continue
+
+            self.batches += 1
+            self.orders += len(batch)
+            for (_, _, future), created in zip(batch, results):
+                future.set_result(created)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "orders": self.orders,
+            "avg_batch_size": round(self.orders / self.batches, 2) if self.batches else 0.0,
+            "queued": self._queue.qsize(),
+            "restarts": self.restarts,
+        }
+
+
+def write_timeout_error() -> HTTPException:
+    # Заказ мог быть уже взят в пачку и записан: клиент проверяет /my-orders, а не повторяет вслепую
+    return HTTPException(status_code=503, detail="Заказ не подтверждён вовремя, проверьте список заказов")
+
+
+def insert_order(database, user_id: int, product_id: int) -> bool:
+    with database.connection() as conn:
+        return conn.execute(INSERT_ORDER_QUERY, (user_id, product_id)).rowcount == 1
 
 
 class OrderService:
-    def __init__(self):
+    def __init__(self, group_commit: bool = ORDER_GROUP_COMMIT):
         self.db = db
+        self.batch_writer = OrderBatchWriter(self.db) if group_commit else None
 
     def create_order(self, user_id: int, product_id: int) -> dict:
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
+        if self.batch_writer is not None:
+            future = self.batch_writer.submit(user_id, product_id)
+            try:
+                created = future.result(timeout=ORDER_WRITE_TIMEOUT)
+            except FutureTimeoutError:
+                future.cancel()
+                raise write_timeout_error()
+        else:
+            created = insert_order(self.db, user_id, product_id)
 
-        # ПРОВЕРКА ЗАКАЗА
-        cursor.execute("SELECT id FROM products WHERE id = ?", (product_id,))
-        if not cursor.fetchone():
+        if not created:
             raise HTTPException(status_code=404, detail="Товар не найден")
 
-        # СОЗДАНИЕ ЗАКАЗА
-        cursor.execute("INSERT INTO orders (user_id, product_id, status) VALUES (?, ?, ?)",
-                       (user_id, product_id, "paid"))
-        conn.commit()
-        conn.close()
+        return {"message": "Заказ создан и оплачен"}
+
+    async def create_order_async(self, user_id: int, product_id: int) -> dict:
+        if self.batch_writer is not None:
+            # Групповой писатель уже работает в своём потоке - просто ждём его Future
+            # wait_for по таймауту отменяет и исходный Future - ещё не взятый заказ не запишется
+            try:
+                created = await asyncio.wait_for(asyncio.wrap_future(self.batch_writer.submit(user_id, product_id)),
+                                                 ORDER_WRITE_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise write_timeout_error()
+        else:
+            created = await async_db.run(insert_order, self.db, user_id, product_id)
+
+        if not created:
+            raise HTTPException(status_code=404, detail="Товар не найден")
 
         return {"message": "Заказ создан и оплачен"}
 
     def get_user_orders(self, user_id: int) -> list[Order]:
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, user_id, product_id, status FROM orders WHERE user_id = ?", (user_id,))
-        orders = [Order(id=row[0], user_id=row[1], product_id=row[2], status=row[3])
-                  for row in cursor.fetchall()]
-        conn.close()
+        with self.db.connection() as conn:
+            cursor = conn.execute("SELECT id, user_id, product_id, status FROM orders WHERE user_id = ?",
+                                  (user_id,))
+            orders = [Order(id=row[0], user_id=row[1], product_id=row[2], status=row[3])
+                      for row in cursor.fetchall()]
         return orders
 
+    async def get_user_orders_async(self, user_id: int) -> list[Order]:
+        return await async_db.run(self.get_user_orders, user_id)
+
 
 order_service = OrderService()
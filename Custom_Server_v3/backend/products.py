@@ -1,30 +1,177 @@
+import hashlib
+import json
+import threading
+from typing import AsyncIterator, Iterator, NamedTuple, Optional
 from models import Product
-from database import Database
+from database import db, async_db
+from cache import TTLCache, CATALOG_CACHE_SIZE, CATALOG_CACHE_TTL, CATALOG_CACHE_MAX_BYTES
 
-db = Database()
+# Сколько строк читается из БД за один шаг потоковой выдачи
+STREAM_CHUNK_SIZE = 500
+
+PRODUCT_COLUMNS = "id, name, price, seller_id, description"
+
+
+def _product_row_to_dict(row: tuple) -> dict:
+    return {"id": row[0], "name": row[1], "price": row[2], "seller_id": row[3], "description": row[4] or ""}
+
+
+def _encode_rows(rows: list[tuple], fmt: str) -> str:
+    if fmt == "ndjson":
+        return "".join(json.dumps(_product_row_to_dict(row), ensure_ascii=False) + "\n" for row in rows)
+    return ",".join(json.dumps(_product_row_to_dict(row), ensure_ascii=False) for row in rows)
+
+
+class CachedCatalog(NamedTuple):
+    body: bytes
+    etag: str
+    next_cursor: Optional[int]
 
 
 class ProductService:
     def __init__(self):
         self.db = db
+        # Готовые байты ответа GET /products по ключу (after_id, limit, format)
+        self.catalog_cache = TTLCache(CATALOG_CACHE_SIZE, CATALOG_CACHE_TTL)
+        # Ключи ответов больше CATALOG_CACHE_MAX_BYTES: их выдача не буферизуется;
+        # отдельный кэш, чтобы такие обращения не считались попаданиями
+        self.oversized = TTLCache(CATALOG_CACHE_SIZE, CATALOG_CACHE_TTL)
+        # Поколение каталога: ответ, собранный до изменения, в кэш не попадёт
+        self._generation = 0
+        self._generation_lock = threading.Lock()
 
     def get_all_products(self) -> list[Product]:
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, name, price, seller_id, description FROM products")
-        products = [Product(id=row[0], name=row[1], price=row[2], seller_id=row[3], description=row[4])
-                    for row in cursor.fetchall()]
-        conn.close()
+        with self.db.connection() as conn:
+            cursor = conn.execute(f"SELECT {PRODUCT_COLUMNS} FROM products")
+            products = [Product(id=row[0], name=row[1], price=row[2], seller_id=row[3], description=row[4])
+                        for row in cursor.fetchall()]
+        return products
+
+    def get_products_page(self, after_id: int = 0, limit: int = 100) -> list[Product]:
+        # Keyset-пагинация: WHERE id > курсор идёт по первичному ключу без OFFSET
+        with self.db.connection() as conn:
+            cursor = conn.execute(f"SELECT {PRODUCT_COLUMNS} FROM products WHERE id > ? ORDER BY id LIMIT ?",
+                                  (after_id, limit))
+            products = [Product(**_product_row_to_dict(row)) for row in cursor]
         return products
 
+    def iter_product_rows(self, after_id: int = 0, limit: Optional[int] = None,
+                          chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[list[tuple]]:
+        # Каждая порция берёт соединение из пула отдельно, поэтому медленный
+        # клиент не держит соединение и транзакцию чтения всё время выдачи
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = chunk_size if remaining is None else min(chunk_size, remaining)
+            with self.db.connection() as conn:
+                rows = conn.execute(f"SELECT {PRODUCT_COLUMNS} FROM products WHERE id > ? ORDER BY id LIMIT ?",
+                                    (after_id, size)).fetchall()
+            if not rows:
+                return
+            yield rows
+            after_id = rows[-1][0]
+            if remaining is not None:
+                remaining -= len(rows)
+            if len(rows) < size:
+                return
+
+    def _iter_catalog(self, after_id: int, limit: Optional[int], fmt: str) -> Iterator[tuple[bytes, list[tuple]]]:
+        # (байты, строки порции); у скобок JSON-массива строк нет
+        if fmt == "ndjson":
+            for rows in self.iter_product_rows(after_id, limit):
+                yield _encode_rows(rows, fmt).encode(), rows
+            return
+
+        yield b"[", []
+        separator = ""
+        for rows in self.iter_product_rows(after_id, limit):
+            yield (separator + _encode_rows(rows, fmt)).encode(), rows
+            separator = ","
+        yield b"]", []
+
+    def stream_products(self, after_id: int = 0, limit: Optional[int] = None, fmt: str = "json") -> Iterator[bytes]:
+        # Строки сериализуются сразу из курсора, без промежуточных моделей Product
+        for chunk, _ in self._iter_catalog(after_id, limit, fmt):
+            yield chunk
+
+    def stream_catalog(self, after_id: int = 0, limit: Optional[int] = None, fmt: str = "json") -> Iterator[bytes]:
+        # Промах кэша: ответ идёт клиенту потоком и попутно копится в буфер. Как только
+        # буфер превысил CATALOG_CACHE_MAX_BYTES, он выбрасывается - память остаётся
+        # ограниченной, а ключ помечается как слишком большой для кэша
+        key = (after_id, limit, fmt)
+        generation = self._generation
+        parts = None if self.oversized.get(key) else []
+        size = count = 0
+        last_id = None
+        for chunk, rows in self._iter_catalog(after_id, limit, fmt):
+            if parts is not None:
+                size += len(chunk)
+                if size > CATALOG_CACHE_MAX_BYTES:
+                    parts = None
+                    self._store(key, generation, self.oversized, True)
+                else:
+                    parts.append(chunk)
+                    count += len(rows)
+                    if rows:
+                        last_id = rows[-1][0]
+            yield chunk
+
+        # Ответ, прерванный клиентом, сюда не доходит и в кэш не попадает
+        if parts is not None:
+            body = b"".join(parts)
+            etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+            next_cursor = last_id if limit is not None and count == limit else None
+            self._store(key, generation, self.catalog_cache, CachedCatalog(body, etag, next_cursor))
+
+    def _store(self, key: tuple, generation: int, cache: TTLCache, value):
+        with self._generation_lock:
+            # Поколение сменилось за время выдачи - ответ мог устареть
+            if generation == self._generation:
+                cache.set(key, value)
+
+    def get_cached_catalog(self, after_id: int = 0, limit: Optional[int] = None,
+                           fmt: str = "json") -> Optional[CachedCatalog]:
+        # Только поиск в кэше: обслуживается прямо в event loop
+        return self.catalog_cache.get((after_id, limit, fmt))
+
+    def get_next_cursor(self, after_id: int, limit: int) -> Optional[int]:
+        # Последний id полной страницы для X-Next-Cursor до начала потоковой выдачи:
+        # проход только по индексу первичного ключа, без чтения самих строк
+        with self.db.connection() as conn:
+            row = conn.execute("SELECT id FROM products WHERE id > ? ORDER BY id LIMIT 1 OFFSET ?",
+                               (after_id, limit - 1)).fetchone()
+        return row[0] if row else None
+
+    def invalidate_catalog(self):
+        with self._generation_lock:
+            self._generation += 1
+            self.catalog_cache.clear()
+            self.oversized.clear()
+
+    def cache_stats(self) -> dict:
+        return {**self.catalog_cache.stats(), "oversized_keys": self.oversized.stats()["size"]}
+
+    async def get_products_page_async(self, after_id: int = 0, limit: int = 100) -> list[Product]:
+        return await async_db.run(self.get_products_page, after_id, limit)
+
+    async def get_next_cursor_async(self, after_id: int, limit: int) -> Optional[int]:
+        return await async_db.run(self.get_next_cursor, after_id, limit)
+
+    async def stream_catalog_async(self, after_id: int = 0, limit: Optional[int] = None,
+                                   fmt: str = "json") -> AsyncIterator[bytes]:
+        # Чтение и сериализация каждой порции выполняются в потоке БД
+        chunks = self.stream_catalog(after_id, limit, fmt)
+        while (chunk := await async_db.run(next, chunks, None)) is not None:
+            yield chunk
+
     def create_product(self, name: str, price: float, description: str, seller_id: int) -> dict:
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO products (name, price, seller_id, description) VALUES (?, ?, ?, ?)",
-                       (name, price, seller_id, description))
-        conn.commit()
-        conn.close()
+        with self.db.connection() as conn:
+            conn.execute("INSERT INTO products (name, price, seller_id, description) VALUES (?, ?, ?, ?)",
+                         (name, price, seller_id, description))
+        self.invalidate_catalog()
         return {"message": "Товар добавлен"}
 
+    async def create_product_async(self, name: str, price: float, description: str, seller_id: int) -> dict:
+        return await async_db.run(self.create_product, name, price, description, seller_id)
+
 
 product_service = ProductService()
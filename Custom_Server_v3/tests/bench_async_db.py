@@ -0,0 +1,79 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+# Модуль database создаёт marketplace.db в текущей директории при импорте
+os.chdir(tempfile.mkdtemp(prefix="marketplace_bench_"))
+
+from main import app as async_app  # noqa: E402
+from models import User  # noqa: E402
+from auth import auth_service  # noqa: E402
+from products import product_service  # noqa: E402
+from orders import order_service  # noqa: E402
+from database import db  # noqa: E402
+
+REQUESTS = int(os.getenv("BENCH_REQUESTS", 5000))
+CONCURRENCY = [int(level) for level in os.getenv("BENCH_CONCURRENCY", "100,1000").split(",")]
+AUTH = ("customer1", "123")
+
+# Режим thread-pool: те же сервисы за sync-обработчиками (threadpool Starlette, 40 потоков)
+threadpool_app = FastAPI()
+
+
+@threadpool_app.get("/products")
+def get_products_sync(limit: int = 50):
+    return product_service.get_products_page(0, limit)
+
+
+@threadpool_app.get("/my-orders")
+def get_my_orders_sync(user: User = Depends(auth_service.get_current_user)):
+    return order_service.get_user_orders(user.id)
+
+
+def seed():
+    with db.connection() as conn:
+        conn.executemany("INSERT INTO products (name, price, seller_id, description) VALUES (?, ?, ?, ?)",
+                         [(f"Товар {i}", 100.0, 2, "Описание") for i in range(200)])
+        conn.executemany("INSERT INTO orders (user_id, product_id, status) VALUES (3, ?, 'paid')",
+                         [(1 + i % 200,) for i in range(50)])
+
+
+async def run(name: str, app: FastAPI, concurrency: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        counter = iter(range(REQUESTS))
+
+        async def worker():
+            for i in counter:
+                if i % 2:
+                    response = await client.get("/my-orders", auth=AUTH)
+                else:
+                    response = await client.get("/products", params={"limit": 50})
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    print(f"{name:<12} {concurrency:>6} clients {REQUESTS / elapsed:>10.0f} req/s")
+    return REQUESTS / elapsed
+
+
+async def main():
+    seed()
+    print(f"Benchmark: {REQUESTS} requests per run (/products?limit=50 and /my-orders)")
+    for concurrency in CONCURRENCY:
+        await run("thread-pool", threadpool_app, concurrency)
+        await run("async", async_app, concurrency)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
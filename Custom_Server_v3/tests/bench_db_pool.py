@@ -0,0 +1,67 @@
+import os
+import sys
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+# Модуль database создаёт marketplace.db в текущей директории при импорте
+os.chdir(tempfile.mkdtemp(prefix="marketplace_bench_"))
+
+from database import Database  # noqa: E402
+
+REQUESTS = int(os.getenv("BENCH_REQUESTS", 5000))
+# Размер пула потоков Starlette для sync-эндпоинтов по умолчанию
+WORKERS = int(os.getenv("BENCH_WORKERS", 40))
+
+AUTH_QUERY = "SELECT id, username, role FROM users WHERE username = ? AND password = ?"
+PRODUCTS_QUERY = "SELECT id, name, price, seller_id, description FROM products"
+
+
+def seed(database: Database, products: int = 200):
+    conn = database.get_connection()
+    conn.executemany("INSERT INTO products (name, price, seller_id, description) VALUES (?, ?, ?, ?)",
+                     [(f"Товар {i}", 100 + i, 2, "Описание") for i in range(products)])
+    conn.commit()
+    conn.close()
+
+
+def request_without_pool(database: Database):
+    # Старое поведение: новое соединение на каждый запрос
+    conn = sqlite3.connect(database.db_name)
+    cursor = conn.cursor()
+    cursor.execute(AUTH_QUERY, ("customer1", database.hash_password("123")))
+    cursor.fetchone()
+    cursor.execute(PRODUCTS_QUERY)
+    cursor.fetchall()
+    conn.close()
+
+
+def request_with_pool(database: Database):
+    with database.connection() as conn:
+        conn.execute(AUTH_QUERY, ("customer1", database.hash_password("123"))).fetchone()
+        conn.execute(PRODUCTS_QUERY).fetchall()
+
+
+def run(name: str, handler, database: Database):
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        start = time.perf_counter()
+        for future in [executor.submit(handler, database) for _ in range(REQUESTS)]:
+            future.result()
+        elapsed = time.perf_counter() - start
+    print(f"{name:<22} {REQUESTS / elapsed:>10.0f} req/s   ({elapsed:.2f}s for {REQUESTS} requests)")
+    return REQUESTS / elapsed
+
+
+if __name__ == "__main__":
+    database = Database("bench.db")
+    seed(database)
+
+    print(f"Benchmark: {REQUESTS} requests, {WORKERS} worker threads")
+    before = run("connect per request", request_without_pool, database)
+    after = run("connection pool", request_with_pool, database)
+    print(f"Speedup: x{after / before:.2f}")
+    print("Pool stats:", database.pool.stats())
@@ -0,0 +1,78 @@
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+# Модуль database создаёт marketplace.db в текущей директории при импорте
+os.chdir(tempfile.mkdtemp(prefix="marketplace_bench_"))
+
+from database import Database  # noqa: E402
+
+SIZES = [int(size) for size in os.getenv("BENCH_ORDER_SIZES", "10000,100000,1000000").split(",")]
+USERS = int(os.getenv("BENCH_USERS", 10000))
+PRODUCTS = 1000
+LOOKUPS = 200
+# У пробных пользователей число заказов фиксировано, растёт только остальная таблица
+PROBE_ORDERS = 20
+
+# Тот же запрос, что в OrderService.get_user_orders
+MY_ORDERS_QUERY = "SELECT id, user_id, product_id, status FROM orders WHERE user_id = ?"
+
+
+def seed_users_and_products(database: Database):
+    with database.connection() as conn:
+        conn.executemany("INSERT INTO users (username, password, role) VALUES (?, ?, ?)",
+                         [(f"bench_user_{i}", "x", "customer") for i in range(USERS)])
+        conn.executemany("INSERT INTO products (name, price, seller_id, description) VALUES (?, ?, ?, ?)",
+                         [(f"Товар {i}", 100.0, 2, "") for i in range(PRODUCTS)])
+        probe_ids = [row[0] for row in conn.execute("SELECT id FROM users ORDER BY id DESC LIMIT ?", (LOOKUPS,))]
+        conn.executemany("INSERT INTO orders (user_id, product_id, status) VALUES (?, 1, 'paid')",
+                         [(user_id,) for user_id in probe_ids for _ in range(PROBE_ORDERS)])
+    return probe_ids
+
+
+def grow_orders(database: Database, target: int, probe_ids: list[int]):
+    with database.connection() as conn:
+        current = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+        user_ids = list({row[0] for row in conn.execute("SELECT id FROM users")} - set(probe_ids))
+        product_ids = [row[0] for row in conn.execute("SELECT id FROM products")]
+        rows = ((random.choice(user_ids), random.choice(product_ids), "paid") for _ in range(target - current))
+        conn.executemany("INSERT INTO orders (user_id, product_id, status) VALUES (?, ?, ?)", rows)
+
+
+def measure(database: Database, probe_ids: list[int]) -> float:
+    with database.connection() as conn:
+        timings = []
+        for user_id in probe_ids:
+            start = time.perf_counter()
+            conn.execute(MY_ORDERS_QUERY, (user_id,)).fetchall()
+            timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def set_index(database: Database, enabled: bool):
+    with database.connection() as conn:
+        if enabled:
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_user ON orders (user_id, product_id, status)")
+        else:
+            conn.execute("DROP INDEX IF EXISTS idx_orders_user")
+
+
+if __name__ == "__main__":
+    database = Database("bench.db")
+    probe_ids = seed_users_and_products(database)
+
+    print(f"/my-orders query latency (median of {LOOKUPS} users with {PROBE_ORDERS} orders each)")
+    print(f"{'orders':>10} {'no index, ms':>14} {'covering index, ms':>20}")
+    for size in SIZES:
+        set_index(database, False)
+        grow_orders(database, size, probe_ids)
+        without_index = measure(database, probe_ids)
+        set_index(database, True)
+        with_index = measure(database, probe_ids)
+        print(f"{size:>10} {without_index:>14.3f} {with_index:>20.3f}")
@@ -0,0 +1,40 @@
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+# Модуль database создаёт marketplace.db в текущей директории при импорте
+os.chdir(tempfile.mkdtemp(prefix="marketplace_bench_"))
+# Для честного сравнения каждый коммит делает fsync (можно переопределить)
+os.environ.setdefault("DB_SYNCHRONOUS", "FULL")
+
+from orders import OrderService  # noqa: E402
+
+ORDERS = int(os.getenv("BENCH_ORDERS", 5000))
+# Размер пула потоков Starlette для sync-эндпоинтов по умолчанию
+WORKERS = int(os.getenv("BENCH_WORKERS", 40))
+
+
+def run(name: str, service: OrderService) -> float:
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        start = time.perf_counter()
+        futures = [executor.submit(service.create_order, 3, 1 + i % 2) for i in range(ORDERS)]
+        for future in futures:
+            future.result()
+        elapsed = time.perf_counter() - start
+    print(f"{name:<28} {ORDERS / elapsed:>10.0f} orders/s   ({elapsed:.2f}s)")
+    return ORDERS / elapsed
+
+
+if __name__ == "__main__":
+    print(f"Benchmark: {ORDERS} orders, {WORKERS} concurrent clients, "
+          f"synchronous={os.environ['DB_SYNCHRONOUS']}")
+    single = run("transaction per order", OrderService(group_commit=False))
+    grouped_service = OrderService(group_commit=True)
+    grouped = run("group commit", grouped_service)
+    print(f"Speedup: x{grouped / single:.2f}")
+    print("Batch writer stats:", grouped_service.batch_writer.stats())
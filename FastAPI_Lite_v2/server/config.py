@@ -21,6 +21,30 @@ class Settings:
     DB_USER: str = os.getenv("DB_USER", "root")
     DB_PASSWORD: str = os.getenv("DB_PASSWORD", "sksmel544332")
     DB_NAME: str = os.getenv("DB_NAME", "marketplace_db")
+    DB_POOL_MIN_SIZE: int = int(os.getenv("DB_POOL_MIN_SIZE", 1))
+    DB_POOL_MAX_SIZE: int = int(os.getenv("DB_POOL_MAX_SIZE", 10))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 5.0))
+    DB_POOL_RECYCLE: float = float(os.getenv("DB_POOL_RECYCLE", 3600))
+    DB_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100))
+
+    USER_COUNT_CACHE_TTL: float = float(os.getenv("USER_COUNT_CACHE_TTL", 30))
+    USER_CACHE_BACKEND: str = os.getenv("USER_CACHE_BACKEND", "memory")  # memory, redis, none
+    USER_CACHE_TTL: float = float(os.getenv("USER_CACHE_TTL", 60))
+    USER_CACHE_NEGATIVE_TTL: float = float(os.getenv("USER_CACHE_NEGATIVE_TTL", 5))
+    USER_CACHE_MAX_SIZE: int = int(os.getenv("USER_CACHE_MAX_SIZE", 10000))
+    REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+    # Схема и стоимость хэширования; подобрать под железо:
+    # python -m utils.password_schemes --target-ms 100
+    PASSWORD_SCHEME: str = os.getenv("PASSWORD_SCHEME", "scrypt")  # scrypt, pbkdf2_sha256
+    PASSWORD_SCRYPT_N: int = int(os.getenv("PASSWORD_SCRYPT_N", 16384))
+    PASSWORD_SCRYPT_R: int = int(os.getenv("PASSWORD_SCRYPT_R", 8))
+    PASSWORD_SCRYPT_P: int = int(os.getenv("PASSWORD_SCRYPT_P", 1))
+    PASSWORD_PBKDF2_ITERATIONS: int = int(os.getenv("PASSWORD_PBKDF2_ITERATIONS", 600000))
+
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+    PASSWORD_HASH_MAX_CONCURRENCY: int = int(os.getenv("PASSWORD_HASH_MAX_CONCURRENCY", 0)) or PASSWORD_HASH_WORKERS
+    PASSWORD_HASH_MAX_QUEUE: int = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 1000))
 
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-here")
 
@@ -1,10 +1,19 @@
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Optional
+from contextlib import asynccontextmanager
+from typing import Any, AsyncContextManager, Dict, Iterable, List, Optional, Sequence, Tuple
 import logging
+from .query import QueryLike
 
 logger = logging.getLogger(__name__)
 
 
+class DuplicateKeyError(Exception):
+    # Нарушение UNIQUE-ограничения; key - имя колонки/индекса
+    def __init__(self, key: str, message: str = ""):
+        super().__init__(message or f"Duplicate value for key '{key}'")
+        self.key = key
+
+
 class DatabaseInterface(ABC):
 
     @abstractmethod
@@ -16,17 +25,39 @@ class DatabaseInterface(ABC):
         pass
 
     @abstractmethod
-    async def execute_query(self, query: str, params: Dict = None) -> Any:
+    async def execute_query(self, query: QueryLike, params: Dict = None) -> Any:
+        pass
+
+    @abstractmethod
+    async def fetch_one(self, query: QueryLike, params: Dict = None) -> Optional[Dict]:
+        pass
+
+    @abstractmethod
+    async def fetch_all(self, query: QueryLike, params: Dict = None) -> List[Dict]:
         pass
 
     @abstractmethod
-    async def fetch_one(self, query: str, params: Dict = None) -> Optional[Dict]:
+    async def insert(self, query: QueryLike, params: Dict = None) -> int:
         pass
 
     @abstractmethod
-    async def fetch_all(self, query: str, params: Dict = None) -> List[Dict]:
+    async def executemany(self, query: QueryLike, params_seq: Iterable[Dict]) -> int:
         pass
 
+    @abstractmethod
+    async def pipeline(self, statements: Sequence[Tuple[QueryLike, Optional[Dict]]]) -> List[Any]:
+        pass
+
+    @abstractmethod
+    def transaction(self) -> AsyncContextManager:
+        pass
+
+    def pool_stats(self) -> Dict[str, Any]:
+        return {}
+
+    def statement_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {}
+
 
 class DatabaseManager:
 
@@ -49,18 +80,49 @@ class DatabaseManager:
             self.connected = False
             logger.info("✅ Database connection closed")
 
-    async def execute(self, query: str, params: Dict = None) -> Any:
+    async def execute(self, query: QueryLike, params: Dict = None) -> Any:
         if not self.connected or not self.db:
             raise ConnectionError("Database not connected")
         return await self.db.execute_query(query, params)
 
-    async def fetch_one(self, query: str, params: Dict = None) -> Optional[Dict]:
+    async def fetch_one(self, query: QueryLike, params: Dict = None) -> Optional[Dict]:
         if not self.connected or not self.db:
             raise ConnectionError("Database not connected")
         return await self.db.fetch_one(query, params)
 
-    async def fetch_all(self, query: str, params: Dict = None) -> List[Dict]:
+    async def fetch_all(self, query: QueryLike, params: Dict = None) -> List[Dict]:
         if not self.connected or not self.db:
             raise ConnectionError("Database not connected")
         return await self.db.fetch_all(query, params)
-    
\ No newline at end of file
+
+    async def insert(self, query: QueryLike, params: Dict = None) -> int:
+        if not self.connected or not self.db:
+            raise ConnectionError("Database not connected")
+        return await self.db.insert(query, params)
+
+    async def executemany(self, query: QueryLike, params_seq: Iterable[Dict]) -> int:
+        if not self.connected or not self.db:
+            raise ConnectionError("Database not connected")
+        return await self.db.executemany(query, params_seq)
+
+    async def pipeline(self, statements: Sequence[Tuple[QueryLike, Optional[Dict]]]) -> List[Any]:
+        if not self.connected or not self.db:
+            raise ConnectionError("Database not connected")
+        return await self.db.pipeline(statements)
+
+    @asynccontextmanager
+    async def transaction(self):
+        if not self.connected or not self.db:
+            raise ConnectionError("Database not connected")
+        async with self.db.transaction() as tx:
+            yield tx
+
+    def pool_stats(self) -> Dict[str, Any]:
+        if not self.connected or not self.db:
+            return {}
+        return self.db.pool_stats()
+
+    def statement_stats(self) -> Dict[str, Dict[str, Any]]:
+        if not self.connected or not self.db:
+            return {}
+        return self.db.statement_stats()
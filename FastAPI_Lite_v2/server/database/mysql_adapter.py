@@ -1,65 +1,160 @@
+import re
+from collections import OrderedDict
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, errorcode, errors
 from typing import Any, Dict, List, Optional
 import logging
-from .base import DatabaseInterface
+from .pooled_adapter import PooledAdapter
+from .query import Query
 
 logger = logging.getLogger(__name__)
 
+# "Duplicate entry 'x' for key 'users.email'" (в MySQL 5.7 - просто 'email')
+_DUPLICATE_KEY_RE = re.compile(r"for key '(?:[^']*\.)?([^'.]+)'")
 
-class MySQLAdapter(DatabaseInterface):
 
-    def __init__(self, host: str, port: int, user: str, password: str, database: str):
+class PreparedConnection:
+    # Соединение пула с LRU-кэшем server-side prepared statements: курсор
+    # prepared=True готовит запрос один раз и дальше шлёт только параметры
+
+    def __init__(self, connection, max_statements: int):
+        self.connection = connection
+        self.max_statements = max_statements
+        self.statements: "OrderedDict[str, Any]" = OrderedDict()
+
+    def cursor(self, query: Query):
+        cursor = self.statements.get(query.positional_sql)
+        if cursor is not None:
+            self.statements.move_to_end(query.positional_sql)
+            return cursor
+        cursor = self.connection.cursor(prepared=True)
+        self.statements[query.positional_sql] = cursor
+        if len(self.statements) > self.max_statements:
+            # Закрытие курсора освобождает statement на сервере (COM_STMT_CLOSE)
+            _, evicted = self.statements.popitem(last=False)
+            self._close_cursor(evicted)
+        return cursor
+
+    def discard(self, query: Query):
+        cursor = self.statements.pop(query.positional_sql, None)
+        if cursor is not None:
+            self._close_cursor(cursor)
+
+    @staticmethod
+    def _close_cursor(cursor):
+        try:
+            cursor.close()
+        except Error:
+            pass
+
+    def close(self):
+        for cursor in self.statements.values():
+            self._close_cursor(cursor)
+        self.statements.clear()
+        self.connection.close()
+
+
+class MySQLAdapter(PooledAdapter):
+    driver_error = Error
+    connection_errors = (errors.OperationalError, errors.InterfaceError)
+    name = "MySQL"
+
+    def __init__(self, host: str, port: int, user: str, password: str, database: str,
+                 pool_min_size: int = 1, pool_max_size: int = 10,
+                 pool_timeout: float = 5.0, pool_recycle: float = 3600.0,
+                 statement_cache_size: int = 100):
         self.host = host
         self.port = port
         self.user = user
         self.password = password
         self.database = database
-        self.connection = None
+        self.statement_cache_size = statement_cache_size
+        super().__init__(pool_min_size, pool_max_size, pool_timeout, pool_recycle)
 
-    async def connect(self) -> bool:
-        try:
-            self.connection = mysql.connector.connect(
-                host=self.host,
-                port=self.port,
-                user=self.user,
-                password=self.password,
-                database=self.database,
-                autocommit=True
-            )
-            if self.connection.is_connected():
-                logger.info(f"Connected to MySQL database: {self.database}")
-                return True
-        except Error as e:
-            logger.error(f"MySQL connection error: {e}")
-        return False
+    def _connect(self) -> PreparedConnection:
+        connection = mysql.connector.connect(
+            host=self.host,
+            port=self.port,
+            user=self.user,
+            password=self.password,
+            database=self.database,
+            autocommit=True
+        )
+        return PreparedConnection(connection, self.statement_cache_size)
 
-    async def disconnect(self) -> bool:
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
-            logger.info("MySQL connection closed")
+    def _ping(self, connection: PreparedConnection) -> bool:
+        try:
+            connection.connection.ping(reconnect=False)
             return True
-        return False
+        except Error:
+            return False
 
-    async def execute_query(self, query: str, params: Dict = None) -> Any:
-        try:
-            cursor = self.connection.cursor(dictionary=True)
-            cursor.execute(query, params or {})
+    def _begin(self, connection: PreparedConnection):
+        connection.connection.start_transaction()
 
-            if query.strip().lower().startswith('select'):
-                result = cursor.fetchall()
-            else:
-                result = cursor.rowcount
+    def _commit(self, connection: PreparedConnection):
+        connection.connection.commit()
 
-            cursor.close()
-            return result
-        except Error as e:
-            logger.error(f"!!!MySQL query error: {e}")
+    def _rollback(self, connection: PreparedConnection):
+        connection.connection.rollback()
+
+    def _run_prepared(self, connection: PreparedConnection, query: Query, params: Optional[Dict]):
+        if not query.prepare:
+            cursor = connection.connection.cursor()
+            cursor.execute(query.sql, params or {})
+            return cursor
+        cursor = connection.cursor(query)
+        try:
+            # Передаём тот же объект строки: драйвер пропускает повторный PREPARE,
+            # только если operation is self._executed
+            cursor.execute(query.positional_sql, query.bind(params))
+        except Error:
+            # Курсор после ошибки может остаться в неконсистентном состоянии
+            connection.discard(query)
             raise
+        return cursor
 
-    async def fetch_one(self, query: str, params: Dict = None) -> Optional[Dict]:
-        result = await self.execute_query(query, params)
-        return result[0] if result else None
+    def _execute_query(self, connection: PreparedConnection, query: Query, params: Optional[Dict]) -> Any:
+        cursor = self._run_prepared(connection, query, params)
+        try:
+            if query.returns_rows:
+                columns = cursor.column_names
+                return [dict(zip(columns, row)) for row in cursor.fetchall()]
+            return cursor.rowcount
+        finally:
+            if not query.prepare:
+                cursor.close()
 
-    async def fetch_all(self, query: str, params: Dict = None) -> List[Dict]:
-        return await self.execute_query(query, params)
+    def _execute_insert(self, connection: PreparedConnection, query: Query, params: Optional[Dict]) -> int:
+        cursor = self._run_prepared(connection, query, params)
+        try:
+            return cursor.lastrowid
+        finally:
+            if not query.prepare:
+                cursor.close()
+
+    def _duplicate_key(self, error: Exception) -> Optional[str]:
+        if getattr(error, "errno", None) != errorcode.ER_DUP_ENTRY:
+            return None
+        match = _DUPLICATE_KEY_RE.search(getattr(error, "msg", "") or str(error))
+        return match.group(1) if match else ""
+
+    def _execute_many(self, connection: PreparedConnection, query: Query, params_seq: List[Dict]) -> int:
+        # Обычный курсор, а не prepared: для INSERT ... VALUES драйвер сам склеивает
+        # строки в один многострочный запрос, prepared-курсор слал бы их по одной
+        cursor = connection.connection.cursor()
+        try:
+            cursor.executemany(query.sql, params_seq)
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+    async def connect(self) -> bool:
+        try:
+            await self.pool.open()
+            logger.info(f"Connected to MySQL database: {self.database} "
+                        f"(pool {self.pool.min_size}..{self.pool.max_size})")
+            return True
+        except Error as e:
+            logger.error(f"MySQL connection error: {e}")
+        return False
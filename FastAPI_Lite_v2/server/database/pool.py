@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(TimeoutError):
+    pass
+
+
+class _PooledConnection:
+    __slots__ = ("raw", "created_at", "last_used_at", "pending")
+
+    def __init__(self, raw: Any):
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.last_used_at = self.created_at
+        # Последний вызов драйвера в потоке пула: после отмены ожидания он может ещё идти
+        self.pending = None
+
+    def busy(self) -> bool:
+        return self.pending is not None and not self.pending.done()
+
+
+# Соединение, выданное текущей задаче в connection(): run() внутри блока выполняется на нём
+_current_connection: ContextVar[Optional[_PooledConnection]] = ContextVar("db_pool_connection", default=None)
+
+
+# Пул блокирующих DB-API соединений для asyncio: вызовы драйвера выполняются
+# в собственном пуле потоков, event loop не блокируется, одновременно идёт
+# до max_size запросов
+class AsyncConnectionPool:
+
+    def __init__(
+            self,
+            connect: Callable[[], Any],
+            min_size: int = 1,
+            max_size: int = 10,
+            acquire_timeout: float = 5.0,
+            recycle: float = 3600.0,
+            health_check: Optional[Callable[[Any], bool]] = None,
+            health_check_interval: float = 30.0,
+            close: Optional[Callable[[Any], None]] = None,
+            connection_errors: Tuple[Type[BaseException], ...] = ()
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1")
+        self._connect = connect
+        self._health_check = health_check
+        self._close = close or (lambda conn: conn.close())
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.recycle = recycle
+        self.health_check_interval = health_check_interval
+        # Ошибки, после которых соединение проверяется перед возвратом в пул
+        self.connection_errors = connection_errors
+
+        self._executor = ThreadPoolExecutor(max_workers=max_size, thread_name_prefix="db-pool")
+        self._idle: deque = deque()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._size = 0
+        self._waiting = 0
+        self._closed = False
+
+        self._acquired = 0
+        self._timeouts = 0
+        self._recycled = 0
+        self._failed_health_checks = 0
+        self._wait_time = 0.0
+
+    async def run(self, func: Callable, *args) -> Any:
+        return await self._run_on(_current_connection.get(), func, *args)
+
+    async def _run_on(self, conn: Optional[_PooledConnection], func: Callable, *args) -> Any:
+        if conn is None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, lambda: func(*args))
+        if conn.busy():
+            # Ожидание прошлого вызова отменили, а поток ещё работает с соединением
+            # (например, откат после отмены запроса): DB-API соединение нельзя
+            # использовать из двух потоков одновременно
+            await asyncio.wait([asyncio.wrap_future(conn.pending)])
+        conn.pending = self._executor.submit(func, *args)
+        return await asyncio.wrap_future(conn.pending)
+
+    async def open(self):
+        self._semaphore = asyncio.Semaphore(self.max_size)
+        for _ in range(self.min_size):
+            self._idle.append(await self._new_connection())
+
+    async def _new_connection(self) -> _PooledConnection:
+        raw = await self.run(self._connect)
+        self._size += 1
+        return _PooledConnection(raw)
+
+    async def _discard(self, conn: _PooledConnection):
+        self._size -= 1
+        try:
+            await self.run(self._close, conn.raw)
+        except Exception as e:
+            logger.warning(f"Error closing pooled connection: {e}")
+
+    async def _is_usable(self, conn: _PooledConnection) -> bool:
+        now = time.monotonic()
+        if self.recycle and now - conn.created_at > self.recycle:
+            self._recycled += 1
+            return False
+        # Проверяем только соединения, которые долго простаивали
+        if self._health_check and now - conn.last_used_at > self.health_check_interval:
+            try:
+                healthy = await self._run_on(conn, self._health_check, conn.raw)
+            except Exception:
+                healthy = False
+            if not healthy:
+                self._failed_health_checks += 1
+                return False
+        return True
+
+    async def acquire(self) -> _PooledConnection:
+        if self._closed or self._semaphore is None:
+            raise ConnectionError("Connection pool is not open")
+
+        started = time.monotonic()
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            raise PoolTimeoutError(f"Could not acquire a connection within {self.acquire_timeout}s")
+        finally:
+            self._waiting -= 1
+        self._wait_time += time.monotonic() - started
+
+        conn = None
+        try:
+            while self._idle:
+                conn = self._idle.pop()
+                if await self._is_usable(conn):
+                    break
+                stale, conn = conn, None
+                await self._discard(stale)
+            else:
+                conn = await self._new_connection()
+        except BaseException:
+            # Отмена во время проверки: соединение уже вынуто из _idle и не должно потеряться
+            if conn is not None and conn.busy():
+                self._abandon(conn)
+            else:
+                if conn is not None:
+                    self._idle.append(conn)
+                self._semaphore.release()
+            raise
+
+        self._acquired += 1
+        return conn
+
+    def _abandon(self, conn: _PooledConnection):
+        # Поток пула ещё выполняет отменённый вызов: соединение не возвращается в пул,
+        # а закрывается тем же потоком после вызова. Место в пуле до этого остаётся занятым
+        loop = asyncio.get_running_loop()
+
+        def close(_):
+            try:
+                self._close(conn.raw)
+            except Exception as e:
+                logger.warning(f"Error closing pooled connection: {e}")
+            try:
+                loop.call_soon_threadsafe(self._forget)
+            except RuntimeError:
+                pass  # event loop уже закрыт
+
+        logger.warning("Pooled connection abandoned: a cancelled driver call is still running")
+        conn.pending.add_done_callback(close)
+
+    def _forget(self):
+        self._size -= 1
+        self._semaphore.release()
+
+    async def release(self, conn: _PooledConnection, discard: bool = False):
+        try:
+            if discard or self._closed:
+                await self._discard(conn)
+            else:
+                conn.last_used_at = time.monotonic()
+                self._idle.append(conn)
+        finally:
+            self._semaphore.release()
+
+    @asynccontextmanager
+    async def connection(self):
+        conn = await self.acquire()
+        token = _current_connection.set(conn)
+        discard = False
+        try:
+            yield conn.raw
+        except self.connection_errors:
+            # Обрыв или сбой соединения: проверяем его, прежде чем вернуть в пул. Ошибки
+            # приложения (дубликат ключа) и отмена запроса лишнего обращения к БД не стоят
+            if self._health_check:
+                try:
+                    discard = not await self._run_on(conn, self._health_check, conn.raw)
+                except Exception:
+                    discard = True
+            raise
+        finally:
+            _current_connection.reset(token)
+            # Отмена (разрыв клиента, таймаут) не останавливает вызов в потоке пула:
+            # занятое соединение нельзя отдавать следующей задаче
+            if conn.busy():
+                self._abandon(conn)
+            else:
+                conn.pending = None
+                await self.release(conn, discard=discard)
+
+    async def close(self):
+        self._closed = True
+        while self._idle:
+            await self._discard(self._idle.pop())
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, Any]:
+        idle = len(self._idle)
+        return {
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "size": self._size,
+            "idle": idle,
+            "in_use": self._size - idle,
+            "waiting": self._waiting,
+            "acquired": self._acquired,
+            "timeouts": self._timeouts,
+            "recycled": self._recycled,
+            "failed_health_checks": self._failed_health_checks,
+            "avg_wait_ms": round(self._wait_time / self._acquired * 1000, 3) if self._acquired else 0.0,
+        }
@@ -0,0 +1,208 @@
+from abc import abstractmethod
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import logging
+import time
+from .base import DatabaseInterface, DuplicateKeyError
+from .pool import AsyncConnectionPool
+from .query import Query, QueryLike, StatementStats, as_query
+
+logger = logging.getLogger(__name__)
+
+Statement = Tuple[QueryLike, Optional[Dict]]
+
+
+class Transaction:
+    # Все запросы транзакции идут через одно соединение пула
+
+    def __init__(self, adapter: "PooledAdapter", connection):
+        self.adapter = adapter
+        self.connection = connection
+
+    async def execute(self, query: QueryLike, params: Dict = None) -> Any:
+        return await self.adapter._run(self.adapter._execute, self.connection, query, params)
+
+    async def fetch_one(self, query: QueryLike, params: Dict = None) -> Optional[Dict]:
+        result = await self.execute(query, params)
+        return result[0] if result else None
+
+    async def fetch_all(self, query: QueryLike, params: Dict = None) -> List[Dict]:
+        return await self.execute(query, params)
+
+    async def insert(self, query: QueryLike, params: Dict = None) -> int:
+        return await self.adapter._run(self.adapter._insert, self.connection, query, params)
+
+    async def executemany(self, query: QueryLike, params_seq: Iterable[Dict]) -> int:
+        return await self.adapter._run(self.adapter._executemany, self.connection, query, list(params_seq))
+
+    async def pipeline(self, statements: Sequence[Statement]) -> List[Any]:
+        return await self.adapter._run(self.adapter._pipeline, self.connection, statements)
+
+
+class PooledAdapter(DatabaseInterface):
+    # Общая часть адаптеров поверх AsyncConnectionPool; драйвер-специфичные
+    # операции реализуются в наследниках как блокирующие методы
+    driver_error: type = Exception
+    # Ошибки драйвера, после которых соединение может быть неисправно (проверяется ping)
+    connection_errors: tuple = ()
+    name = "database"
+
+    def __init__(self, pool_min_size: int = 1, pool_max_size: int = 10,
+                 pool_timeout: float = 5.0, pool_recycle: float = 3600.0):
+        self.pool = AsyncConnectionPool(
+            self._connect,
+            min_size=pool_min_size,
+            max_size=pool_max_size,
+            acquire_timeout=pool_timeout,
+            recycle=pool_recycle,
+            health_check=self._ping,
+            connection_errors=self.connection_errors
+        )
+        self.statements = StatementStats()
+        # Вызывается из event loop с длительностью каждого обращения к БД (метрики запроса)
+        self.on_query: Optional[Callable[[float], None]] = None
+
+    @abstractmethod
+    def _connect(self):
+        pass
+
+    @abstractmethod
+    def _ping(self, connection) -> bool:
+        pass
+
+    @abstractmethod
+    def _execute_query(self, connection, query: Query, params: Optional[Dict]) -> Any:
+        pass
+
+    @abstractmethod
+    def _execute_insert(self, connection, query: Query, params: Optional[Dict]) -> int:
+        pass
+
+    @abstractmethod
+    def _execute_many(self, connection, query: Query, params_seq: List[Dict]) -> int:
+        pass
+
+    @abstractmethod
+    def _begin(self, connection):
+        pass
+
+    def _duplicate_key(self, error: Exception) -> Optional[str]:
+        return None
+
+    def _commit(self, connection):
+        connection.commit()
+
+    def _rollback(self, connection):
+        connection.rollback()
+
+    def _timed(self, query: Query, func, *args) -> Any:
+        # Замер в потоке пула: учитывается только работа драйвера, без ожидания соединения
+        started = time.perf_counter()
+        failed = False
+        try:
+            return func(*args)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            self.statements.record(query.name, time.perf_counter() - started, failed)
+
+    def _execute(self, connection, query: QueryLike, params: Optional[Dict]) -> Any:
+        query = as_query(query)
+        return self._timed(query, self._execute_query, connection, query, params)
+
+    def _insert(self, connection, query: QueryLike, params: Optional[Dict]) -> int:
+        query = as_query(query)
+        return self._timed(query, self._execute_insert, connection, query, params)
+
+    def _executemany(self, connection, query: QueryLike, params_seq: List[Dict]) -> int:
+        query = as_query(query)
+        return self._timed(query, self._execute_many, connection, query, params_seq)
+
+    def _pipeline(self, connection, statements: Sequence[Statement]) -> List[Any]:
+        return [self._execute(connection, query, params) for query, params in statements]
+
+    def _atomic(self, connection, func, *args) -> Any:
+        # Транзакция целиком в одном вызове исполнителя: один переход в поток пула
+        self._begin(connection)
+        try:
+            result = func(connection, *args)
+        except BaseException:
+            self._rollback(connection)
+            raise
+        self._commit(connection)
+        return result
+
+    async def _run(self, func, *args) -> Any:
+        started = time.perf_counter()
+        try:
+            return await self.pool.run(func, *args)
+        except self.driver_error as e:
+            key = self._duplicate_key(e)
+            if key is not None:
+                raise DuplicateKeyError(key, str(e)) from e
+            raise
+        finally:
+            if self.on_query is not None:
+                self.on_query(time.perf_counter() - started)
+
+    async def disconnect(self) -> bool:
+        await self.pool.close()
+        logger.info(f"{self.name} connection pool closed")
+        return True
+
+    async def execute_query(self, query: QueryLike, params: Dict = None) -> Any:
+        try:
+            async with self.pool.connection() as connection:
+                return await self._run(self._execute, connection, query, params)
+        except self.driver_error as e:
+            logger.error(f"!!!{self.name} query error: {e}")
+            raise
+
+    async def fetch_one(self, query: QueryLike, params: Dict = None) -> Optional[Dict]:
+        result = await self.execute_query(query, params)
+        return result[0] if result else None
+
+    async def fetch_all(self, query: QueryLike, params: Dict = None) -> List[Dict]:
+        return await self.execute_query(query, params)
+
+    async def insert(self, query: QueryLike, params: Dict = None) -> int:
+        try:
+            async with self.pool.connection() as connection:
+                return await self._run(self._insert, connection, query, params)
+        except self.driver_error as e:
+            logger.error(f"!!!{self.name} insert error: {e}")
+            raise
+
+    async def executemany(self, query: QueryLike, params_seq: Iterable[Dict]) -> int:
+        try:
+            async with self.pool.connection() as connection:
+                return await self._run(self._atomic, connection, self._executemany, query, list(params_seq))
+        except self.driver_error as e:
+            logger.error(f"!!!{self.name} executemany error: {e}")
+            raise
+
+    async def pipeline(self, statements: Sequence[Statement]) -> List[Any]:
+        try:
+            async with self.pool.connection() as connection:
+                return await self._run(self._atomic, connection, self._pipeline, statements)
+        except self.driver_error as e:
+            logger.error(f"!!!{self.name} pipeline error: {e}")
+            raise
+
+    @asynccontextmanager
+    async def transaction(self):
+        async with self.pool.connection() as connection:
+            await self.pool.run(self._begin, connection)
+            try:
+                yield Transaction(self, connection)
+            except BaseException:
+                await self.pool.run(self._rollback, connection)
+                raise
+            await self.pool.run(self._commit, connection)
+
+    def pool_stats(self) -> Dict[str, Any]:
+        return self.pool.stats()
+
+    def statement_stats(self) -> Dict[str, Dict[str, Any]]:
+        return self.statements.snapshot()
@@ -0,0 +1,81 @@
+import re
+import sys
+import threading
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple, Union
+
+_PARAM_RE = re.compile(r"%\((\w+)\)s")
+_ROW_RETURNING = {"select", "show", "with", "describe", "explain"}
+_DDL = {"create", "alter", "drop", "truncate"}
+
+
+class Query:
+    # Заранее разобранный запрос: позиционный SQL для prepared statements,
+    # порядок параметров и признак того, что запрос возвращает строки
+    __slots__ = ("sql", "positional_sql", "param_names", "returns_rows", "prepare", "name")
+
+    def __init__(self, sql: str, name: Optional[str] = None, returns_rows: Optional[bool] = None):
+        keyword = sql.split(None, 1)[0].lower() if sql.strip() else ""
+        self.sql = sql
+        # intern: одинаковый текст - один объект, драйвер не переподготавливает запрос
+        self.positional_sql = sys.intern(_PARAM_RE.sub("?", sql))
+        self.param_names = tuple(_PARAM_RE.findall(sql))
+        self.returns_rows = keyword in _ROW_RETURNING if returns_rows is None else returns_rows
+        self.prepare = keyword not in _DDL
+        self.name = name or " ".join(sql.split())[:100]
+
+    def bind(self, params: Optional[Dict]) -> Tuple:
+        if not self.param_names:
+            return ()
+        return tuple(params[name] for name in self.param_names)
+
+    def __repr__(self) -> str:
+        return f"Query({self.name!r})"
+
+
+QueryLike = Union[str, Query]
+
+
+@lru_cache(maxsize=512)
+def compile_query(sql: str) -> Query:
+    return Query(sql)
+
+
+def as_query(query: QueryLike) -> Query:
+    return query if isinstance(query, Query) else compile_query(query)
+
+
+class StatementStats:
+    # Счётчики вызовов и задержек по каждому запросу; обновляются из потоков пула
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, list] = {}
+
+    def record(self, name: str, elapsed: float, failed: bool):
+        with self._lock:
+            entry = self._stats.get(name)
+            if entry is None:
+                entry = self._stats[name] = [0, 0, 0.0, 0.0]
+            entry[0] += 1
+            entry[1] += failed
+            entry[2] += elapsed
+            entry[3] = max(entry[3], elapsed)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            items = sorted(self._stats.items(), key=lambda item: item[1][2], reverse=True)
+            return {
+                name: {
+                    "calls": calls,
+                    "errors": errors,
+                    "total_ms": round(total * 1000, 3),
+                    "avg_ms": round(total / calls * 1000, 3),
+                    "max_ms": round(longest * 1000, 3),
+                }
+                for name, (calls, errors, total, longest) in items
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
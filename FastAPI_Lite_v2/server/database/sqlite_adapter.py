@@ -0,0 +1,105 @@
+import re
+import sqlite3
+from typing import Any, Dict, List, Optional
+import logging
+from .pooled_adapter import PooledAdapter
+from .query import Query
+
+logger = logging.getLogger(__name__)
+
+# Схема users, совместимая с MySQL-версией из UserRepository (NOCASE - как
+# регистронезависимая collation MySQL по умолчанию)
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE NOT NULL COLLATE NOCASE,
+    email TEXT UNIQUE NOT NULL COLLATE NOCASE,
+    full_name TEXT,
+    hashed_password TEXT NOT NULL,
+    role TEXT NOT NULL DEFAULT 'user' CHECK (role IN ('guest', 'user', 'admin')),
+    is_active BOOLEAN NOT NULL DEFAULT TRUE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_users_active_role ON users (is_active, role, id);
+"""
+
+# "UNIQUE constraint failed: users.email"
+_UNIQUE_RE = re.compile(r"UNIQUE constraint failed: \w+\.(\w+)")
+
+
+def _dict_factory(cursor, row) -> Dict[str, Any]:
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+class SQLiteAdapter(PooledAdapter):
+    # Локальная замена MySQLAdapter для тестов и бенчмарков: тот же интерфейс
+    # и тот же пул; выполняется позиционный SQL из Query, подготовленные
+    # запросы кэширует сам sqlite3 (cached_statements)
+    driver_error = sqlite3.Error
+    connection_errors = (sqlite3.OperationalError, sqlite3.InterfaceError)
+    name = "SQLite"
+
+    def __init__(self, path: str, pool_min_size: int = 1, pool_max_size: int = 10,
+                 pool_timeout: float = 5.0, pool_recycle: float = 3600.0):
+        self.path = path
+        super().__init__(pool_min_size, pool_max_size, pool_timeout, pool_recycle)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None,
+                                     cached_statements=256)
+        connection.row_factory = _dict_factory
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connection.execute("PRAGMA busy_timeout = 5000")
+        return connection
+
+    def _ping(self, connection: sqlite3.Connection) -> bool:
+        try:
+            connection.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _begin(self, connection: sqlite3.Connection):
+        connection.execute("BEGIN IMMEDIATE")
+
+    def _execute_query(self, connection: sqlite3.Connection, query: Query, params: Optional[Dict]) -> Any:
+        cursor = connection.execute(query.positional_sql, query.bind(params))
+        try:
+            if query.returns_rows:
+                return cursor.fetchall()
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+    def _execute_insert(self, connection: sqlite3.Connection, query: Query, params: Optional[Dict]) -> int:
+        cursor = connection.execute(query.positional_sql, query.bind(params))
+        try:
+            return cursor.lastrowid
+        finally:
+            cursor.close()
+
+    def _duplicate_key(self, error: Exception) -> Optional[str]:
+        if not isinstance(error, sqlite3.IntegrityError):
+            return None
+        match = _UNIQUE_RE.search(str(error))
+        return match.group(1) if match else None
+
+    def _execute_many(self, connection: sqlite3.Connection, query: Query, params_seq: List[Dict]) -> int:
+        cursor = connection.executemany(query.positional_sql, [query.bind(params) for params in params_seq])
+        try:
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+    async def connect(self) -> bool:
+        try:
+            await self.pool.open()
+            async with self.pool.connection() as connection:
+                await self.pool.run(connection.executescript, SQLITE_SCHEMA)
+            logger.info(f"Connected to SQLite database: {self.path}")
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"SQLite connection error: {e}")
+        return False
@@ -1,8 +1,9 @@
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Request, Depends, HTTPException
+from typing import Optional
+from fastapi import FastAPI, Request, Depends, HTTPException, Query
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
 import uvicorn
 import traceback
 
@@ -10,14 +11,46 @@ from config import settings
 from client.main import MarketplaceClient
 from database.base import DatabaseManager
 from database.mysql_adapter import MySQLAdapter
-from repositories.user_repository import UserRepository
-from models.user import UserCreate, UserLogin
+from repositories.user_repository import UserRepository, UserAlreadyExistsError, DEBUG_USER_COLUMNS
+from models.user import UserCreate, UserLogin, UserManager, UserRole
+from utils.cache import LRUCacheBackend, ReadThroughCache, RedisCacheBackend
+from utils.metrics import MetricsMiddleware, metrics_registry, instrument_adapter
+from utils.password_hasher import PasswordHasher, HashingOverloadedError
 
 client = MarketplaceClient()
 db_manager = DatabaseManager()
+password_hasher = PasswordHasher(
+    UserManager.hash_password,
+    UserManager.verify_password,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_concurrency=settings.PASSWORD_HASH_MAX_CONCURRENCY,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE
+)
 user_repo = None
 
 
+def create_user_cache() -> Optional[ReadThroughCache]:
+    if settings.USER_CACHE_BACKEND == "none":
+        return None
+    if settings.USER_CACHE_BACKEND == "redis":
+        backend = RedisCacheBackend.from_url(settings.REDIS_URL, prefix="marketplace:")
+    else:
+        backend = LRUCacheBackend(settings.USER_CACHE_MAX_SIZE)
+    return ReadThroughCache(backend, ttl=settings.USER_CACHE_TTL, negative_ttl=settings.USER_CACHE_NEGATIVE_TTL)
+
+
+user_cache = create_user_cache()
+
+USER_STATUS_FILTERS = {"active": True, "inactive": False, "all": None}
+# Размер страницы, если передан только cursor
+USER_PAGE_SIZE = 50
+
+DUPLICATE_USER_MESSAGES = {
+    "email": "Email уже зарегистрирован",
+    "username": "Имя пользователя уже занято"
+}
+
+
 @asynccontextmanager
 async def lifespan(main: FastAPI):
     print("Starting Marketplace server...")
@@ -29,12 +62,23 @@ async def lifespan(main: FastAPI):
             port=settings.DB_PORT,
             user=settings.DB_USER,
             password=settings.DB_PASSWORD,
-            database=settings.DB_NAME
+            database=settings.DB_NAME,
+            pool_min_size=settings.DB_POOL_MIN_SIZE,
+            pool_max_size=settings.DB_POOL_MAX_SIZE,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            statement_cache_size=settings.DB_STATEMENT_CACHE_SIZE
         )
+        instrument_adapter(db_adapter)
 
         if await db_manager.initialize(db_adapter):
             global user_repo
-            user_repo = UserRepository(db_manager)
+            user_repo = UserRepository(
+                db_manager,
+                password_hasher,
+                count_ttl=settings.USER_COUNT_CACHE_TTL,
+                cache=user_cache
+            )
             await user_repo.initialize()
 
             user_count = await user_repo.get_user_count()
@@ -55,6 +99,9 @@ async def lifespan(main: FastAPI):
 
     # Shutdown
     await db_manager.close()
+    if user_cache is not None:
+        await user_cache.close()
+    password_hasher.shutdown()
     print("Shutting down Marketplace server...")
 
 
@@ -65,6 +112,8 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+app.add_middleware(MetricsMiddleware, registry=metrics_registry)
+
 app.mount("/static", StaticFiles(directory=settings.STATIC_DIR), name="static")
 
 templates = Jinja2Templates(directory=settings.TEMPLATES_DIR)
@@ -98,25 +147,18 @@ async def register_user(
 ):
 
     try:
-        existing_user = await user_repo.get_by_email(user_data.email)
-        if existing_user:
-            raise HTTPException(status_code=400, detail="Email уже зарегистрирован")
-
-        existing_username = await user_repo.get_by_username(user_data.username)
-        if existing_username:
-            raise HTTPException(status_code=400, detail="Имя пользователя уже занято")
-
-        user = await user_repo.create(user_data)
-        if user:
-            return {
-                "message": "Пользователь успешно создан",
-                "user_id": user.id,
-                "username": user.username
-            }
-        else:
-            print(f"Failed to create user: {user_data.username}")
-            raise HTTPException(status_code=500, detail="Ошибка при создании пользователя")
+        user = await user_repo.register(user_data)
+        return {
+            "message": "Пользователь успешно создан",
+            "user_id": user.id,
+            "username": user.username
+        }
 
+    except UserAlreadyExistsError as e:
+        raise HTTPException(status_code=400, detail=DUPLICATE_USER_MESSAGES[e.field])
+    except HashingOverloadedError:
+        raise HTTPException(status_code=503, detail="Сервер перегружен, повторите попытку позже",
+                            headers={"Retry-After": "1"})
     except HTTPException:
         raise
     except Exception as e:
@@ -148,6 +190,9 @@ async def login_user(
             "email": user.email
         }
 
+    except HashingOverloadedError:
+        raise HTTPException(status_code=503, detail="Сервер перегружен, повторите попытку позже",
+                            headers={"Retry-After": "1"})
     except HTTPException:
         raise
     except Exception as e:
@@ -156,50 +201,103 @@ async def login_user(
         raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
 
 
+class UserListParams:
+
+    def __init__(
+            self,
+            limit: Optional[int] = Query(None, ge=1, le=500,
+                                         description="размер страницы; без limit и cursor - весь список, как раньше"),
+            cursor: Optional[int] = Query(None, ge=0, description="id последнего пользователя предыдущей страницы"),
+            role: Optional[UserRole] = None,
+            status: str = Query("active", pattern="^(active|inactive|all)$"),
+            include_total: bool = False
+    ):
+        # Пагинация включается явно: старые клиенты получают прежний полный список
+        self.paginated = limit is not None or cursor is not None
+        self.limit = limit or (USER_PAGE_SIZE if self.paginated else None)
+        self.cursor = cursor or 0
+        self.role = role
+        self.is_active = USER_STATUS_FILTERS[status]
+        self.include_total = include_total
+
+
+async def list_users_page(user_repo: UserRepository, params: UserListParams, columns=None) -> dict:
+    kwargs = {"columns": columns} if columns else {}
+    rows, next_cursor = await user_repo.list_users(
+        params.limit, params.cursor, params.role, params.is_active, **kwargs
+    )
+    page = {"users": rows}
+    if params.paginated:
+        page["next_cursor"] = next_cursor
+    if params.include_total:
+        page["total"] = await user_repo.count_users(params.role, params.is_active)
+    return page
+
+
 @app.get("/api/users")
-async def get_users(user_repo: UserRepository = Depends(get_user_repository)):
+async def get_users(
+        params: UserListParams = Depends(),
+        user_repo: UserRepository = Depends(get_user_repository)
+):
     try:
-        users = await user_repo.get_all()
-        return {
-            "users": [
-                {
-                    "id": u.id,
-                    "username": u.username,
-                    "role": u.role,
-                    "email": u.email
-                } for u in users
-            ]
-        }
+        return await list_users_page(user_repo, params)
     except Exception as e:
         print(f"Error getting users: {e}")
         raise HTTPException(status_code=500, detail="Ошибка при получении пользователей")
 
 
 @app.get("/api/debug/users")
-async def debug_users(user_repo: UserRepository = Depends(get_user_repository)):
+async def debug_users(
+        params: UserListParams = Depends(),
+        user_repo: UserRepository = Depends(get_user_repository)
+):
     try:
-        users = await user_repo.get_all()
+        page = await list_users_page(user_repo, params, DEBUG_USER_COLUMNS)
         user_data = []
-        for user in users:
-            user_data.append({
-                "id": user.id,
-                "username": user.username,
-                "email": user.email,
-                "role": user.role,
-                "is_active": user.is_active,
-                "hashed_password": user.hashed_password[:20] + "..." if user.hashed_password else None,
-                "created_at": str(user.created_at),
-                "updated_at": str(user.updated_at)
-            })
-
-        return {
-            "total_users": len(users),
+        for row in page["users"]:
+            prefix = row.pop("hashed_password_prefix")
+            row["is_active"] = bool(row["is_active"])
+            row["hashed_password"] = prefix + "..." if prefix else None
+            row["created_at"] = str(row["created_at"])
+            row["updated_at"] = str(row["updated_at"])
+            user_data.append(row)
+
+        response = {
+            "total_users": await user_repo.count_users(params.role, params.is_active),
             "users": user_data
         }
+        if params.paginated:
+            response["next_cursor"] = page["next_cursor"]
+        return response
     except Exception as e:
         return {"error": str(e)}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/debug/pool")
+async def debug_pool():
+    return db_manager.pool_stats()
+
+
+@app.get("/api/debug/statements")
+async def debug_statements():
+    return db_manager.statement_stats()
+
+
+@app.get("/api/debug/cache")
+async def debug_cache():
+    return user_cache.stats() if user_cache is not None else {"backend": "none"}
+
+
+@app.get("/api/debug/hasher")
+async def debug_hasher():
+    return password_hasher.stats()
+
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
@@ -2,8 +2,7 @@ from typing import Optional, Dict, Any
 from enum import Enum
 from pydantic import BaseModel, EmailStr, validator
 from datetime import datetime
-import hashlib
-import secrets
+from utils.password_schemes import password_registry
 
 
 class UserRole(str, Enum):
@@ -58,19 +57,15 @@ class UserManager:
 
     @staticmethod
     def hash_password(password: str) -> str:
-        salt = secrets.token_hex(16)
-        return f"{salt}${hashlib.sha256((salt + password).encode()).hexdigest()}"
+        return password_registry.hash(password)
 
     @staticmethod
     def verify_password(plain_password: str, hashed_password: str) -> bool:
-        if not hashed_password or '$' not in hashed_password:
-            return False
-
-        try:
-            salt, hash_value = hashed_password.split('$')
-            return hashlib.sha256((salt + plain_password).encode()).hexdigest() == hash_value
-        except (ValueError, AttributeError):
-            return False
+        return password_registry.verify(plain_password, hashed_password)
+
+    @staticmethod
+    def needs_rehash(hashed_password: str) -> bool:
+        return password_registry.needs_rehash(hashed_password)
 
     @staticmethod
     def user_to_dict(user: UserInDB) -> Dict[str, Any]:
@@ -1,16 +1,102 @@
-from typing import Optional, List
+from typing import Optional, List, Dict, Tuple, Sequence
 import logging
-from server.database.base import DatabaseManager
-from server.models.user import UserInDB, UserCreate, UserRole, UserManager
-from server.utils.data_utils import prepare_user_data
+import time
+from database.base import DatabaseManager, DuplicateKeyError
+from database.query import Query
+from models.user import UserInDB, UserCreate, UserRole, UserManager
+from utils.data_utils import to_datetime
+from utils.cache import ReadThroughCache
+from utils.password_hasher import PasswordHasher, HashingOverloadedError
 
 logger = logging.getLogger(__name__)
 
+UNIQUE_USER_FIELDS = ("email", "username")
+
+USER_COLUMNS = (
+    "id", "username", "email", "full_name", "hashed_password",
+    "role", "is_active", "created_at", "updated_at"
+)
+USER_SELECT = f"SELECT {', '.join(USER_COLUMNS)} FROM users"
+
+# Проекции для списков: только поля, которые уходят в ответ
+PUBLIC_USER_COLUMNS = ("id", "username", "role", "email")
+DEBUG_USER_COLUMNS = (
+    "id", "username", "email", "role", "is_active",
+    "SUBSTR(hashed_password, 1, 20) AS hashed_password_prefix",
+    "created_at", "updated_at"
+)
+
+# Горячие запросы разбираются один раз при импорте; name - ключ в статистике запросов
+INSERT_USER = Query("""
+    INSERT INTO users (username, email, full_name, hashed_password, role)
+    VALUES (%(username)s, %(email)s, %(full_name)s, %(hashed_password)s, %(role)s)
+""", name="users.insert")
+SELECT_USER_BY_ID = Query(f"{USER_SELECT} WHERE id = %(id)s", name="users.by_id")
+SELECT_USER_BY_EMAIL = Query(f"{USER_SELECT} WHERE email = %(email)s", name="users.by_email")
+SELECT_USER_BY_USERNAME = Query(f"{USER_SELECT} WHERE username = %(username)s", name="users.by_username")
+SELECT_ACTIVE_USERS = Query(f"{USER_SELECT} WHERE is_active = TRUE", name="users.all_active")
+UPDATE_USER_ROLE = Query("UPDATE users SET role = %(role)s WHERE id = %(id)s", name="users.update_role")
+UPDATE_PASSWORD_HASH = Query("""
+    UPDATE users SET hashed_password = %(new_hash)s
+    WHERE id = %(id)s AND hashed_password = %(old_hash)s
+""", name="users.upgrade_password_hash")
+
+
+def user_from_row(row: Dict) -> UserInDB:
+    # Строки из БД уже проверены схемой таблицы: model_construct без валидации
+    # и без промежуточных копий словаря
+    return UserInDB.model_construct(
+        id=row["id"],
+        username=row["username"],
+        email=row["email"],
+        full_name=row["full_name"],
+        hashed_password=row["hashed_password"],
+        role=UserRole(row["role"]),
+        is_active=bool(row["is_active"]),
+        created_at=to_datetime(row["created_at"]),
+        updated_at=to_datetime(row["updated_at"])
+    )
+
+
+def user_cache_keys(user_id: Optional[int] = None, email: Optional[str] = None,
+                    username: Optional[str] = None) -> List[str]:
+    # email и username сравниваются без учёта регистра (collation MySQL), как и ключи
+    keys = []
+    if user_id is not None:
+        keys.append(f"user:id:{user_id}")
+    if email is not None:
+        keys.append(f"user:email:{email.lower()}")
+    if username is not None:
+        keys.append(f"user:username:{username.lower()}")
+    return keys
+
+
+class UserAlreadyExistsError(ValueError):
+
+    def __init__(self, field: str):
+        super().__init__(f"User with this {field} already exists")
+        self.field = field
+
 
 class UserRepository:
 
-    def __init__(self, db: DatabaseManager):
+    def __init__(self, db: DatabaseManager, hasher: Optional[PasswordHasher] = None, count_ttl: float = 30.0,
+                 cache: Optional[ReadThroughCache] = None):
         self.db = db
+        self.hasher = hasher
+        self.count_ttl = count_ttl
+        self.cache = cache
+        self._counts: Dict[Tuple, Tuple[int, float]] = {}
+
+    async def _hash_password(self, password: str) -> str:
+        if self.hasher is None:
+            return UserManager.hash_password(password)
+        return await self.hasher.hash(password)
+
+    async def _verify_password(self, password: str, hashed_password: str) -> bool:
+        if self.hasher is None:
+            return UserManager.verify_password(password, hashed_password)
+        return await self.hasher.verify(password, hashed_password)
 
     async def initialize(self):
         await self._init_tables()
@@ -26,7 +112,8 @@ class UserRepository:
             role ENUM('guest', 'user', 'admin') DEFAULT 'user',
             is_active BOOLEAN DEFAULT TRUE,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            INDEX idx_users_active_role (is_active, role, id)
         )
         """
 
@@ -44,8 +131,8 @@ class UserRepository:
         admin_password = "admin123"
 
         try:
-            existing_admin = await self.get_by_email(admin_email)
-            if existing_admin:
+            # Обычный старт: админ уже есть, и хэш (полная стоимость scrypt/bcrypt) не нужен
+            if await self.db.fetch_one(SELECT_USER_BY_EMAIL, {"email": admin_email}):
                 logger.info("Admin user already exists")
                 return
 
@@ -55,24 +142,22 @@ class UserRepository:
                 full_name="System Administrator",
                 password=admin_password
             )
+            hashed_password = await self._hash_password(admin_user.password)
+            query, params = self._insert_statement(admin_user, UserRole.ADMIN, hashed_password)
+            # Если админа за это время создал другой воркер, INSERT упрётся в UNIQUE-индекс
+            user_id = await self.db.insert(query, params)
 
-            result = await self.create(admin_user, UserRole.ADMIN)
-            if result:
-                logger.info("Default admin user created")
-            else:
-                logger.error("Failed to create default admin user")
+            self._invalidate_counts()
+            await self._invalidate_user(user_cache_keys(user_id, params["email"], params["username"]))
+            logger.info("Default admin user created")
 
+        except DuplicateKeyError:
+            logger.info("Admin user already exists")
         except Exception as e:
             logger.error(f"Error ensuring admin user: {e}")
 
-    async def create(self, user: UserCreate, role: UserRole = UserRole.USER) -> Optional[UserInDB]:
-        hashed_password = UserManager.hash_password(user.password)
-
-        query = """
-        INSERT INTO users (username, email, full_name, hashed_password, role)
-        VALUES (%(username)s, %(email)s, %(full_name)s, %(hashed_password)s, %(role)s)
-        """
-
+    @staticmethod
+    def _insert_statement(user: UserCreate, role: UserRole, hashed_password: str) -> Tuple[Query, Dict]:
         params = {
             "username": user.username,
             "email": user.email,
@@ -80,44 +165,92 @@ class UserRepository:
             "hashed_password": hashed_password,
             "role": role
         }
+        return INSERT_USER, params
 
+    async def create(self, user: UserCreate, role: UserRole = UserRole.USER) -> Optional[UserInDB]:
         try:
-            result = await self.db.execute(query, params)
-            if result:
-                return await self.get_by_email(user.email)
+            return await self.register(user, role)
+        except HashingOverloadedError:
+            raise
         except Exception as e:
             logger.error(f"Error creating user {user.username}: {e}")
         return None
 
+    async def register(self, user: UserCreate, role: UserRole = UserRole.USER) -> UserInDB:
+        # Один INSERT: уникальность email/username проверяют UNIQUE-индексы,
+        # строка пользователя собирается из параметров и lastrowid
+        hashed_password = await self._hash_password(user.password)
+        query, params = self._insert_statement(user, role, hashed_password)
+        try:
+            user_id = await self.db.insert(query, params)
+        except DuplicateKeyError as e:
+            if e.key in UNIQUE_USER_FIELDS:
+                raise UserAlreadyExistsError(e.key) from e
+            raise
+        self._invalidate_counts()
+        # Сбрасывает и закэшированное "не найдено" от проверок перед регистрацией
+        await self._invalidate_user(user_cache_keys(user_id, params["email"], params["username"]))
+
+        return UserInDB(
+            id=user_id,
+            username=params["username"],
+            email=params["email"],
+            full_name=params["full_name"],
+            hashed_password=params["hashed_password"],
+            role=role,
+            is_active=True
+        )
+
+    async def create_many(self, users: Sequence[UserCreate], role: UserRole = UserRole.USER) -> int:
+        # Массовое заполнение (сиды, импорт): один executemany в одной транзакции,
+        # mysql.connector сворачивает его в многострочный INSERT
+        statements = [
+            self._insert_statement(user, role, await self._hash_password(user.password))
+            for user in users
+        ]
+        if not statements:
+            return 0
+        created = await self.db.executemany(INSERT_USER, [params for _, params in statements])
+        self._invalidate_counts()
+        await self._invalidate_user([
+            key for _, params in statements
+            for key in user_cache_keys(email=params["email"], username=params["username"])
+        ])
+        return created
+
+    async def _fetch_user(self, query: Query, params: Dict) -> Optional[UserInDB]:
+        result = await self.db.fetch_one(query, params)
+        return user_from_row(result) if result else None
+
+    async def _get_user(self, key: str, query: Query, params: Dict) -> Optional[UserInDB]:
+        # Ошибка БД пробрасывается из loader и поэтому не кэшируется как "не найдено"
+        if self.cache is None:
+            return await self._fetch_user(query, params)
+        return await self.cache.get_or_load(key, lambda: self._fetch_user(query, params))
+
+    async def _invalidate_user(self, keys: List[str]):
+        if self.cache is not None:
+            await self.cache.invalidate(*keys)
+
     async def get_by_id(self, user_id: int) -> Optional[UserInDB]:
-        query = "SELECT * FROM users WHERE id = %(id)s"
         try:
-            result = await self.db.fetch_one(query, {"id": user_id})
-            if result:
-                prepared_data = prepare_user_data(result)
-                return UserInDB(**prepared_data)
+            return await self._get_user(user_cache_keys(user_id=user_id)[0], SELECT_USER_BY_ID, {"id": user_id})
         except Exception as e:
             logger.error(f"Error getting user by id {user_id}: {e}")
         return None
 
     async def get_by_email(self, email: str) -> Optional[UserInDB]:
-        query = "SELECT * FROM users WHERE email = %(email)s"
         try:
-            result = await self.db.fetch_one(query, {"email": email})
-            if result:
-                prepared_data = prepare_user_data(result)
-                return UserInDB(**prepared_data)
+            return await self._get_user(user_cache_keys(email=email)[0], SELECT_USER_BY_EMAIL, {"email": email})
         except Exception as e:
             logger.error(f"Error getting user by email {email}: {e}")
         return None
 
     async def get_by_username(self, username: str) -> Optional[UserInDB]:
-        query = "SELECT * FROM users WHERE username = %(username)s"
         try:
-            result = await self.db.fetch_one(query, {"username": username})
-            if result:
-                prepared_data = prepare_user_data(result)
-                return UserInDB(**prepared_data)
+            return await self._get_user(
+                user_cache_keys(username=username)[0], SELECT_USER_BY_USERNAME, {"username": username}
+            )
         except Exception as e:
             logger.error(f"Error getting user by username {username}: {e}")
         return None
@@ -125,46 +258,123 @@ class UserRepository:
     async def authenticate(self, email: str, password: str) -> Optional[UserInDB]:
         try:
             user = await self.get_by_email(email)
-            if user and UserManager.verify_password(password, user.hashed_password):
+            if user and await self._verify_password(password, user.hashed_password):
+                if UserManager.needs_rehash(user.hashed_password):
+                    await self._upgrade_password_hash(user, password)
                 return user
             elif user:
                 logger.warning(f"Password verification failed for {email}")
             else:
                 logger.warning(f"User not found: {email}")
+        except HashingOverloadedError:
+            raise
         except Exception as e:
             logger.error(f"Authentication error for {email}: {e}")
         return None
 
+    async def _upgrade_password_hash(self, user: UserInDB, password: str):
+        # Пароль известен только при входе: перехэшируем устаревший хэш текущей схемой
+        try:
+            new_hash = await self._hash_password(password)
+            await self.db.execute(UPDATE_PASSWORD_HASH, {"new_hash": new_hash, "id": user.id, "old_hash": user.hashed_password})
+            # Пользователь мог быть взят из кэша: следующие чтения должны увидеть новый хэш
+            await self._invalidate_user(user_cache_keys(user.id, user.email, user.username))
+            user.hashed_password = new_hash
+            logger.info(f"Password hash upgraded for user {user.id}")
+        except Exception as e:
+            logger.warning(f"Password hash upgrade failed for user {user.id}: {e}")
+
     async def get_all(self) -> List[UserInDB]:
-        query = "SELECT * FROM users WHERE is_active = TRUE"
         try:
-            results = await self.db.fetch_all(query)
-            users = []
-            for result in results:
-                try:
-                    prepared_data = prepare_user_data(result)
-                    users.append(UserInDB(**prepared_data))
-                except Exception as e:
-                    logger.error(f"Error parsing user data: {e}")
-            return users
+            results = await self.db.fetch_all(SELECT_ACTIVE_USERS)
+            return [user_from_row(result) for result in results]
         except Exception as e:
             logger.error(f"Error getting all users: {e}")
             return []
 
     async def update_role(self, user_id: int, new_role: UserRole) -> bool:
-        query = "UPDATE users SET role = %(role)s WHERE id = %(id)s"
         try:
-            result = await self.db.execute(query, {"role": new_role, "id": user_id})
-            return result > 0
+            # UPDATE и чтение строки одним пайплайном: одно соединение, один переход
+            # в поток пула; по строке находятся все ключи кэша пользователя
+            updated, rows = await self.db.pipeline([
+                (UPDATE_USER_ROLE, {"role": new_role, "id": user_id}),
+                (SELECT_USER_BY_ID, {"id": user_id})
+            ])
+            self._invalidate_counts()
+            if updated > 0 and self.cache is not None:
+                user = user_from_row(rows[0]) if rows else None
+                await self._invalidate_user(
+                    user_cache_keys(user_id, user.email, user.username) if user else user_cache_keys(user_id)
+                )
+            return updated > 0
         except Exception as e:
             logger.error(f"Error updating user role {user_id}: {e}")
             return False
 
+    @staticmethod
+    def _user_filters(role: Optional[UserRole], is_active: Optional[bool]) -> Tuple[List[str], Dict]:
+        conditions, params = [], {}
+        if is_active is not None:
+            conditions.append("is_active = %(is_active)s")
+            params["is_active"] = is_active
+        if role is not None:
+            conditions.append("role = %(role)s")
+            params["role"] = UserRole(role).value
+        return conditions, params
+
+    async def list_users(
+            self,
+            limit: Optional[int] = 50,
+            after_id: int = 0,
+            role: Optional[UserRole] = None,
+            is_active: Optional[bool] = True,
+            columns: Sequence[str] = PUBLIC_USER_COLUMNS
+    ) -> Tuple[List[Dict], Optional[int]]:
+        # Keyset-пагинация по id: стоимость страницы не зависит от её номера.
+        # Берём на одну строку больше, чтобы понять, есть ли следующая страница;
+        # limit=None - весь список без пагинации
+        conditions, params = self._user_filters(role, is_active)
+        conditions.append("id > %(after_id)s")
+        params["after_id"] = after_id
+        limit_clause = ""
+        if limit is not None:
+            limit_clause = " LIMIT %(limit)s"
+            params["limit"] = limit + 1
+
+        query = f"""
+        SELECT {', '.join(columns)} FROM users
+        WHERE {' AND '.join(conditions)}
+        ORDER BY id{limit_clause}
+        """
+        rows = await self.db.fetch_all(query, params)
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = rows[-1]["id"]
+        return rows, next_cursor
+
+    def _invalidate_counts(self):
+        self._counts.clear()
+
+    async def count_users(self, role: Optional[UserRole] = None, is_active: Optional[bool] = None) -> int:
+        # COUNT(*) - полный проход по индексу; результат кэшируется на count_ttl
+        # секунд и сбрасывается при регистрации и смене роли
+        key = (role, is_active)
+        cached = self._counts.get(key)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+
+        conditions, params = self._user_filters(role, is_active)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        result = await self.db.fetch_one(f"SELECT COUNT(*) AS count FROM users{where}", params)
+        count = result["count"] if result else 0
+        self._counts[key] = (count, time.monotonic() + self.count_ttl)
+        return count
+
     async def get_user_count(self) -> int:
-        query = "SELECT COUNT(*) as count FROM users"
         try:
-            result = await self.db.fetch_one(query)
-            return result['count'] if result else 0
+            return await self.count_users()
         except Exception as e:
             logger.error(f"Error getting user count: {e}")
             return 0
@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import pickle
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Отличает "ключа нет в кэше" от закэшированного None (негативный кэш)
+MISSING = object()
+
+
+class CacheBackend(ABC):
+
+    @abstractmethod
+    async def get(self, key: str) -> Any:
+        # Возвращает MISSING, если ключа нет или он устарел
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float):
+        pass
+
+    @abstractmethod
+    async def delete(self, *keys: str):
+        pass
+
+    @abstractmethod
+    async def clear(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class LRUCacheBackend(CacheBackend):
+    # Кэш в памяти процесса: у каждой записи свой срок жизни, при
+    # переполнении вытесняется давно не читанная запись
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._data: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._evicted = 0
+
+    async def get(self, key: str) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return MISSING
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return MISSING
+        self._data.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: float):
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self._evicted += 1
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._data.pop(key, None)
+
+    async def clear(self):
+        self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", "size": len(self._data), "max_size": self.max_size, "evicted": self._evicted}
+
+
+class RedisCacheBackend(CacheBackend):
+    # Общий кэш для нескольких процессов uvicorn. Подходит любой клиент с
+    # интерфейсом redis.asyncio (Redis, KeyDB, Dragonfly). pickle допустим
+    # только для доверенного локального сервера
+
+    def __init__(self, client, prefix: str = "cache:"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, prefix: str = "cache:") -> "RedisCacheBackend":
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("Redis cache backend requires the 'redis' package: pip install redis")
+        return cls(redis.from_url(url), prefix)
+
+    async def get(self, key: str) -> Any:
+        data = await self.client.get(self.prefix + key)
+        return MISSING if data is None else pickle.loads(data)
+
+    async def set(self, key: str, value: Any, ttl: float):
+        await self.client.set(self.prefix + key, pickle.dumps(value), px=max(1, int(ttl * 1000)))
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self.client.delete(*(self.prefix + key for key in keys))
+
+    async def clear(self):
+        keys = [key async for key in self.client.scan_iter(match=self.prefix + "*")]
+        if keys:
+            await self.client.delete(*keys)
+
+    async def close(self):
+        await self.client.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis", "prefix": self.prefix}
+
+
+class ReadThroughCache:
+    # Read-through поверх CacheBackend: промах загружается через loader и
+    # кладётся в кэш, "не найдено" (None) кэшируется на negative_ttl.
+    # Одновременные промахи по одному ключу ждут одну загрузку (single-flight)
+
+    def __init__(self, backend: CacheBackend, ttl: float = 60.0, negative_ttl: float = 5.0):
+        self.backend = backend
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        self._hits = 0
+        self._negative_hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._invalidations = 0
+        self._errors = 0
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: Optional[float] = None) -> Any:
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            # Недоступный кэш не должен ронять чтение: идём в БД напрямую
+            logger.warning(f"Cache get failed for {key}: {e}")
+            self._errors += 1
+            value = MISSING
+        if value is not MISSING:
+            if value is None:
+                self._negative_hits += 1
+            else:
+                self._hits += 1
+            return value
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self._coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+            # Отменили запрос, который загружал ключ (клиент отключился) - грузим сами
+            return await self.get_or_load(key, loader, ttl)
+
+        self._misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            self._drop_inflight(key, future)
+            future.cancel()
+            raise
+        except Exception as e:
+            # Ошибка загрузки не кэшируется, ожидающие получают то же исключение
+            self._drop_inflight(key, future)
+            future.set_exception(e)
+            future.exception()
+            raise
+
+        # Если ключ инвалидировали во время загрузки, результат мог устареть
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+            try:
+                await self.backend.set(key, value, self.negative_ttl if value is None else (ttl or self.ttl))
+            except Exception as e:
+                logger.warning(f"Cache set failed for {key}: {e}")
+                self._errors += 1
+        future.set_result(value)
+        return value
+
+    def _drop_inflight(self, key: str, future: asyncio.Future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+
+    async def invalidate(self, *keys: str):
+        for key in keys:
+            self._inflight.pop(key, None)
+        self._invalidations += len(keys)
+        try:
+            await self.backend.delete(*keys)
+        except Exception as e:
+            logger.warning(f"Cache invalidation failed for {keys}: {e}")
+            self._errors += 1
+
+    async def clear(self):
+        self._inflight.clear()
+        await self.backend.clear()
+
+    async def close(self):
+        await self.backend.close()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._hits + self._negative_hits + self._misses + self._coalesced
+        return {
+            **self.backend.stats(),
+            "ttl": self.ttl,
+            "negative_ttl": self.negative_ttl,
+            "hits": self._hits,
+            "negative_hits": self._negative_hits,
+            "misses": self._misses,
+            "coalesced": self._coalesced,
+            "inflight": len(self._inflight),
+            "invalidations": self._invalidations,
+            "errors": self._errors,
+            "hit_ratio": round((lookups - self._misses) / lookups, 3) if lookups else 0.0,
+        }
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 
 def convert_datetime_fields(data: Dict[str, Any]) -> Dict[str, Any]:
@@ -13,4 +13,11 @@ def convert_datetime_fields(data: Dict[str, Any]) -> Dict[str, Any]:
 
 
 def prepare_user_data(user_data: Dict[str, Any]) -> Dict[str, Any]:
-    return convert_datetime_fields(user_data)
\ No newline at end of file
+    return convert_datetime_fields(user_data)
+
+
+def to_datetime(value: Any) -> Optional[datetime]:
+    # MySQL отдаёт datetime, SQLite - строку "YYYY-MM-DD HH:MM:SS"
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
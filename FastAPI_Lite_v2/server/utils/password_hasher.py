@@ -0,0 +1,107 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+class HashingOverloadedError(RuntimeError):
+    pass
+
+
+def _timed_call(func: Callable, *args) -> tuple:
+    # Выполняется в воркере: avg_run_ms не включает ожидание в очереди
+    started = time.perf_counter()
+    return func(*args), time.perf_counter() - started
+
+
+class PasswordHasher:
+    # Схемы хэширования (utils/password_schemes.py) подставляет UserManager; здесь только
+    # вынос CPU-работы из event loop в пул процессов с ограничением параллелизма и очереди.
+    # Копия пула из FastAPI_full_course/backend/app/password_hasher.py: у приложений
+    # отдельные Docker-контексты, поэтому общий модуль невозможен
+
+    def __init__(
+            self,
+            hash_func: Callable[[str], str],
+            verify_func: Callable[[str, str], bool],
+            workers: Optional[int] = None,
+            max_concurrency: Optional[int] = None,
+            max_queue: int = 1000
+    ):
+        # Функции передаются в воркеры по имени: должны быть импортируемы на уровне модуля
+        self.hash_func = hash_func
+        self.verify_func = verify_func
+        self.workers = workers or os.cpu_count() or 1
+        self.max_concurrency = max_concurrency or self.workers
+        self.max_queue = max_queue
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        self._waiting = 0
+        self._in_flight = 0
+        self._peak_waiting = 0
+        self._completed = 0
+        self._rejected = 0
+        self._queue_time = 0.0
+        self._run_time = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # Пул создаётся при первом обращении; spawn - чтобы не форкать процесс с потоками
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    async def _submit(self, func: Callable, *args) -> Any:
+        if self._waiting >= self.max_queue:
+            self._rejected += 1
+            raise HashingOverloadedError("Password hashing queue is full")
+
+        queued_at = time.perf_counter()
+        self._waiting += 1
+        self._peak_waiting = max(self._peak_waiting, self._waiting)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+
+        self._in_flight += 1
+        self._queue_time += time.perf_counter() - queued_at
+        try:
+            loop = asyncio.get_running_loop()
+            result, run_time = await loop.run_in_executor(self._get_executor(), _timed_call, func, *args)
+        finally:
+            self._in_flight -= 1
+            self._semaphore.release()
+
+        self._completed += 1
+        self._run_time += run_time
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(self.hash_func, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._submit(self.verify_func, password, hashed_password)
+
+    def stats(self) -> Dict[str, Any]:
+        completed = self._completed
+        return {
+            "workers": self.workers,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "peak_waiting": self._peak_waiting,
+            "completed": completed,
+            "rejected": self._rejected,
+            "avg_queue_ms": round(self._queue_time / completed * 1000, 3) if completed else 0.0,
+            "avg_run_ms": round(self._run_time / completed * 1000, 3) if completed else 0.0,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,191 @@
+import argparse
+import base64
+import hashlib
+import hmac
+import os
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, NamedTuple, Optional
+
+from config import settings
+
+SALT_BYTES = 16
+DIGEST_BYTES = 32
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.b64decode(data + "=" * (-len(data) % 4))
+
+
+def format_params(params: Dict[str, int]) -> str:
+    return ",".join(f"{key}={value}" for key, value in params.items())
+
+
+def parse_params(text: str) -> Dict[str, int]:
+    if not text:
+        return {}
+    return {key: int(value) for key, value in (item.split("=", 1) for item in text.split(","))}
+
+
+class ParsedHash(NamedTuple):
+    scheme: str
+    params: Dict[str, int]
+    salt: bytes
+    digest: bytes
+
+
+class HashScheme(ABC):
+    name: str = ""
+
+    @abstractmethod
+    def derive(self, password: str, salt: bytes, params: Dict[str, int]) -> bytes:
+        pass
+
+
+class ScryptScheme(HashScheme):
+    # Memory-hard: память 128 * n * r байт на одно вычисление
+    name = "scrypt"
+
+    def derive(self, password: str, salt: bytes, params: Dict[str, int]) -> bytes:
+        n, r, p = params["n"], params["r"], params["p"]
+        return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                              maxmem=256 * n * r + 1024 * 1024, dklen=DIGEST_BYTES)
+
+
+class Pbkdf2Scheme(HashScheme):
+    name = "pbkdf2_sha256"
+
+    def derive(self, password: str, salt: bytes, params: Dict[str, int]) -> bytes:
+        return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, params["i"], dklen=DIGEST_BYTES)
+
+
+class LegacySha256Scheme(HashScheme):
+    # Старый формат UserManager: "salt$hex(sha256(salt + password))", только проверка
+    name = "sha256"
+
+    def derive(self, password: str, salt: bytes, params: Dict[str, int]) -> bytes:
+        return hashlib.sha256(salt + password.encode()).digest()
+
+
+class PasswordHashRegistry:
+    # Хэши хранятся как "scheme$params$salt$hash": схема и параметры стоимости
+    # записаны в самом хэше, поэтому их можно менять без миграции БД
+
+    def __init__(self, default_scheme: str, params: Dict[str, Dict[str, int]]):
+        self.default_scheme = default_scheme
+        self.params = params
+        self._schemes: Dict[str, HashScheme] = {}
+
+    def register(self, scheme: HashScheme):
+        self._schemes[scheme.name] = scheme
+
+    def get(self, name: str) -> HashScheme:
+        try:
+            return self._schemes[name]
+        except KeyError:
+            raise ValueError(f"Unknown password hash scheme: {name}")
+
+    def hash(self, password: str, scheme: Optional[str] = None, params: Optional[Dict[str, int]] = None) -> str:
+        name = scheme or self.default_scheme
+        params = params if params is not None else self.params.get(name, {})
+        salt = os.urandom(SALT_BYTES)
+        digest = self.get(name).derive(password, salt, params)
+        return f"{name}${format_params(params)}${_b64encode(salt)}${_b64encode(digest)}"
+
+    @staticmethod
+    def parse(hashed_password: str) -> Optional[ParsedHash]:
+        if not hashed_password:
+            return None
+        parts = hashed_password.split("$")
+        try:
+            if len(parts) == 2:
+                salt, hex_digest = parts
+                return ParsedHash(LegacySha256Scheme.name, {}, salt.encode(), bytes.fromhex(hex_digest))
+            if len(parts) == 4:
+                scheme, params, salt, digest = parts
+                return ParsedHash(scheme, parse_params(params), _b64decode(salt), _b64decode(digest))
+        except ValueError:
+            pass
+        return None
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        parsed = self.parse(hashed_password)
+        if parsed is None or parsed.scheme not in self._schemes:
+            return False
+        try:
+            digest = self._schemes[parsed.scheme].derive(password, parsed.salt, parsed.params)
+        except (KeyError, ValueError):
+            return False
+        return hmac.compare_digest(digest, parsed.digest)
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        parsed = self.parse(hashed_password)
+        if parsed is None:
+            return False
+        return parsed.scheme != self.default_scheme or parsed.params != self.params.get(self.default_scheme, {})
+
+    def calibrate(self, scheme: str, target_ms: float) -> Dict[str, int]:
+        # Подбирает параметры, при которых одна проверка занимает около target_ms
+        def measure(params: Dict[str, int]) -> float:
+            salt = os.urandom(SALT_BYTES)
+            started = time.perf_counter()
+            self.get(scheme).derive("calibration-password", salt, params)
+            return (time.perf_counter() - started) * 1000
+
+        if scheme == ScryptScheme.name:
+            params = {"n": 1024, "r": 8, "p": 1}
+            # n должен быть степенью двойки: удваиваем, пока не достигнем цели
+            while measure(params) < target_ms and params["n"] < 2 ** 20:
+                params["n"] *= 2
+            return params
+
+        if scheme == Pbkdf2Scheme.name:
+            sample = {"i": 20000}
+            elapsed = min(measure(sample) for _ in range(3))
+            return {"i": max(10000, int(sample["i"] * target_ms / elapsed) // 1000 * 1000)}
+
+        raise ValueError(f"Scheme {scheme} has no tunable parameters")
+
+
+password_registry = PasswordHashRegistry(
+    settings.PASSWORD_SCHEME,
+    {
+        ScryptScheme.name: {
+            "n": settings.PASSWORD_SCRYPT_N,
+            "r": settings.PASSWORD_SCRYPT_R,
+            "p": settings.PASSWORD_SCRYPT_P,
+        },
+        Pbkdf2Scheme.name: {"i": settings.PASSWORD_PBKDF2_ITERATIONS},
+    }
+)
+password_registry.register(ScryptScheme())
+password_registry.register(Pbkdf2Scheme())
+password_registry.register(LegacySha256Scheme())
+
+
+if __name__ == "__main__":
+    # Запуск из каталога server: python -m utils.password_schemes --target-ms 100
+    parser = argparse.ArgumentParser(description="Calibrate password hash cost for this machine")
+    parser.add_argument("--scheme", default=settings.PASSWORD_SCHEME,
+                        choices=[ScryptScheme.name, Pbkdf2Scheme.name])
+    parser.add_argument("--target-ms", type=float, default=100.0)
+    args = parser.parse_args()
+
+    params = password_registry.calibrate(args.scheme, args.target_ms)
+    encoded = password_registry.hash("calibration-password", args.scheme, params)
+    started = time.perf_counter()
+    password_registry.verify("calibration-password", encoded)
+    verify_ms = (time.perf_counter() - started) * 1000
+
+    print(f"# {args.scheme}: verify takes {verify_ms:.1f} ms (target {args.target_ms:.0f} ms)")
+    print(f"PASSWORD_SCHEME={args.scheme}")
+    if args.scheme == ScryptScheme.name:
+        print(f"PASSWORD_SCRYPT_N={params['n']}")
+        print(f"PASSWORD_SCRYPT_R={params['r']}")
+        print(f"PASSWORD_SCRYPT_P={params['p']}")
+    else:
+        print(f"PASSWORD_PBKDF2_ITERATIONS={params['i']}")
@@ -0,0 +1,106 @@
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "server"))
+# Замеряется работа с БД, а не хэширование: дешёвые параметры PBKDF2
+os.environ.setdefault("PASSWORD_SCHEME", "pbkdf2_sha256")
+os.environ.setdefault("PASSWORD_PBKDF2_ITERATIONS", "1000")
+
+import httpx
+
+import main
+from database.base import DatabaseManager
+from database.sqlite_adapter import SQLiteAdapter
+from models.user import UserCreate
+from repositories.user_repository import UserRepository
+
+
+class LatencyAdapter(SQLiteAdapter):
+    # Имитирует сетевую задержку MySQL: блокирующее ожидание внутри вызова драйвера
+    latency = 0.0
+
+    def _execute(self, connection, query, params):
+        if self.latency:
+            time.sleep(self.latency)
+        return super()._execute(connection, query, params)
+
+
+class InlineAdapter(LatencyAdapter):
+    # Прежнее поведение: одно соединение, запрос выполняется прямо в event loop
+    async def execute_query(self, query, params=None):
+        async with self.pool.connection() as connection:
+            return self._execute(connection, query, params)
+
+
+async def seed(path: str, users: int):
+    manager = DatabaseManager()
+    await manager.initialize(SQLiteAdapter(path))
+    repo = UserRepository(manager)
+    await repo.create_many([
+        UserCreate(username=f"user{i}", email=f"user{i}@example.com", password="password123")
+        for i in range(users)
+    ])
+    await manager.close()
+
+
+async def run_logins(adapter, users: int, requests: int, concurrency: int) -> float:
+    manager = DatabaseManager()
+    await manager.initialize(adapter)
+    main.db_manager = manager
+    main.user_repo = UserRepository(manager)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=main.app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def login(i: int):
+            async with semaphore:
+                n = i % users
+                response = await client.post("/api/login", json={
+                    "email": f"user{n}@example.com", "password": "password123"
+                })
+                assert response.status_code == 200, response.text
+
+        started = time.perf_counter()
+        await asyncio.gather(*(login(i) for i in range(requests)))
+        elapsed = time.perf_counter() - started
+
+        stats = (await client.get("/api/debug/pool")).json()
+
+    await manager.close()
+    print(f"    pool: size={stats['size']} acquired={stats['acquired']} avg_wait_ms={stats['avg_wait_ms']}")
+    return requests / elapsed
+
+
+async def bench(users: int, requests: int, concurrency: int, latency_ms: float):
+    LatencyAdapter.latency = latency_ms / 1000
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        await seed(path, users)
+
+        variants = [
+            ("inline, 1 connection", InlineAdapter(path, pool_max_size=1)),
+            ("pool max_size=1", LatencyAdapter(path, pool_max_size=1)),
+            ("pool max_size=4", LatencyAdapter(path, pool_max_size=4)),
+            ("pool max_size=10", LatencyAdapter(path, pool_max_size=10)),
+        ]
+        print(f"{requests} logins, concurrency {concurrency}, query latency {latency_ms} ms")
+        for name, adapter in variants:
+            rps = await run_logins(adapter, users, requests, concurrency)
+            print(f"  {name:<22} {rps:>8.0f} logins/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent /api/login throughput")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=1.0)
+    args = parser.parse_args()
+    asyncio.run(bench(args.users, args.requests, args.concurrency, args.latency_ms))
@@ -0,0 +1,156 @@
+import argparse
+import asyncio
+import gc
+import os
+import statistics
+import sys
+import time
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "server"))
+
+from fastapi import FastAPI
+
+from utils.metrics import MetricsMiddleware, MetricsRegistry, RequestTimings, record_db_time, route_label, \
+    _current_request
+
+
+class PassThroughMiddleware:
+    # Пустой слой: показывает, сколько стоит сам лишний middleware в стеке и каков шум замера
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        await self.app(scope, receive, send)
+
+
+def build_app(middleware: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/users/{user_id}")
+    async def get_user(user_id: int):
+        record_db_time(0.0001)
+        return {"id": user_id, "username": f"user{user_id}"}
+
+    if middleware == "metrics":
+        app.add_middleware(MetricsMiddleware, registry=MetricsRegistry())
+    elif middleware == "pass-through":
+        app.add_middleware(PassThroughMiddleware)
+    return app
+
+
+async def drive(app, requests: int) -> float:
+    # ASGI-вызовы напрямую, без HTTP-клиента: иначе накладные расходы клиента
+    # полностью скрывают стоимость middleware
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for i in range(requests):
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": f"/api/users/{i % 1000}", "raw_path": b"", "root_path": "",
+            "query_string": b"", "headers": [], "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 8001)
+        }
+        await app(scope, receive, send)
+    return (time.perf_counter() - started) / requests
+
+
+class _Route:
+    path = "/api/users/{user_id}"
+
+
+async def bare_app(scope, receive, send):
+    # Минимальное ASGI-приложение: разница с ним - стоимость самого middleware
+    scope["route"] = _Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def drive_bare(app, requests: int) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app({"type": "http", "method": "GET", "path": "/api/users/1"}, receive, send)
+    return (time.perf_counter() - started) / requests
+
+
+def breakdown(repeat: int):
+    # Из чего складывается стоимость middleware: каждая часть отдельно, в горячем цикле
+    registry = MetricsRegistry()
+    route_metrics = registry.route_metrics("GET", _Route.path)
+    scope = {"type": "http", "method": "GET", "route": _Route}
+    parts = {
+        "RequestTimings + contextvar": lambda: _current_request.reset(_current_request.set(RequestTimings())),
+        "route_label + lookup": lambda: registry.route_metrics("GET", route_label(scope)),
+        "histograms observe": lambda: route_metrics.observe(200, 0.00008, 0.0001, 1, 40),
+    }
+    number = 100000
+    for name, part in parts.items():
+        best = min(timeit.repeat(part, number=number, repeat=repeat)) / number
+        print(f"    {name:<28} {best * 1e6:6.2f} us")
+
+
+async def bench(requests: int, repeat: int):
+    wrapped = MetricsMiddleware(bare_app, registry=MetricsRegistry())
+    bare = middleware = float("inf")
+    for _ in range(repeat):
+        bare = min(bare, await drive_bare(bare_app, requests))
+        middleware = min(middleware, await drive_bare(wrapped, requests))
+    print(f"{requests} requests, best of {repeat}")
+    print(f"  middleware alone {(middleware - bare) * 1e6:8.2f} us/request")
+    breakdown(repeat)
+
+    apps = {name: build_app(name) for name in ("none", "pass-through", "metrics")}
+    # Прогрев: ленивое построение middleware stack в Starlette
+    for app in apps.values():
+        await drive(app, 100)
+
+    # Полный стек FastAPI: разброс между прогонами (единицы us) сравним с самим middleware,
+    # поэтому много коротких чередующихся раундов и медиана разниц внутри раунда, без GC
+    rounds = repeat * 5
+    chunk = max(requests // 10, 100)
+    samples = {name: [] for name in apps}
+    gc.disable()
+    try:
+        for _ in range(rounds):
+            for name, app in apps.items():
+                samples[name].append(await drive(app, chunk))
+    finally:
+        gc.enable()
+    base = statistics.median(samples["none"])
+    print(f"  FastAPI stack, median of {rounds} interleaved rounds of {chunk} requests")
+    print(f"  no middleware    {base * 1e6:8.1f} us/request")
+    for name in ("pass-through", "metrics"):
+        deltas = [sample - plain for sample, plain in zip(samples[name], samples["none"])]
+        delta = statistics.median(deltas)
+        spread = statistics.quantiles(deltas, n=4)
+        print(f"  {name:<16} {statistics.median(samples[name]) * 1e6:8.1f} us/request   "
+              f"overhead {delta * 1e6:+.1f} us ({delta / base * 100:+.1f}%), "
+              f"IQR {spread[0] * 1e6:+.1f}..{spread[2] * 1e6:+.1f} us")
+
+    registry = MetricsRegistry()
+    for route in range(50):
+        for status in (200, 404, 500):
+            registry.observe_request("GET", f"/api/route{route}", status, 0.01, 0.002, 2, 512)
+    started = time.perf_counter()
+    body = registry.render()
+    print(f"  render /metrics  {(time.perf_counter() - started) * 1000:8.2f} ms for 50 routes ({len(body)} bytes)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Metrics middleware overhead benchmark")
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+    asyncio.run(bench(args.requests, args.repeat))
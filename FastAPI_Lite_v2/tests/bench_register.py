@@ -0,0 +1,98 @@
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "server"))
+# Замеряется работа с БД, а не хэширование: дешёвые параметры PBKDF2
+os.environ.setdefault("PASSWORD_SCHEME", "pbkdf2_sha256")
+os.environ.setdefault("PASSWORD_PBKDF2_ITERATIONS", "1000")
+
+import httpx
+
+import main
+from database.base import DatabaseManager
+from models.user import UserCreate, UserManager
+from repositories.user_repository import UserRepository
+from tests.bench_login import LatencyAdapter
+
+_counter = itertools.count()
+
+
+def new_user() -> UserCreate:
+    n = next(_counter)
+    return UserCreate(username=f"user{n}", email=f"user{n}@example.com", password="password123")
+
+
+async def legacy_register(repo: UserRepository, user: UserCreate):
+    # Прежний путь /api/register: две проверки, INSERT и повторное чтение строки
+    if await repo.get_by_email(user.email):
+        return None
+    if await repo.get_by_username(user.username):
+        return None
+    query, params = repo._insert_statement(user, "user", UserManager.hash_password(user.password))
+    await repo.db.execute(query, params)
+    return await repo.get_by_email(user.email)
+
+
+async def timed(requests: int, concurrency: int, register) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await register()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return requests / (time.perf_counter() - started)
+
+
+async def bench(requests: int, concurrency: int, latency_ms: float, pool_size: int):
+    LatencyAdapter.latency = latency_ms / 1000
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = DatabaseManager()
+        await manager.initialize(LatencyAdapter(os.path.join(tmp, "bench.db"), pool_max_size=pool_size))
+        repo = UserRepository(manager)
+        main.db_manager = manager
+        main.user_repo = repo
+
+        print(f"{requests} registrations, concurrency {concurrency}, "
+              f"pool {pool_size}, query latency {latency_ms} ms")
+
+        rps = await timed(requests, concurrency, lambda: legacy_register(repo, new_user()))
+        print(f"  legacy (4 queries)       {rps:>8.0f} registrations/s")
+
+        rps = await timed(requests, concurrency, lambda: repo.register(new_user()))
+        print(f"  insert-first (1 query)   {rps:>8.0f} registrations/s")
+
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def post():
+                user = new_user()
+                response = await client.post("/api/register", json=user.model_dump())
+                assert response.status_code == 200, response.text
+
+            rps = await timed(requests, concurrency, post)
+            print(f"  POST /api/register       {rps:>8.0f} registrations/s")
+
+            response = await client.post("/api/register", json={
+                "username": "user0", "email": "other@example.com", "password": "password123"
+            })
+            print(f"  duplicate username -> {response.status_code} {response.json()['detail']}")
+
+        await manager.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="/api/register throughput")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=1.0)
+    parser.add_argument("--pool-size", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(bench(args.requests, args.concurrency, args.latency_ms, args.pool_size))
@@ -0,0 +1,83 @@
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "server"))
+os.environ.setdefault("PASSWORD_SCHEME", "pbkdf2_sha256")
+os.environ.setdefault("PASSWORD_PBKDF2_ITERATIONS", "1000")
+
+from database.base import DatabaseManager
+from repositories.user_repository import UserRepository
+from tests.bench_login import LatencyAdapter
+from utils.cache import LRUCacheBackend, ReadThroughCache
+
+
+async def lookups(repo: UserRepository, users: int, requests: int, concurrency: int) -> float:
+    # Смесь как у /api/login и проверок регистрации: 90% существующих email, 10% несуществующих
+    semaphore = asyncio.Semaphore(concurrency)
+    rnd = random.Random(42)
+    emails = [
+        f"user{rnd.randrange(users)}@example.com" if rnd.random() < 0.9 else f"missing{rnd.randrange(users)}@example.com"
+        for _ in range(requests)
+    ]
+
+    async def one(email: str):
+        async with semaphore:
+            await repo.get_by_email(email)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(email) for email in emails))
+    return requests / (time.perf_counter() - started)
+
+
+async def stampede(repo: UserRepository, db: DatabaseManager, concurrency: int) -> int:
+    # Одновременные промахи по одному ключу: сколько запросов дошло до БД
+    before = db.statement_stats().get("users.by_email", {}).get("calls", 0)
+    await asyncio.gather(*(repo.get_by_email("user0@example.com") for _ in range(concurrency)))
+    return db.statement_stats()["users.by_email"]["calls"] - before
+
+
+async def bench(users: int, requests: int, concurrency: int, latency_ms: float):
+    LatencyAdapter.latency = latency_ms / 1000
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager()
+        await db.initialize(LatencyAdapter(os.path.join(tmp, "bench.db")))
+        await db.executemany(
+            "INSERT INTO users (username, email, full_name, hashed_password, role) "
+            "VALUES (%(username)s, %(email)s, %(full_name)s, %(hashed_password)s, %(role)s)",
+            ({
+                "username": f"user{i}", "email": f"user{i}@example.com", "full_name": f"User {i}",
+                "hashed_password": "pbkdf2_sha256$i=1000$c2FsdA$ZGlnZXN0", "role": "user"
+            } for i in range(users))
+        )
+        print(f"get_by_email, {users} users, {requests} lookups, concurrency {concurrency}, "
+              f"{latency_ms} ms DB latency")
+
+        plain = UserRepository(db)
+        print(f"  no cache          {await lookups(plain, users, requests, concurrency):8.0f} lookups/s")
+        print(f"    stampede of {concurrency}: {await stampede(plain, db, concurrency)} DB queries")
+
+        cache = ReadThroughCache(LRUCacheBackend(), ttl=60, negative_ttl=5)
+        cached = UserRepository(db, cache=cache)
+        print(f"  read-through LRU  {await lookups(cached, users, requests, concurrency):8.0f} lookups/s")
+        await cache.clear()
+        print(f"    stampede of {concurrency}: {await stampede(cached, db, concurrency)} DB queries")
+        print(f"    {cache.stats()}")
+
+        await db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="UserRepository lookup cache benchmark")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency-ms", type=float, default=1.0)
+    args = parser.parse_args()
+    asyncio.run(bench(args.users, args.requests, args.concurrency, args.latency_ms))
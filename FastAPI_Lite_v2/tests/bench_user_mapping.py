@@ -0,0 +1,75 @@
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "server"))
+
+from database.base import DatabaseManager
+from database.sqlite_adapter import SQLiteAdapter
+from models.user import UserInDB
+from repositories.user_repository import UserRepository, user_from_row
+from utils.data_utils import prepare_user_data
+
+
+async def legacy_get_all(db: DatabaseManager):
+    # Прежний путь: SELECT *, копия словаря с ISO-строками и полная валидация pydantic
+    results = await db.fetch_all("SELECT * FROM users WHERE is_active = TRUE")
+    return [UserInDB(**prepare_user_data(result)) for result in results]
+
+
+async def timed(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        users = await func()
+        best = min(best, time.perf_counter() - started)
+    assert users
+    return best
+
+
+async def bench(users: int, repeat: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = DatabaseManager()
+        await db.initialize(SQLiteAdapter(os.path.join(tmp, "bench.db")))
+        await db.executemany(
+            "INSERT INTO users (username, email, full_name, hashed_password, role) "
+            "VALUES (%(username)s, %(email)s, %(full_name)s, %(hashed_password)s, %(role)s)",
+            ({
+                "username": f"user{i}", "email": f"user{i}@example.com", "full_name": f"User {i}",
+                "hashed_password": "scrypt$n=16384,r=8,p=1$c2FsdA$ZGlnZXN0", "role": "user"
+            } for i in range(users))
+        )
+        repo = UserRepository(db)
+
+        rows = await db.fetch_all("SELECT * FROM users")
+        print(f"get_all() over {users} users, best of {repeat}")
+
+        started = time.perf_counter()
+        for row in rows:
+            UserInDB(**prepare_user_data(row))
+        legacy_map = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for row in rows:
+            user_from_row(row)
+        fast_map = time.perf_counter() - started
+
+        legacy = await timed(lambda: legacy_get_all(db), repeat)
+        fast = await timed(repo.get_all, repeat)
+        print(f"  mapping only: legacy {legacy_map * 1000:8.1f} ms   user_from_row {fast_map * 1000:8.1f} ms")
+        print(f"  end to end:   legacy {legacy * 1000:8.1f} ms   get_all       {fast * 1000:8.1f} ms")
+
+        await db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="UserRepository row mapping benchmark")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(bench(args.users, args.repeat))
@@ -1,13 +1,15 @@
+from dataclasses import replace
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from .database import get_db
+from .database import get_db, SessionLocal
 from .config import settings
+from .password_hasher import pwd_context, password_hasher
+from .principal import Principal, principal_cache
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
 
@@ -19,6 +21,14 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 
+async def verify_password_async(plain_password, hashed_password):
+    return await password_hasher.verify(plain_password, hashed_password)
+
+
+async def get_password_hash_async(password):
+    return await password_hasher.hash(password)
+
+
 def authenticate_user(db: Session, email: str, password: str):
     from .crud import get_user_by_email
     print(f"🔐 Authenticating user: {email}")
@@ -29,12 +39,40 @@ def authenticate_user(db: Session, email: str, password: str):
         return False
 
     print(f"✅ User found: {user.email}, checking password...")
-    password_valid = verify_password(password, user.hashed_password)
+    password_valid, new_hash = pwd_context.verify_and_update(password, user.hashed_password)
+
+    if not password_valid:
+        print(f"❌ Invalid password for user: {email}")
+        return False
+
+    if new_hash:
+        from .crud import update_password_hash
+        update_password_hash(db, user, new_hash)
+        print(f"🔁 Password hash upgraded for user: {email}")
+
+    print(f"✅ Authentication successful for user: {email}")
+    return user
+
+
+async def authenticate_user_async(db: Session, email: str, password: str):
+    # Запрос к БД - в threadpool, проверка bcrypt - в пуле процессов
+    from .crud import get_user_by_email, update_password_hash
+
+    user = await run_in_threadpool(get_user_by_email, db, email)
+    if not user:
+        print(f"❌ User not found: {email}")
+        return False
 
+    password_valid, new_hash = await password_hasher.verify_and_update(password, user.hashed_password)
     if not password_valid:
         print(f"❌ Invalid password for user: {email}")
         return False
 
+    # Устаревшая схема или стоимость: перехэшированный пароль сохраняем сразу
+    if new_hash:
+        await run_in_threadpool(update_password_hash, db, user, new_hash)
+        print(f"🔁 Password hash upgraded for user: {email}")
+
     print(f"✅ Authentication successful for user: {email}")
     return user
 
@@ -43,21 +81,84 @@ def create_access_token(user):
     expires_delta = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     expire = datetime.utcnow() + expires_delta
 
-    to_encode = {"sub": str(user.id), "email": user.email, "role": user.role}
+    # ver - версия токенов пользователя, exp - без срока действия подписанным
+    # claims нельзя доверять без обращения к БД
+    to_encode = {
+        "sub": str(user.id),
+        "email": user.email,
+        "role": user.role,
+        "ver": user.token_version or 0,
+        "exp": expire
+    }
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
     print(f"🔑 Created access token for user: {user.email}, role: {user.role}")
     return {"access_token": encoded_jwt, "token_type": "bearer"}
 
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
-    from .crud import get_user
-    credentials_exception = HTTPException(
+def credentials_error() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+
+def decode_token(token: str) -> dict:
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        int(payload["sub"])
+        return payload
+    except (JWTError, KeyError, TypeError, ValueError) as e:
+        print(f"❌ JWT Error: {e}")
+        raise credentials_error()
+
+
+def load_principal(user_id: int):
+    from .crud import get_user
+    db = SessionLocal()
+    try:
+        user = get_user(db, user_id=user_id)
+        return Principal.from_user(user) if user else None
+    finally:
+        db.close()
+
+
+async def get_current_principal(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Principal:
+    # Для read-эндпоинтов: подпись и exp проверяются локально, пользователь берётся
+    # из кэша процесса; БД читается только при промахе, там же сверяется token_version
+    payload = decode_token(credentials.credentials)
+    user_id = int(payload["sub"])
+    token_version = payload.get("ver", 0)
+
+    principal = principal_cache.get(user_id) if settings.AUTH_PRINCIPAL_MODE == "claims" else None
+    if principal is not None and token_version > principal.token_version:
+        # Токен новее записи в кэше: версию подняли в другом воркере, либо параллельный
+        # промах закэшировал строку до изменения - перечитываем из БД, а не отклоняем
+        principal_cache.invalidate(user_id)
+        principal = None
+    if principal is None:
+        principal = await run_in_threadpool(load_principal, user_id)
+        if principal is None:
+            print(f"❌ User not found in database: {user_id}")
+            raise credentials_error()
+        principal_cache.put(principal)
+
+    if principal.token_version != token_version:
+        print(f"❌ Revoked token for user: {user_id}")
+        raise credentials_error()
+
+    # Версия совпала - подписанные claims актуальны: любая смена роли поднимает
+    # token_version, поэтому роль берётся из токена
+    role = payload.get("role", principal.role)
+    return principal if role == principal.role else replace(principal, role=role)
+
+
+def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
+    # Для изменяющих эндпоинтов: актуальная ORM-строка пользователя из БД
+    from .crud import get_user
+    credentials_exception = credentials_error()
+
     try:
         print(f"🔍 Validating token...")
         payload = jwt.decode(credentials.credentials, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
@@ -75,6 +176,10 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
             print(f"❌ User not found in database: {user_id}")
             raise credentials_exception
 
+        if (user.token_version or 0) != payload.get("ver", 0):
+            print(f"❌ Revoked token for user: {user_id}")
+            raise credentials_exception
+
         print(f"✅ User validated: {user.email}")
         return user
 
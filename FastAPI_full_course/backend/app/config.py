@@ -26,6 +26,50 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
+    # claims - read-эндпоинты доверяют подписанному токену и кэшу пользователей,
+    # database - пользователь читается из БД на каждый запрос
+    AUTH_PRINCIPAL_MODE: Literal['claims', 'database'] = 'claims'
+    AUTH_USER_CACHE_TTL: float = 30.0
+    AUTH_USER_CACHE_SIZE: int = 10000
+
+    # Password hashing: схема по умолчанию и стоимость (rounds = log2 стоимости).
+    # Подобрать под железо: python calibrate_password_hash.py --target-ms 250
+    PASSWORD_SCHEME: Literal['bcrypt', 'scrypt'] = 'bcrypt'
+    BCRYPT_ROUNDS: int = 12
+    SCRYPT_ROUNDS: int = 14
+
+    # Password hashing process pool; MAX_CONCURRENCY = 0 - по числу воркеров
+    PASSWORD_HASH_WORKERS: int = os.cpu_count() or 1
+    PASSWORD_HASH_MAX_CONCURRENCY: int = 0
+    PASSWORD_HASH_MAX_QUEUE: int = 1000
+
+    # Загрузка медиа товаров: лимиты на файл, размер куска копирования и число потоков
+    MAX_IMAGE_SIZE: int = 10 * 1024 * 1024
+    MAX_VIDEO_SIZE: int = 2 * 1024 * 1024 * 1024
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024
+    UPLOAD_WORKERS: int = 4
+
+    # Content-addressed хранилище медиа: blob'ы без ссылок моложе grace-периода
+    # сборщик мусора (gc_media.py) не удаляет - загрузка может ещё не закоммитить товар
+    MEDIA_DIR: str = "app/media"
+    MEDIA_URL: str = "/media"
+    MEDIA_GC_GRACE_SECONDS: int = 24 * 60 * 60
+
+    # Раздача медиа: app - файлы (с Range) отдаёт приложение, x-accel - приложение
+    # проверяет запрос и отвечает X-Accel-Redirect, байты отдаёт nginx через sendfile
+    MEDIA_SERVE_MODE: Literal['app', 'x-accel'] = 'app'
+    MEDIA_ACCEL_PREFIX: str = "/_protected/media"
+    UPLOADS_ACCEL_PREFIX: str = "/_protected/uploads"
+
+    # Превью изображений (WebP, размер по длинной стороне) строятся в фоне в пуле процессов;
+    # половина ядер - чтобы фоновая обработка не отнимала CPU у запросов
+    IMAGE_THUMB_SIZE: int = 320
+    IMAGE_CARD_SIZE: int = 960
+    IMAGE_WEBP_QUALITY: int = 80
+    IMAGE_MAX_PIXELS: int = 50_000_000
+    IMAGE_WORKERS: int = max(1, (os.cpu_count() or 2) // 2)
+    IMAGE_MAX_PENDING: int = 1000
+
     @property
     def database_url(self) -> str:
         if self.DATABASE_TYPE == 'postgresql':
@@ -1,7 +1,15 @@
+import os
+from collections import Counter
+from typing import Iterable
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from .models import User, Product
+from .models import User, Product, MediaBlob
+from .media_store import media_store
 from .schemas import UserCreate, ProductCreate, ProductUpdate
 from .auth import get_password_hash
+from .principal import principal_cache
 
 
 def get_user(db: Session, user_id: int):
@@ -12,8 +20,9 @@ def get_user_by_email(db: Session, email: str):
     return db.query(User).filter(User.email == email).first()
 
 
-def create_user(db: Session, user: UserCreate, is_admin: bool = False):
-    hashed_password = get_password_hash(user.password)
+def create_user(db: Session, user: UserCreate, is_admin: bool = False, hashed_password: str = None):
+    if hashed_password is None:
+        hashed_password = get_password_hash(user.password)
     role = "admin" if is_admin else "user"
 
     db_user = User(
@@ -28,6 +37,12 @@ def create_user(db: Session, user: UserCreate, is_admin: bool = False):
     return db_user
 
 
+def update_password_hash(db: Session, user: User, hashed_password: str):
+    user.hashed_password = hashed_password
+    db.commit()
+    return user
+
+
 def get_products(db: Session, skip: int = 0, limit: int = 100):
     return db.query(Product).offset(skip).limit(limit).all()
 
@@ -36,15 +51,71 @@ def get_product(db: Session, product_id: int):
     return db.query(Product).filter(Product.id == product_id).first()
 
 
+def _media_counts(urls: Iterable[str]) -> Counter:
+    # Один и тот же blob может встречаться в товаре несколько раз - каждая ссылка считается
+    return Counter(media_store.keys_from_urls(urls))
+
+
+def product_media(image_paths, video_paths, image_variants) -> list:
+    # Все ссылки товара на хранилище: оригиналы и превью
+    variants = [url for variant in image_variants or [] for url in variant.values()]
+    return (image_paths or []) + (video_paths or []) + variants
+
+
+def acquire_media(db: Session, urls: Iterable[str]):
+    """Увеличивает счётчики ссылок в текущей транзакции (коммитит вызывающий).
+
+    Ключи обрабатываются в одном порядке, чтобы параллельные транзакции
+    не блокировали строки media_blobs накрест.
+    """
+    for key, count in sorted(_media_counts(urls).items()):
+        increment = update(MediaBlob).where(MediaBlob.key == key).values(refcount=MediaBlob.refcount + count)
+        if db.execute(increment).rowcount:
+            continue
+        path = media_store.path_for(key)
+        size = os.stat(path).st_size if os.path.exists(path) else 0
+        try:
+            # Savepoint: при гонке за первую вставку откатывается только она
+            with db.begin_nested():
+                db.add(MediaBlob(key=key, size=size, refcount=count))
+        except IntegrityError:
+            db.execute(increment)
+
+
+def release_media(db: Session, urls: Iterable[str]):
+    # Файлы не удаляются: blob с нулём ссылок заберёт gc_media.py после grace-периода
+    for key, count in sorted(_media_counts(urls).items()):
+        db.execute(update(MediaBlob).where(MediaBlob.key == key).values(refcount=MediaBlob.refcount - count))
+
+
 def create_product(db: Session, product: ProductCreate, user_id: int):
     product_data = product.dict()
     db_product = Product(**product_data, owner_id=user_id)
+    if not product.image_paths:
+        # Без изображений превью строить нечего: не ждать фоновую обработку
+        db_product.image_variants = []
     db.add(db_product)
+    acquire_media(db, product.image_paths + product.video_paths)
     db.commit()
     db.refresh(db_product)
     return db_product
 
 
+def set_image_variants(db: Session, product_id: int, image_variants: list):
+    # Товар могли удалить, пока строились превью: тогда их blob'ы заберёт GC
+    db_product = db.query(Product).filter(Product.id == product_id).with_for_update().first()
+    if db_product:
+        release_media(db, product_media(None, None, db_product.image_variants))
+        acquire_media(db, product_media(None, None, image_variants))
+        db_product.image_variants = image_variants
+        db.commit()
+    return db_product
+
+
+def get_products_without_variants(db: Session, limit: int):
+    return db.query(Product.id, Product.image_paths).filter(Product.image_variants.is_(None)).limit(limit).all()
+
+
 def update_product(db: Session, product_id: int, product: ProductUpdate):
     db_product = db.query(Product).filter(Product.id == product_id).first()
     if db_product:
@@ -58,16 +129,27 @@ def update_product(db: Session, product_id: int, product: ProductUpdate):
 def delete_product(db: Session, product_id: int):
     db_product = db.query(Product).filter(Product.id == product_id).first()
     if db_product:
+        release_media(db, product_media(db_product.image_paths, db_product.video_paths,
+                                        db_product.image_variants))
         db.delete(db_product)
         db.commit()
     return db_product
 
 
+def revoke_tokens(user: User):
+    # Новая версия делает недействительными все ранее выданные токены пользователя;
+    # кэш сбрасывается после коммита, иначе параллельный промах закэширует старую версию
+    user.token_version = (user.token_version or 0) + 1
+
+
 def make_user_admin(db: Session, user_id: int):
     db_user = db.query(User).filter(User.id == user_id).first()
     if db_user:
         db_user.role = "admin"
+        # Роль записана в токене: старые токены с прежней ролью отзываются
+        revoke_tokens(db_user)
         db.commit()
+        principal_cache.invalidate(user_id)
         db.refresh(db_user)
     return db_user
 
@@ -76,7 +158,13 @@ def delete_user(db: Session, user_id: int):
     db_user = db.query(User).filter(User.id == user_id).first()
     if db_user:
         # Delete user's products first
+        media = []
+        for row in db.query(Product.image_paths, Product.video_paths, Product.image_variants).filter(
+                Product.owner_id == user_id):
+            media += product_media(*row)
+        release_media(db, media)
         db.query(Product).filter(Product.owner_id == user_id).delete()
         db.delete(db_user)
         db.commit()
+        principal_cache.invalidate(user_id)
     return db_user
\ No newline at end of file
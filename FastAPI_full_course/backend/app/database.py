@@ -1,7 +1,8 @@
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings
+from .middleware.metrics import instrument_engine
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -56,6 +57,11 @@ else:
         echo=True  # Включим echo для отладки
     )
 
+
+# Время каждого SQL-запроса добавляется к метрикам текущего HTTP-запроса
+instrument_engine(engine)
+
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -75,12 +81,31 @@ def create_tables():
     try:
         logger.info(f"Creating tables for {settings.DATABASE_TYPE} database...")
         models.Base.metadata.create_all(bind=engine)
+        add_missing_columns()
         logger.info("Tables created successfully")
     except Exception as e:
         logger.error(f"Error creating tables: {e}")
         raise
 
 
+# (таблица, колонка, DDL) - колонки, добавленные после первого create_all
+MIGRATED_COLUMNS = (
+    ("users", "token_version", "INTEGER NOT NULL DEFAULT 0"),
+    ("products", "image_variants", "JSON"),
+)
+
+
+def add_missing_columns():
+    """Add columns introduced after the table was created (create_all only creates tables)"""
+    inspector = inspect(engine)
+    for table, column, ddl in MIGRATED_COLUMNS:
+        columns = {existing["name"] for existing in inspector.get_columns(table)}
+        if column not in columns:
+            logger.info(f"Adding {table}.{column} column...")
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
 def create_admin_user(db):
     """Create admin user if not exists"""
     from .crud import create_user
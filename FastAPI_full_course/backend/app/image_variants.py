@@ -0,0 +1,179 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from .config import settings
+from .media_store import media_store
+
+logger = logging.getLogger(__name__)
+
+# (имя, размер по длинной стороне) - от большего к меньшему: каждое следующее
+# превью уменьшается из предыдущего, а не из оригинала
+VARIANTS = (("card", settings.IMAGE_CARD_SIZE), ("thumb", settings.IMAGE_THUMB_SIZE))
+
+
+def source_path(url: str) -> Optional[str]:
+    key = media_store.key_from_url(url)
+    if key is not None:
+        return os.path.abspath(media_store.path_for(key))
+    # Загрузки до content-addressed хранилища
+    if url.startswith("/static/"):
+        return os.path.abspath(os.path.join("app", url.lstrip("/")))
+    return None
+
+
+def render_variants(path: str) -> tuple:
+    """Выполняется в процессе пула: строит WebP-превью и кладёт их в хранилище.
+
+    Модуль не импортирует БД: spawn-воркер не открывает соединений.
+    Возвращает ({имя: url}, время работы).
+    """
+    from PIL import Image, ImageOps
+
+    started = time.perf_counter()
+    Image.MAX_IMAGE_PIXELS = settings.IMAGE_MAX_PIXELS
+    variants = {}
+    with Image.open(path) as original:
+        largest = VARIANTS[0][1]
+        # JPEG декодируется сразу с уменьшением в 2-8 раз: в разы меньше CPU и памяти
+        original.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if image.mode in ("LA", "PA", "P") else "RGB")
+
+        for name, size in VARIANTS:
+            image = image.copy()
+            image.thumbnail((size, size), Image.LANCZOS, reducing_gap=3.0)
+            buffer = io.BytesIO()
+            image.save(buffer, "WEBP", quality=settings.IMAGE_WEBP_QUALITY, method=4)
+            size_bytes = buffer.tell()
+            buffer.seek(0)
+            # Одинаковые исходники дают одинаковые байты - превью тоже дедуплицируются
+            key = media_store.put(buffer, ".webp", size_bytes, f"{name}.webp")
+            variants[name] = media_store.url_for(key)
+    return variants, time.perf_counter() - started
+
+
+class ImageProcessor:
+    # Превью строятся после ответа на загрузку: задача ставится в фоне, декодирование
+    # и сжатие - в пуле процессов, запись путей в БД - в threadpool
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Не больше workers изображений в пуле: очередь ждёт здесь, а не в пуле
+        self._semaphore = asyncio.Semaphore(workers)
+        self._tasks = set()
+
+        self._completed = 0
+        self._failed = 0
+        self._skipped = 0
+        self._run_time = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        # spawn - чтобы не форкать процесс с потоками
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def submit(self, product_id: int, image_paths: List[str]) -> bool:
+        if len(self._tasks) >= self.max_pending:
+            # image_variants остаётся NULL: товар подхватит resume_pending при перезапуске
+            self._skipped += 1
+            logger.warning(f"Image processing queue is full, product {product_id} postponed")
+            return False
+        task = asyncio.get_running_loop().create_task(self._process(product_id, image_paths))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    async def _render(self, url: str) -> Dict[str, str]:
+        path = source_path(url)
+        if path is None:
+            return {}
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            try:
+                variants, run_time = await loop.run_in_executor(self._get_executor(), render_variants, path)
+            except Exception as e:
+                # Битый или неподдерживаемый файл: карточка покажет оригинал
+                self._failed += 1
+                logger.warning(f"Cannot build variants for {url}: {e}")
+                return {}
+        self._completed += 1
+        self._run_time += run_time
+        return variants
+
+    async def _process(self, product_id: int, image_paths: List[str]):
+        image_variants = await asyncio.gather(*(self._render(url) for url in image_paths or []))
+        try:
+            await run_in_threadpool(_store_variants, product_id, list(image_variants))
+        except Exception as e:
+            logger.error(f"Cannot save variants for product {product_id}: {e}")
+
+    async def resume_pending(self):
+        # Товары, превью которых не успели построить до остановки процесса
+        from .crud import get_products_without_variants
+        from .database import SessionLocal
+
+        def load():
+            db = SessionLocal()
+            try:
+                return get_products_without_variants(db, self.max_pending)
+            finally:
+                db.close()
+
+        pending = await run_in_threadpool(load)
+        for product_id, image_paths in pending:
+            self.submit(product_id, image_paths)
+        if pending:
+            logger.info(f"Resumed image processing for {len(pending)} products")
+
+    def stats(self) -> Dict[str, Any]:
+        completed = self._completed
+        return {
+            "workers": self.workers,
+            "pending_products": len(self._tasks),
+            "max_pending": self.max_pending,
+            "completed_images": completed,
+            "failed_images": self._failed,
+            "skipped_products": self._skipped,
+            "avg_run_ms": round(self._run_time / completed * 1000, 3) if completed else 0.0,
+        }
+
+    async def drain(self):
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def shutdown(self):
+        # Незавершённые товары останутся с image_variants = NULL до следующего запуска
+        for task in self._tasks:
+            task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+def _store_variants(product_id: int, image_variants: list):
+    from .crud import set_image_variants
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        set_image_variants(db, product_id, image_variants)
+    finally:
+        db.close()
+
+
+image_processor = ImageProcessor(settings.IMAGE_WORKERS, settings.IMAGE_MAX_PENDING)
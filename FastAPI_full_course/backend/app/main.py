@@ -1,20 +1,30 @@
 from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from typing import List
 import os
-import uuid
 from pathlib import Path
 
 from .database import get_db, init_db
 from . import schemas
-from .auth import get_current_user, authenticate_user
-from .crud import get_user_by_email, create_user, get_products, get_product, create_product, update_product, \
-    delete_product, make_user_admin, delete_user
-from .models import User, Product
+from .auth import get_current_user, get_current_principal, authenticate_user_async, get_password_hash_async
+from .password_hasher import password_hasher, HashingOverloadedError
+from .principal import Principal, principal_cache
+# Функции crud с именами эндпоинтов (create_product, update_product, delete_product, make_user_admin,
+# delete_user) вызываются как crud.<имя>: импорт напрямую перекрыли бы сами эндпоинты
+from .crud import get_user_by_email, create_user, get_products, get_product
+from .models import User, Product, MediaBlob
 from .config import settings
+from .uploads import save_product_media, shutdown_uploads
+from .media_store import IMMUTABLE_CACHE_CONTROL, media_store
+from .media_files import BLOB_NAME, UPLOAD_NAME, MediaFiles
+from .image_variants import image_processor
+from . import crud
+from .middleware.metrics import MetricsMiddleware, metrics_registry
 
 # Initialize database
 init_db()
@@ -29,10 +39,25 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware, registry=metrics_registry)
 
 # Create uploads directory
 os.makedirs("app/static/uploads", exist_ok=True)
 
+media_store.ensure_dirs()
+
+# Медиа товаров: Range/206 для перемотки видео, в режиме x-accel байты отдаёт nginx.
+# /static/uploads (загрузки до content-addressed хранилища) - раньше общего /static
+accel = settings.MEDIA_SERVE_MODE == "x-accel"
+app.mount(settings.MEDIA_URL, MediaFiles(
+    settings.MEDIA_DIR, BLOB_NAME, cache_control=IMMUTABLE_CACHE_CONTROL,
+    accel_prefix=settings.MEDIA_ACCEL_PREFIX if accel else None, content_etag=True
+), name="media")
+app.mount("/static/uploads", MediaFiles(
+    "app/static/uploads", UPLOAD_NAME,
+    accel_prefix=settings.UPLOADS_ACCEL_PREFIX if accel else None
+), name="uploads")
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
@@ -54,23 +79,32 @@ async def get_server_info():
 
 
 # Auth routes
+def hashing_overloaded() -> HTTPException:
+    return HTTPException(status_code=503, detail="Server is busy, try again later", headers={"Retry-After": "1"})
+
+
 @app.post("/api/register", response_model=schemas.User)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
     try:
         print(f"=== REGISTRATION REQUEST ===")
         print(f"Email: {user.email}")
         print(f"Full name: {user.full_name}")
 
-        db_user = get_user_by_email(db, email=user.email)
+        db_user = await run_in_threadpool(get_user_by_email, db, user.email)
         if db_user:
             print("❌ User already exists")
             raise HTTPException(status_code=400, detail="Email already registered")
 
         print("✅ Creating new user...")
-        new_user = create_user(db=db, user=user)
+        hashed_password = await get_password_hash_async(user.password)
+        new_user = await run_in_threadpool(create_user, db, user, False, hashed_password)
         print(f"✅ User created successfully: {new_user.email}")
         return new_user
 
+    except HTTPException:
+        raise
+    except HashingOverloadedError:
+        raise hashing_overloaded()
     except Exception as e:
         print(f"❌ Registration error: {e}")
         import traceback
@@ -79,8 +113,11 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
 
 
 @app.post("/api/login")
-def login(form_data: schemas.UserLogin, db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.email, form_data.password)
+async def login(form_data: schemas.UserLogin, db: Session = Depends(get_db)):
+    try:
+        user = await authenticate_user_async(db, form_data.email, form_data.password)
+    except HashingOverloadedError:
+        raise hashing_overloaded()
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
 
@@ -88,8 +125,66 @@ def login(form_data: schemas.UserLogin, db: Session = Depends(get_db)):
     return create_access_token(user)
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # async: рендер в event loop, где middleware обновляет счётчики, а не в threadpool
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/debug/hasher")
+def debug_hasher():
+    return password_hasher.stats()
+
+
+@app.get("/api/debug/principals")
+def debug_principals():
+    return {"mode": settings.AUTH_PRINCIPAL_MODE, **principal_cache.stats()}
+
+
+@app.get("/api/debug/images")
+def debug_images():
+    return image_processor.stats()
+
+
+@app.get("/api/debug/media")
+def debug_media(db: Session = Depends(get_db)):
+    # Эффект дедупликации: сколько байт занято на диске и сколько заняли бы копии
+    blobs, stored, references, logical = db.query(
+        func.count(MediaBlob.key), func.coalesce(func.sum(MediaBlob.size), 0),
+        func.coalesce(func.sum(MediaBlob.refcount), 0),
+        func.coalesce(func.sum(MediaBlob.size * MediaBlob.refcount), 0)
+    ).one()
+    return {
+        "blobs": blobs,
+        "references": int(references),
+        "stored_bytes": int(stored),
+        "referenced_bytes": int(logical),
+        "unreferenced_blobs": db.query(MediaBlob).filter(MediaBlob.refcount <= 0).count()
+    }
+
+
+@app.on_event("shutdown")
+def shutdown_password_hasher():
+    password_hasher.shutdown()
+
+
+@app.on_event("shutdown")
+def shutdown_upload_workers():
+    shutdown_uploads()
+
+
+@app.on_event("startup")
+async def resume_image_processing():
+    await image_processor.resume_pending()
+
+
+@app.on_event("shutdown")
+def shutdown_image_processor():
+    image_processor.shutdown()
+
+
 @app.get("/api/me", response_model=schemas.User)
-def read_users_me(current_user: User = Depends(get_current_user)):
+def read_users_me(current_user: Principal = Depends(get_current_principal)):
     return current_user
 
 
@@ -109,34 +204,8 @@ async def create_product(
     if videos and len(videos) > 2:
         raise HTTPException(status_code=400, detail="Maximum 2 videos allowed")
 
-    image_paths = []
-    video_paths = []
-
-    # Save images
-    if images:
-        for image in images:
-            file_extension = os.path.splitext(image.filename)[1]
-            filename = f"{uuid.uuid4()}{file_extension}"
-            file_path = f"app/static/uploads/{filename}"
-
-            with open(file_path, "wb") as buffer:
-                content = await image.read()
-                buffer.write(content)
-
-            image_paths.append(f"/static/uploads/{filename}")
-
-    # Save videos
-    if videos:
-        for video in videos:
-            file_extension = os.path.splitext(video.filename)[1]
-            filename = f"{uuid.uuid4()}{file_extension}"
-            file_path = f"app/static/uploads/{filename}"
-
-            with open(file_path, "wb") as buffer:
-                content = await video.read()
-                buffer.write(content)
-
-            video_paths.append(f"/static/uploads/{filename}")
+    # Файлы копируются кусками в отдельных потоках, не целиком в память и не в event loop
+    image_paths, video_paths = await save_product_media(images, videos)
 
     product_data = schemas.ProductCreate(
         name=name,
@@ -145,7 +214,13 @@ async def create_product(
         video_paths=video_paths
     )
 
-    return create_product(db=db, product=product_data, user_id=current_user.id)
+    # Если товар не сохранится, blob'ы останутся без ссылок до gc_media.py
+    product = await run_in_threadpool(crud.create_product, db, product_data, current_user.id)
+
+    # Превью строятся в фоне: ответ не ждёт их, thumbnail_paths пока указывает на оригиналы
+    if product.image_variants is None:
+        image_processor.submit(product.id, product.image_paths)
+    return product
 
 
 @app.get("/api/products/", response_model=List[schemas.Product])
@@ -176,7 +251,7 @@ def update_product(
     if db_product.owner_id != current_user.id and current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
-    return update_product(db=db, product_id=product_id, product=product)
+    return crud.update_product(db=db, product_id=product_id, product=product)
 
 
 @app.delete("/api/products/{product_id}")
@@ -192,12 +267,12 @@ def delete_product(
     if db_product.owner_id != current_user.id and current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not enough permissions")
 
-    delete_product(db=db, product_id=product_id)
+    crud.delete_product(db=db, product_id=product_id)
     return {"message": "Product deleted successfully"}
 
 
 # Admin routes
-@app.post("/api/admin/users/{user_id}/make-admin")
+@app.post("/api/admin/users/{user_id}/make-admin", response_model=schemas.User)
 def make_user_admin(
         user_id: int,
         db: Session = Depends(get_db),
@@ -210,7 +285,10 @@ def make_user_admin(
     if current_user.id != 1:
         raise HTTPException(status_code=403, detail="Only first admin can create other admins")
 
-    return make_user_admin(db=db, user_id=user_id)
+    db_user = crud.make_user_admin(db=db, user_id=user_id)
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return db_user
 
 
 @app.delete("/api/admin/users/{user_id}")
@@ -225,14 +303,15 @@ def delete_user(
     if user_id == current_user.id:
         raise HTTPException(status_code=400, detail="Cannot delete yourself")
 
-    return delete_user(db=db, user_id=user_id)
+    crud.delete_user(db=db, user_id=user_id)
+    return {"message": "User deleted successfully"}
 
 
 # Admin routes
 @app.get("/api/admin/users")
 def get_all_users(
         db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_user)
+        current_user: Principal = Depends(get_current_principal)
 ):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not enough permissions")
@@ -244,7 +323,7 @@ def get_all_users(
 @app.get("/api/admin/stats")
 def get_admin_stats(
         db: Session = Depends(get_db),
-        current_user: User = Depends(get_current_user)
+        current_user: Principal = Depends(get_current_principal)
 ):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Not enough permissions")
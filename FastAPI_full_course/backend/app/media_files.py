@@ -0,0 +1,207 @@
+import mimetypes
+import os
+import re
+import stat
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional, Pattern, Tuple
+
+import anyio
+
+# Видео отдаются крупными кусками: меньше переходов в поток и вызовов send
+CHUNK_SIZE = 256 * 1024
+
+BLOB_NAME = re.compile(r"^[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(\.[a-z0-9]{1,10})?$")
+UPLOAD_NAME = re.compile(r"^[A-Za-z0-9_-][A-Za-z0-9._-]*$")
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Разбирает Range: bytes=... в (start, end) включительно.
+
+    None - заголовок игнорируется (отдаётся весь файл), (-1, -1) - диапазон
+    непредставим (416). Несколько диапазонов тоже игнорируются: RFC 9110
+    разрешает ответить 200 вместо multipart/byteranges.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, dash, last = spec.strip().partition("-")
+    if not dash:
+        return None
+    try:
+        if not first:
+            # bytes=-N: последние N байт
+            suffix = int(last)
+            if suffix <= 0 or size == 0:
+                return -1, -1
+            return max(0, size - suffix), size - 1
+        start = int(first)
+        end = int(last) if last else None
+    except ValueError:
+        return None
+    if start < 0 or (end is not None and end < start):
+        return None
+    if start >= size:
+        return -1, -1
+    return start, size - 1 if end is None else min(end, size - 1)
+
+
+def _etag_matches(header: str, etag: str, weak: bool) -> bool:
+    # If-None-Match сравнивает слабо (W/ игнорируется), If-Range - только сильные теги
+    if header.strip() == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            if not weak:
+                continue
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def _http_date(header: str) -> Optional[float]:
+    try:
+        return parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class MediaFiles:
+    """ASGI-приложение для раздачи медиа: Range/206, If-Range, ETag/Last-Modified, 304.
+
+    В режиме accel_prefix тело не читается в Python: после проверки имени и наличия
+    файла ответ содержит X-Accel-Redirect, и байты (с sendfile и Range) отдаёт nginx.
+    Иначе файл читается кусками в потоке, либо через ASGI-расширение
+    http.response.zerocopy, если сервер его поддерживает.
+    """
+
+    def __init__(self, directory: str, name_pattern: Pattern, cache_control: Optional[str] = None,
+                 accel_prefix: Optional[str] = None, content_etag: bool = False):
+        self.directory = os.path.realpath(directory)
+        self.name_pattern = name_pattern
+        self.cache_control = cache_control
+        self.accel_prefix = accel_prefix.rstrip("/") if accel_prefix else None
+        # content_etag: имя файла - sha256 содержимого, это и есть сильный ETag
+        self.content_etag = content_etag
+
+    async def __call__(self, scope, receive, send):
+        assert scope["type"] == "http"
+        method = scope["method"]
+        if method not in ("GET", "HEAD"):
+            await self._plain(send, 405, b"Method Not Allowed", [(b"allow", b"GET, HEAD")])
+            return
+
+        # Mount Starlette оставляет в scope["path"] путь внутри каталога (как у StaticFiles)
+        name = scope["path"].lstrip("/")
+        match = self.name_pattern.match(name)
+        path = os.path.join(self.directory, name)
+        try:
+            # Имя проверено шаблоном (без "..", "/" в начале и скрытых файлов), stat - в потоке
+            stat_result = await anyio.to_thread.run_sync(os.stat, path) if match else None
+        except (FileNotFoundError, NotADirectoryError):
+            stat_result = None
+        if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+            await self._plain(send, 404, b"Not Found")
+            return
+
+        content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        headers = [(b"content-type", content_type.encode("latin-1"))]
+        if self.cache_control:
+            headers.append((b"cache-control", self.cache_control.encode("latin-1")))
+
+        if self.accel_prefix is not None:
+            # Range, If-Range, ETag и условные запросы nginx обработает сам (sendfile по internal location);
+            # Content-Type и Cache-Control из этого ответа он сохраняет
+            headers.append((b"x-accel-redirect", f"{self.accel_prefix}/{name}".encode("latin-1")))
+            await send({"type": "http.response.start", "status": 200, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        if self.content_etag:
+            etag = f'"{match.group(1)}"'
+        else:
+            etag = f'"{int(stat_result.st_mtime):x}-{stat_result.st_size:x}"'
+        headers += [
+            (b"accept-ranges", b"bytes"),
+            (b"etag", etag.encode("latin-1")),
+            (b"last-modified", formatdate(stat_result.st_mtime, usegmt=True).encode("latin-1")),
+        ]
+        request_headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+
+        if self._not_modified(request_headers, etag, stat_result.st_mtime):
+            headers = [header for header in headers if header[0] != b"content-type"]
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        size = stat_result.st_size
+        status, start, length = 200, 0, size
+        byte_range = None
+        if "range" in request_headers and self._if_range_allows(request_headers, etag, stat_result.st_mtime):
+            byte_range = parse_range(request_headers["range"], size)
+        if byte_range == (-1, -1):
+            await self._plain(send, 416, b"Range Not Satisfiable",
+                              [(b"accept-ranges", b"bytes"), (b"content-range", f"bytes */{size}".encode("latin-1"))])
+            return
+        if byte_range is not None:
+            status, start, length = 206, byte_range[0], byte_range[1] - byte_range[0] + 1
+            headers.append((b"content-range", f"bytes {byte_range[0]}-{byte_range[1]}/{size}".encode("latin-1")))
+
+        headers.append((b"content-length", str(length).encode("latin-1")))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        if method == "HEAD" or length == 0:
+            await send({"type": "http.response.body", "body": b""})
+        elif "http.response.zerocopy" in scope.get("extensions", {}):
+            await self._send_zerocopy(send, path, start, length)
+        else:
+            await self._send_chunks(send, path, start, length)
+
+    def _not_modified(self, request_headers: dict, etag: str, mtime: float) -> bool:
+        if "if-none-match" in request_headers:
+            return _etag_matches(request_headers["if-none-match"], etag, weak=True)
+        if "if-modified-since" in request_headers:
+            since = _http_date(request_headers["if-modified-since"])
+            return since is not None and int(mtime) <= since
+        return False
+
+    def _if_range_allows(self, request_headers: dict, etag: str, mtime: float) -> bool:
+        # If-Range: диапазон только если файл не изменился, иначе весь файл с 200
+        if_range = request_headers.get("if-range")
+        if if_range is None:
+            return True
+        if_range = if_range.strip()
+        if if_range.startswith('"') or if_range.startswith("W/"):
+            return _etag_matches(if_range, etag, weak=False)
+        since = _http_date(if_range)
+        return since is not None and int(mtime) == since
+
+    async def _send_chunks(self, send, path: str, start: int, length: int):
+        async with await anyio.open_file(path, "rb") as file:
+            await file.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = await file.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            # Файл укоротился после stat: закрываем ответ, клиент увидит недостачу
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _send_zerocopy(self, send, path: str, start: int, length: int):
+        file = await anyio.to_thread.run_sync(open, path, "rb")
+        try:
+            await send({"type": "http.response.zerocopy", "file": file, "offset": start,
+                        "count": length, "more_body": False})
+        finally:
+            file.close()
+
+    async def _plain(self, send, status: int, body: bytes, headers: list = ()):
+        await send({"type": "http.response.start", "status": status, "headers": [
+            (b"content-type", b"text/plain; charset=utf-8"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+            *headers,
+        ]})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,194 @@
+import hashlib
+import os
+import re
+import tempfile
+import time
+from collections import Counter
+from typing import BinaryIO, Iterable, List, Optional
+
+from .config import settings
+
+# Содержимое по адресу blob'а никогда не меняется: год кэша и без перепроверок
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_EXTENSION = re.compile(r"^\.[a-z0-9]{1,10}$")
+
+
+class UploadTooLargeError(Exception):
+    def __init__(self, filename: str, limit: int):
+        super().__init__(f"File {filename} exceeds {limit // (1024 * 1024)} MB")
+        self.filename = filename
+        self.limit = limit
+
+
+def normalize_extension(filename: Optional[str]) -> str:
+    # Расширение нужно только для Content-Type при раздаче; всё странное отбрасываем
+    extension = os.path.splitext(filename or "")[1].lower()
+    return extension if _EXTENSION.match(extension) else ""
+
+
+class MediaStore:
+    """Content-addressed хранилище медиа: имя файла - sha256 содержимого.
+
+    Раскладка root/ab/cd/<sha256><ext>: в одном каталоге не больше пары сотен
+    тысяч файлов даже на миллионах blob'ов. Одинаковые файлы хранятся один раз,
+    ссылки на них считаются в таблице media_blobs (crud.acquire_media/release_media),
+    а файлы без ссылок удаляет collect_garbage (gc_media.py).
+    """
+
+    def __init__(self, root: str, url: str):
+        self.root = root
+        self.url = url.rstrip("/")
+        # Временные файлы на той же файловой системе, что и blob'ы: os.replace атомарен
+        self.tmp_dir = os.path.join(root, "tmp")
+
+    def ensure_dirs(self):
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def key_for(self, digest: str, extension: str) -> str:
+        return f"{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def url_for(self, key: str) -> str:
+        return f"{self.url}/{key}"
+
+    def key_from_url(self, url: str) -> Optional[str]:
+        # Старые загрузки (/static/uploads/<uuid>) не content-addressed и не учитываются
+        prefix = self.url + "/"
+        return url[len(prefix):] if url.startswith(prefix) else None
+
+    def keys_from_urls(self, urls: Iterable[str]) -> List[str]:
+        return [key for key in map(self.key_from_url, urls) if key is not None]
+
+    def put(self, source: BinaryIO, extension: str, limit: int, filename: str) -> str:
+        """Копирует поток кусками, считая sha256 по ходу, и публикует blob по хэшу.
+
+        Память - один кусок UPLOAD_CHUNK_SIZE; лимит проверяется по ходу копирования.
+        Если такой blob уже есть, копия удаляется, а у существующего обновляется mtime:
+        сборщик мусора не трогает blob'ы моложе grace-периода, даже без ссылок.
+        """
+        fd, temp_path = tempfile.mkstemp(dir=self.tmp_dir, suffix=".part")
+        digest = hashlib.sha256()
+        written = 0
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = source.read(settings.UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    written += len(chunk)
+                    if written > limit:
+                        raise UploadTooLargeError(filename, limit)
+                    digest.update(chunk)
+                    out.write(chunk)
+                out.flush()
+                os.fsync(out.fileno())
+
+            key = self.key_for(digest.hexdigest(), extension)
+            destination = self.path_for(key)
+            if os.path.exists(destination):
+                os.unlink(temp_path)
+                os.utime(destination)
+            else:
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                os.chmod(temp_path, 0o644)
+                os.replace(temp_path, destination)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+        return key
+
+    def iter_blobs(self):
+        # (key, path, stat) для всех blob'ов, кроме временных файлов
+        for first in sorted(os.listdir(self.root)):
+            first_dir = os.path.join(self.root, first)
+            if first == "tmp" or not os.path.isdir(first_dir):
+                continue
+            for second in sorted(os.listdir(first_dir)):
+                second_dir = os.path.join(first_dir, second)
+                if not os.path.isdir(second_dir):
+                    continue
+                for name in sorted(os.listdir(second_dir)):
+                    path = os.path.join(second_dir, name)
+                    yield f"{first}/{second}/{name}", path, os.stat(path)
+
+    def collect_garbage(self, db, grace_seconds: float, dry_run: bool = False,
+                        recount: bool = False) -> dict:
+        """Удаляет blob'ы без ссылок, записи media_blobs с нулём ссылок и брошенные .part.
+
+        Blob'ы моложе grace_seconds не трогаются: между записью файла и коммитом
+        товара ссылки на него ещё нет. recount пересчитывает счётчики по товарам
+        (на случай расхождения после ручных правок БД).
+        """
+        from .crud import product_media
+        from .models import MediaBlob, Product
+
+        report = {"deleted": 0, "freed_bytes": 0, "kept_young": 0, "stale_parts": 0,
+                  "missing_files": 0, "recounted": 0, "dry_run": dry_run}
+
+        if recount:
+            counts = Counter()
+            for row in db.query(Product.image_paths, Product.video_paths, Product.image_variants):
+                counts.update(self.keys_from_urls(product_media(*row)))
+            for blob in db.query(MediaBlob):
+                refcount = counts.pop(blob.key, 0)
+                if blob.refcount != refcount:
+                    blob.refcount = refcount
+                    report["recounted"] += 1
+            # Ссылки на blob'ы, для которых записи нет совсем
+            for key, refcount in counts.items():
+                path = self.path_for(key)
+                size = os.stat(path).st_size if os.path.exists(path) else 0
+                db.add(MediaBlob(key=key, size=size, refcount=refcount))
+                report["recounted"] += 1
+            db.flush()
+
+        referenced = {key for key, in db.query(MediaBlob.key).filter(MediaBlob.refcount > 0)}
+        cutoff = time.time() - grace_seconds
+
+        on_disk = set()
+        for key, path, stat in self.iter_blobs():
+            on_disk.add(key)
+            if key in referenced:
+                continue
+            if stat.st_mtime > cutoff:
+                report["kept_young"] += 1
+                continue
+            report["deleted"] += 1
+            report["freed_bytes"] += stat.st_size
+            if not dry_run:
+                # Сначала запись, потом файл: условие refcount <= 0 не даёт удалить
+                # blob, на который успели сослаться после выборки referenced
+                db.query(MediaBlob).filter(
+                    MediaBlob.key == key, MediaBlob.refcount <= 0
+                ).delete(synchronize_session=False)
+                db.commit()
+                if db.query(MediaBlob.key).filter(MediaBlob.key == key).first() is None:
+                    os.unlink(path)
+
+        report["missing_files"] = len(referenced - on_disk)
+
+        # Записи с нулём ссылок, чьих файлов уже нет
+        for blob in db.query(MediaBlob).filter(MediaBlob.refcount <= 0):
+            if blob.key not in on_disk and not dry_run:
+                db.delete(blob)
+
+        if dry_run:
+            db.rollback()
+        else:
+            db.commit()
+
+        for name in os.listdir(self.tmp_dir):
+            path = os.path.join(self.tmp_dir, name)
+            if os.stat(path).st_mtime <= cutoff:
+                report["stale_parts"] += 1
+                if not dry_run:
+                    os.unlink(path)
+
+        return report
+
+
+media_store = MediaStore(settings.MEDIA_DIR, settings.MEDIA_URL)
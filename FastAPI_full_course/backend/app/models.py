@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Text, ForeignKey
 from sqlalchemy.orm import relationship
 from .database import Base
 from .config import settings
@@ -16,6 +16,8 @@ if settings.DATABASE_TYPE == 'mysql':
         hashed_password = Column(String(255))
         full_name = Column(String(255))
         role = Column(String(50), default="user")  # guest, user, admin
+        # Увеличивается при смене роли/удалении: выданные раньше токены перестают приниматься
+        token_version = Column(Integer, nullable=False, default=0, server_default="0")
 
         products = relationship("Product", back_populates="owner")
 
@@ -30,10 +32,13 @@ if settings.DATABASE_TYPE == 'mysql':
         # For MySQL, store as JSON
         image_paths = Column(JSON, default=[])
         video_paths = Column(JSON, default=[])
+        # Превью по порядку image_paths: [{"thumb": url, "card": url}, ...]; NULL - ещё не готовы
+        image_variants = Column(JSON(none_as_null=True), nullable=True)
 
         owner = relationship("User", back_populates="products")
 
 else:
+    from sqlalchemy import JSON
     from sqlalchemy.dialects.postgresql import ARRAY
 
 
@@ -45,6 +50,8 @@ else:
         hashed_password = Column(String(255))
         full_name = Column(String(255))
         role = Column(String(50), default="user")  # guest, user, admin
+        # Увеличивается при смене роли/удалении: выданные раньше токены перестают приниматься
+        token_version = Column(Integer, nullable=False, default=0, server_default="0")
 
         products = relationship("Product", back_populates="owner")
 
@@ -59,5 +66,17 @@ else:
         # For PostgreSQL, use native ARRAY
         image_paths = Column(ARRAY(String), default=[])
         video_paths = Column(ARRAY(String), default=[])
+        # Превью по порядку image_paths: [{"thumb": url, "card": url}, ...]; NULL - ещё не готовы
+        image_variants = Column(JSON(none_as_null=True), nullable=True)
+
+        owner = relationship("User", back_populates="products")
+
+
+class MediaBlob(Base):
+    """Файл content-addressed хранилища и число ссылок на него из товаров"""
+    __tablename__ = "media_blobs"
 
-        owner = relationship("User", back_populates="products")
\ No newline at end of file
+    # "ab/cd/<sha256><ext>" - путь внутри MEDIA_DIR
+    key = Column(String(100), primary_key=True)
+    size = Column(BigInteger, nullable=False, default=0)
+    refcount = Column(Integer, nullable=False, default=0, server_default="0")
@@ -0,0 +1,133 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from passlib.context import CryptContext
+
+from .config import settings
+
+# Хэши в формате passlib ($2b$12$..., $scrypt$ln=14,r=8,p=1$...) хранят схему
+# и стоимость; хэши другой схемы или с меньшей стоимостью помечаются на обновление
+pwd_context = CryptContext(
+    schemes=list(dict.fromkeys([settings.PASSWORD_SCHEME, "bcrypt", "scrypt"])),
+    default=settings.PASSWORD_SCHEME,
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    scrypt__default_rounds=settings.SCRYPT_ROUNDS,
+    scrypt__min_rounds=settings.SCRYPT_ROUNDS
+)
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return pwd_context.verify(plain_password, hashed_password)
+
+
+def verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+class HashingOverloadedError(RuntimeError):
+    pass
+
+
+def _timed_call(func: Callable, *args) -> tuple:
+    started = time.perf_counter()
+    return func(*args), time.perf_counter() - started
+
+
+class PasswordHasher:
+    # Функции pwd_context выполняются в пуле процессов (spawn): bcrypt/scrypt занимают
+    # ~100-300 мс CPU и не должны стоять в event loop или threadpool Starlette.
+    # Тот же пул есть в FastAPI_Lite_v2/server/utils/password_hasher.py: приложения
+    # собираются каждое из своего каталога, общий модуль им не импортировать
+
+    def __init__(self, workers: Optional[int] = None, max_concurrency: Optional[int] = None, max_queue: int = 1000):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_concurrency = max_concurrency or self.workers
+        self.max_queue = max_queue
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        self._waiting = 0
+        self._in_flight = 0
+        self._peak_waiting = 0
+        self._completed = 0
+        self._rejected = 0
+        self._queue_time = 0.0
+        self._run_time = 0.0
+
+    async def _submit(self, func: Callable, *args) -> Any:
+        # Ожидающих не больше max_queue, сверх этого - отказ, а не растущая очередь
+        if self._waiting >= self.max_queue:
+            self._rejected += 1
+            raise HashingOverloadedError("Password hashing queue is full")
+
+        queued_at = time.perf_counter()
+        self._waiting += 1
+        self._peak_waiting = max(self._peak_waiting, self._waiting)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+
+        self._in_flight += 1
+        self._queue_time += time.perf_counter() - queued_at
+        try:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+            loop = asyncio.get_running_loop()
+            result, run_time = await loop.run_in_executor(self._executor, _timed_call, func, *args)
+        finally:
+            self._in_flight -= 1
+            self._semaphore.release()
+
+        self._completed += 1
+        self._run_time += run_time
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(hash_password, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._submit(verify_password, password, hashed_password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        # (пароль верен, новый хэш или None): вход заодно переводит старые хэши на текущую стоимость
+        return await self._submit(verify_and_update, password, hashed_password)
+
+    def stats(self) -> Dict[str, Any]:
+        completed = self._completed
+        return {
+            "workers": self.workers,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "peak_waiting": self._peak_waiting,
+            "completed": completed,
+            "rejected": self._rejected,
+            "avg_queue_ms": round(self._queue_time / completed * 1000, 3) if completed else 0.0,
+            "avg_run_ms": round(self._run_time / completed * 1000, 3) if completed else 0.0,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_concurrency=settings.PASSWORD_HASH_MAX_CONCURRENCY,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE
+)
@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from .config import settings
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Снимок пользователя для read-путей: без ORM-сессии и ленивых связей"""
+    id: int
+    email: str
+    full_name: str
+    role: str
+    token_version: int
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            full_name=user.full_name,
+            role=user.role,
+            token_version=user.token_version or 0
+        )
+
+
+class PrincipalCache:
+    """Кэш пользователей на процесс с коротким TTL.
+
+    БД читается только при промахе: там же проверяется token_version.
+    Отзыв токенов (смена роли, удаление) сбрасывает запись в этом процессе,
+    остальные воркеры увидят новую версию не позже чем через ttl секунд.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data: "OrderedDict[int, tuple]" = OrderedDict()
+        # Обращения идут и из event loop, и из threadpool (sync-эндпоинты)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int) -> Optional[Principal]:
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is None or entry[1] <= time.monotonic():
+                self.misses += 1
+                return None
+            self._data.move_to_end(user_id)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, principal: Principal):
+        with self._lock:
+            self._data[principal.id] = (principal, time.monotonic() + self.ttl)
+            self._data.move_to_end(principal.id)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._data.pop(user_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._data), "ttl": self.ttl, "hits": self.hits, "misses": self.misses}
+
+
+principal_cache = PrincipalCache(settings.AUTH_USER_CACHE_TTL, settings.AUTH_USER_CACHE_SIZE)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import List
+from pydantic import BaseModel, EmailStr, computed_field
+from typing import Dict, List, Optional
 
 
 class UserBase(BaseModel):
@@ -45,6 +45,17 @@ class Product(ProductBase):
     owner_id: int
     image_paths: List[str]
     video_paths: List[str]
+    image_variants: Optional[List[Dict[str, str]]] = None
+
+    @computed_field
+    @property
+    def thumbnail_paths(self) -> List[str]:
+        # Для карточек в списках: превью, а пока оно не готово - оригинал
+        variants = self.image_variants or []
+        return [
+            (variants[index].get("thumb") if index < len(variants) else None) or path
+            for index, path in enumerate(self.image_paths)
+        ]
 
     class Config:
         from_attributes = True
@@ -0,0 +1,50 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+
+from .config import settings
+from .media_store import UploadTooLargeError, media_store, normalize_extension
+
+# Отдельный пул: копирование многогигабайтных видео не занимает threadpool
+# Starlette, в котором выполняются sync-эндпоинты
+_executor = ThreadPoolExecutor(max_workers=settings.UPLOAD_WORKERS, thread_name_prefix="upload")
+
+
+async def _run(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+
+
+async def save_upload(upload: UploadFile, limit: int) -> str:
+    # upload.file - SpooledTemporaryFile Starlette (больше 1 МБ - уже на диске),
+    # копирование с подсчётом sha256 - один переход в поток
+    key = await _run(media_store.put, upload.file, normalize_extension(upload.filename), limit, upload.filename)
+    return media_store.url_for(key)
+
+
+async def save_product_media(
+        images: Optional[List[UploadFile]],
+        videos: Optional[List[UploadFile]]
+) -> Tuple[List[str], List[str]]:
+    # Все файлы запроса копируются параллельно. При ошибке уже сохранённые blob'ы
+    # не удаляются: они могут принадлежать другим товарам, без ссылок их заберёт GC
+    images, videos = images or [], videos or []
+    results = await asyncio.gather(
+        *(save_upload(image, settings.MAX_IMAGE_SIZE) for image in images),
+        *(save_upload(video, settings.MAX_VIDEO_SIZE) for video in videos),
+        return_exceptions=True
+    )
+
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        error = errors[0]
+        if isinstance(error, UploadTooLargeError):
+            raise HTTPException(status_code=413, detail=str(error))
+        raise error
+
+    return list(results[:len(images)]), list(results[len(images):])
+
+
+def shutdown_uploads():
+    _executor.shutdown(wait=True)
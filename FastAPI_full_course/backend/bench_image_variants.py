@@ -0,0 +1,74 @@
+"""
+Product image variants: bytes a product card downloads and cost of building them.
+
+Сравнивает оригинал с WebP-превью и время построения превью с JPEG draft
+(декодирование сразу в уменьшенном масштабе) и без него. Запуск из каталога backend:
+    python bench_image_variants.py --width 4000 --height 3000 --repeat 5
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+
+# Добавляем текущую директорию в путь Python
+sys.path.insert(0, os.path.dirname(__file__))
+
+from PIL import Image, ImageFilter
+
+from app.config import settings
+from app.image_variants import VARIANTS
+
+
+def photo(width: int, height: int) -> bytes:
+    # Шум с размытием сжимается примерно как фотография, а не как заливка
+    image = Image.effect_noise((width, height), 64).convert("RGB").filter(ImageFilter.GaussianBlur(2))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def build(path: str, draft: bool) -> dict:
+    sizes = {}
+    with Image.open(path) as original:
+        if draft:
+            original.draft("RGB", (VARIANTS[0][1], VARIANTS[0][1]))
+        image = original.convert("RGB")
+        for name, size in VARIANTS:
+            image = image.copy()
+            image.thumbnail((size, size), Image.LANCZOS, reducing_gap=3.0)
+            buffer = io.BytesIO()
+            image.save(buffer, "WEBP", quality=settings.IMAGE_WEBP_QUALITY, method=4)
+            sizes[name] = buffer.tell()
+    return sizes
+
+
+def bench(width: int, height: int, repeat: int):
+    with tempfile.NamedTemporaryFile(suffix=".jpg") as file:
+        data = photo(width, height)
+        file.write(data)
+        file.flush()
+
+        print(f"{width}x{height} JPEG, best of {repeat}")
+        for draft in (False, True):
+            best = float("inf")
+            for _ in range(repeat):
+                started = time.perf_counter()
+                sizes = build(file.name, draft)
+                best = min(best, time.perf_counter() - started)
+            label = "with draft" if draft else "full decode"
+            print(f"  {label:<12} {best * 1000:8.1f} ms per image")
+
+        print(f"  original     {len(data) / 1024:8.1f} KB")
+        for name, size in sizes.items():
+            print(f"  {name:<12} {size / 1024:8.1f} KB  ({len(data) / size:.0f}x smaller)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    bench(args.width, args.height, args.repeat)
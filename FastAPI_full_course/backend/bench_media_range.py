@@ -0,0 +1,76 @@
+"""
+Video seek: StaticFiles (Range игнорируется, весь файл) vs MediaFiles (206, только диапазон).
+
+Плеер при перемотке запрашивает Range: bytes=<offset>- и читает первый мегабайт;
+бенчмарк считает, сколько байт и времени уходит на такой запрос в приложении.
+Запуск из каталога backend:
+    python bench_media_range.py --video-mb 256 --seeks 20
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Добавляем текущую директорию в путь Python
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fastapi.staticfiles import StaticFiles
+
+from app.media_files import MediaFiles, UPLOAD_NAME
+
+SEEK_READ = 1024 * 1024
+
+
+async def seek(app, name: str, offset: int) -> tuple:
+    # Без поддержки Range приложение отправляет весь файл, сколько бы ни нужно было плееру
+    sent = 0
+    status = None
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal sent, status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            sent += len(message.get("body", b""))
+
+    scope = {
+        "type": "http", "method": "GET", "path": f"/{name}", "root_path": "", "query_string": b"",
+        "headers": [(b"range", f"bytes={offset}-{offset + SEEK_READ - 1}".encode())],
+    }
+    await app(scope, receive, send)
+    return status, sent
+
+
+async def bench(video_mb: int, seeks: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "video.mp4"), "wb") as file:
+            block = os.urandom(1024 * 1024)
+            for _ in range(video_mb):
+                file.write(block)
+
+        offsets = [random.randrange(0, (video_mb - 1) * 1024 * 1024) for _ in range(seeks)]
+        print(f"{video_mb} MB video, {seeks} seeks reading {SEEK_READ // 1024} KB each")
+        for label, app in (("StaticFiles", StaticFiles(directory=tmp)),
+                           ("MediaFiles", MediaFiles(tmp, UPLOAD_NAME))):
+            started = time.perf_counter()
+            total = 0
+            for offset in offsets:
+                status, sent = await seek(app, "video.mp4", offset)
+                total += sent
+            elapsed = time.perf_counter() - started
+            print(f"  {label:<12} status {status}  {elapsed / seeks * 1000:8.1f} ms/seek  "
+                  f"{total / seeks / 2 ** 20:8.1f} MB sent/seek")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--video-mb", type=int, default=256)
+    parser.add_argument("--seeks", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(bench(args.video_mb, args.seeks))
@@ -0,0 +1,74 @@
+"""
+Login throughput with bcrypt: inline vs threadpool vs process pool.
+
+Run from the backend directory:
+    python bench_password_hashing.py --requests 64 --concurrency 32
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+# Добавляем текущую директорию в путь Python
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.password_hasher import PasswordHasher, hash_password, verify_password
+
+
+async def measure(name: str, verify, hashed: str, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    max_lag = 0.0
+    running = True
+
+    async def ticker():
+        # Задержка event loop: насколько позже срабатывает sleep(0.01)
+        nonlocal max_lag
+        while running:
+            started = time.perf_counter()
+            await asyncio.sleep(0.01)
+            max_lag = max(max_lag, time.perf_counter() - started - 0.01)
+
+    async def login():
+        async with semaphore:
+            assert await verify("password123", hashed)
+
+    tick = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    running = False
+    await tick
+
+    print(f"  {name:<28} {requests / elapsed:>7.1f} logins/s   max loop lag {max_lag * 1000:>7.1f} ms")
+
+
+async def bench(requests: int, concurrency: int):
+    hashed = hash_password("password123")
+    cores = os.cpu_count() or 1
+    print(f"bcrypt verify, {requests} logins, concurrency {concurrency}, {cores} CPU cores")
+
+    async def inline(password, hashed_password):
+        return verify_password(password, hashed_password)
+
+    async def threadpool(password, hashed_password):
+        return await asyncio.to_thread(verify_password, password, hashed_password)
+
+    await measure("inline (blocks the loop)", inline, hashed, requests, concurrency)
+    await measure("default threadpool", threadpool, hashed, requests, concurrency)
+
+    for workers in sorted({1, max(1, cores // 2), cores}):
+        hasher = PasswordHasher(workers=workers)
+        # Прогрев: запуск процессов не должен попадать в замер
+        await asyncio.gather(*(hasher.verify("password123", hashed) for _ in range(workers)))
+        await measure(f"process pool, {workers} workers", hasher.verify, hashed, requests, concurrency)
+        print(f"    {hasher.stats()}")
+        hasher.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+    asyncio.run(bench(args.requests, args.concurrency))
@@ -0,0 +1,97 @@
+"""
+Product media upload: read-whole-file vs chunked copy in upload threads.
+
+Starlette has already spooled the multipart body to a temporary file; the
+benchmark measures only what the handler does with it. Run from the backend
+directory:
+    python bench_uploads.py --video-mb 512 --images 5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+
+# Добавляем текущую директорию в путь Python
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fastapi import UploadFile
+
+from app.media_store import media_store
+from app.uploads import save_product_media
+
+
+def spooled_upload(directory: str, name: str, size_mb: int) -> UploadFile:
+    file = tempfile.TemporaryFile(dir=directory)
+    block = os.urandom(1024 * 1024)
+    for _ in range(size_mb):
+        file.write(block)
+    file.seek(0)
+    return UploadFile(file=file, filename=name)
+
+
+async def legacy_save(uploads):
+    # Прежний create_product: файл целиком в память и блокирующая запись в event loop
+    for upload in uploads:
+        filename = f"{uuid.uuid4()}{os.path.splitext(upload.filename)[1]}"
+        with open(f"app/static/uploads/{filename}", "wb") as buffer:
+            content = await upload.read()
+            buffer.write(content)
+
+
+async def measure(name: str, save, make_uploads):
+    uploads = make_uploads()
+    max_lag = 0.0
+    running = True
+
+    async def ticker():
+        # Задержка event loop: насколько позже срабатывает sleep(0.005)
+        nonlocal max_lag
+        while running:
+            started = time.perf_counter()
+            await asyncio.sleep(0.005)
+            max_lag = max(max_lag, time.perf_counter() - started - 0.005)
+
+    tick = asyncio.create_task(ticker())
+    tracemalloc.start()
+    started = time.perf_counter()
+    await save(uploads)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    running = False
+    await tick
+    for upload in uploads:
+        upload.file.close()
+
+    print(f"  {name:<22} {elapsed:>7.2f} s   peak memory {peak / 2 ** 20:>8.1f} MB   "
+          f"max loop lag {max_lag * 1000:>8.1f} ms")
+
+
+async def bench(video_mb: int, image_mb: int, images: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        os.makedirs("app/static/uploads")
+        media_store.ensure_dirs()
+
+        def make_uploads():
+            files = [spooled_upload(tmp, f"photo{i}.jpg", image_mb) for i in range(images)]
+            files.append(spooled_upload(tmp, "video.mp4", video_mb))
+            return files
+
+        print(f"{images} x {image_mb} MB images + {video_mb} MB video")
+        await measure("read() + write", legacy_save, make_uploads)
+        await measure("chunked upload threads",
+                      lambda uploads: save_product_media(uploads[:-1], uploads[-1:]), make_uploads)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--video-mb", type=int, default=512)
+    parser.add_argument("--image-mb", type=int, default=4)
+    parser.add_argument("--images", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(bench(args.video_mb, args.image_mb, args.images))
@@ -0,0 +1,55 @@
+"""
+Подбор стоимости хэширования паролей под текущее железо.
+
+Увеличивает rounds (log2 стоимости), пока одна проверка пароля не займёт
+не меньше --target-ms, и печатает настройки для .env:
+    python calibrate_password_hash.py --scheme bcrypt --target-ms 250
+"""
+import argparse
+import os
+import sys
+import time
+
+# Добавляем текущую директорию в путь Python
+sys.path.insert(0, os.path.dirname(__file__))
+
+from passlib.hash import bcrypt, scrypt
+
+HANDLERS = {
+    "bcrypt": (bcrypt, "BCRYPT_ROUNDS", 4, 20),
+    "scrypt": (scrypt, "SCRYPT_ROUNDS", 10, 20),
+}
+
+
+def verify_ms(handler, rounds: int) -> float:
+    hashed = handler.using(rounds=rounds).hash("calibration-password")
+    started = time.perf_counter()
+    handler.verify("calibration-password", hashed)
+    return (time.perf_counter() - started) * 1000
+
+
+def calibrate(scheme: str, target_ms: float):
+    handler, setting, min_rounds, max_rounds = HANDLERS[scheme]
+    rounds = min_rounds
+    elapsed = verify_ms(handler, rounds)
+    print(f"  rounds={rounds:<3} {elapsed:>8.1f} ms")
+    # Каждый шаг удваивает стоимость
+    while elapsed < target_ms and rounds < max_rounds:
+        rounds += 1
+        elapsed = verify_ms(handler, rounds)
+        print(f"  rounds={rounds:<3} {elapsed:>8.1f} ms")
+    return setting, rounds, elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calibrate password hash cost")
+    parser.add_argument("--scheme", choices=sorted(HANDLERS), default="bcrypt")
+    parser.add_argument("--target-ms", type=float, default=250.0)
+    args = parser.parse_args()
+
+    print(f"Calibrating {args.scheme} for ~{args.target_ms:.0f} ms per verify...")
+    setting, rounds, elapsed = calibrate(args.scheme, args.target_ms)
+
+    print(f"\n# {args.scheme}: verify takes {elapsed:.1f} ms on this machine")
+    print(f"PASSWORD_SCHEME={args.scheme}")
+    print(f"{setting}={rounds}")
@@ -0,0 +1,46 @@
+"""
+Сборка мусора в content-addressed хранилище медиа.
+
+Удаляет blob'ы, на которые не ссылается ни один товар, старше grace-периода,
+и брошенные временные .part файлы. Запускать из каталога backend (cron):
+    python gc_media.py --dry-run
+    python gc_media.py --recount --grace-hours 24
+"""
+import argparse
+import os
+import sys
+
+# Добавляем текущую директорию в путь Python
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app.config import settings
+from app.database import SessionLocal, create_tables
+from app.media_store import media_store
+
+
+def collect(grace_seconds: float, dry_run: bool, recount: bool) -> dict:
+    create_tables()
+    media_store.ensure_dirs()
+    db = SessionLocal()
+    try:
+        return media_store.collect_garbage(db, grace_seconds, dry_run=dry_run, recount=recount)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Delete unreferenced media blobs")
+    parser.add_argument("--grace-hours", type=float, default=settings.MEDIA_GC_GRACE_SECONDS / 3600)
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be deleted")
+    parser.add_argument("--recount", action="store_true", help="rebuild reference counts from products first")
+    args = parser.parse_args()
+
+    report = collect(args.grace_hours * 3600, args.dry_run, args.recount)
+    action = "Would delete" if args.dry_run else "Deleted"
+    print(f"{action} {report['deleted']} blobs ({report['freed_bytes'] / 2 ** 20:.1f} MB), "
+          f"{report['stale_parts']} stale .part files")
+    print(f"Kept {report['kept_young']} unreferenced blobs younger than {args.grace_hours:g} h")
+    if report["recounted"]:
+        print(f"Fixed {report['recounted']} reference counts")
+    if report["missing_files"]:
+        print(f"WARNING: {report['missing_files']} referenced blobs are missing on disk")
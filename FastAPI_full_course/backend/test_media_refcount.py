@@ -0,0 +1,63 @@
+import os
+import requests
+
+BASE_URL = "http://localhost:8000"
+
+
+def media_references(headers):
+    response = requests.get(f"{BASE_URL}/api/debug/media", headers=headers)
+    response.raise_for_status()
+    return response.json()["references"]
+
+
+def test_media_refcount():
+    print("=== Testing Media Refcount On Product Delete ===")
+
+    try:
+        login = requests.post(f"{BASE_URL}/api/login", json={
+            "email": "admin@admin.com",
+            "password": "admin123"
+        })
+        if login.status_code != 200:
+            print(f"❌ Admin login failed: {login.text}")
+            return
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+        # Видео без превью: число ссылок не меняется фоновой обработкой изображений
+        before = media_references(headers)
+        files = [("videos", ("clip.mp4", os.urandom(1024), "video/mp4"))]
+        created = requests.post(f"{BASE_URL}/api/products/", headers=headers,
+                                data={"name": "Refcount test", "description": "media refcount"}, files=files)
+        print(f"Create status: {created.status_code}")
+        if created.status_code != 200:
+            print(f"❌ Product creation failed: {created.text}")
+            return
+        product_id = created.json()["id"]
+
+        after_create = media_references(headers)
+        print(f"References: before={before}, after create={after_create}")
+        if after_create != before + 1:
+            print("❌ Upload did not add a media reference")
+            return
+
+        deleted = requests.delete(f"{BASE_URL}/api/products/{product_id}", headers=headers)
+        print(f"Delete status: {deleted.status_code}")
+        if deleted.status_code != 200:
+            print(f"❌ Product deletion failed: {deleted.text}")
+            return
+
+        after_delete = media_references(headers)
+        print(f"References after delete: {after_delete}")
+        if after_delete == before:
+            print("✅ Product delete released its media")
+        else:
+            print("❌ Media refcount was not decremented")
+
+    except Exception as e:
+        print(f"❌ Connection error: {e}")
+        import traceback
+        traceback.print_exc()
+
+
+if __name__ == "__main__":
+    test_media_refcount()
@@ -0,0 +1,62 @@
+import uuid
+import requests
+
+BASE_URL = "http://localhost:8000"
+
+
+def login(email, password):
+    response = requests.post(f"{BASE_URL}/api/login", json={"email": email, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_token_revocation():
+    print("=== Testing Token Revocation On Role Change ===")
+
+    email = f"promoted_{uuid.uuid4().hex[:8]}@example.com"
+    password = "testpassword123"
+
+    try:
+        registered = requests.post(f"{BASE_URL}/api/register", json={
+            "email": email,
+            "password": password,
+            "full_name": "Promoted User"
+        })
+        if registered.status_code != 200:
+            print(f"❌ User registration failed: {registered.text}")
+            return
+        user_id = registered.json()["id"]
+
+        # Токен выдан до смены роли
+        old_headers = login(email, password)
+        me = requests.get(f"{BASE_URL}/api/me", headers=old_headers)
+        print(f"Before role change: {me.status_code} {me.text}")
+
+        admin_headers = login("admin@admin.com", "admin123")
+        promoted = requests.post(f"{BASE_URL}/api/admin/users/{user_id}/make-admin", headers=admin_headers)
+        print(f"Make admin status: {promoted.status_code}")
+        if promoted.status_code != 200 or promoted.json()["role"] != "admin":
+            print(f"❌ Role change failed: {promoted.text}")
+            return
+
+        stale = requests.get(f"{BASE_URL}/api/me", headers=old_headers)
+        print(f"Old token after role change: {stale.status_code}")
+        if stale.status_code == 401:
+            print("✅ Token issued before the role change is rejected")
+        else:
+            print(f"❌ Old token still accepted: {stale.text}")
+
+        fresh = requests.get(f"{BASE_URL}/api/me", headers=login(email, password))
+        if fresh.status_code == 200 and fresh.json()["role"] == "admin":
+            print("✅ New token carries the admin role")
+        else:
+            print(f"❌ New token: {fresh.status_code} {fresh.text}")
+
+    except Exception as e:
+        print(f"❌ Connection error: {e}")
+        import traceback
+        traceback.print_exc()
+
+
+if __name__ == "__main__":
+    test_token_revocation()
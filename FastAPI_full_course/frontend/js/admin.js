@@ -153,8 +153,8 @@ function displayAllProducts(products) {
     }
 
     grid.innerHTML = products.map(product => {
-        const firstImage = product.image_paths && product.image_paths.length > 0
-            ? product.image_paths[0]
+        const firstImage = product.thumbnail_paths && product.thumbnail_paths.length > 0
+            ? product.thumbnail_paths[0]
             : '/static/uploads/default-product.jpg';
 
         return `
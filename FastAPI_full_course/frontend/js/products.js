@@ -21,8 +21,8 @@ async function loadAllProducts() {
         grid.innerHTML = '';
 
         products.forEach(product => {
-            const firstImage = product.image_paths && product.image_paths.length > 0
-                ? product.image_paths[0]
+            const firstImage = product.thumbnail_paths && product.thumbnail_paths.length > 0
+                ? product.thumbnail_paths[0]
                 : '/static/uploads/default-product.jpg';
 
             const productCard = document.createElement('div');
@@ -74,8 +74,8 @@ async function loadMyProducts() {
         grid.innerHTML = '';
 
         myProducts.forEach(product => {
-            const firstImage = product.image_paths && product.image_paths.length > 0
-                ? product.image_paths[0]
+            const firstImage = product.thumbnail_paths && product.thumbnail_paths.length > 0
+                ? product.thumbnail_paths[0]
                 : '/static/uploads/default-product.jpg';
 
             const productCard = document.createElement('div');
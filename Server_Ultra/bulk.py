@@ -0,0 +1,236 @@
+import asyncio
+import csv
+import json
+from collections import deque
+from functools import lru_cache
+from typing import AsyncIterator, List, Tuple, Type
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+# Строк в одной пачке: одна блокировка хранилища и один fsync журнала на пачку
+BULK_BATCH_SIZE = 1000
+# Ошибок в отчёте не больше этого числа, чтобы отчёт не рос вместе с телом запроса
+MAX_REPORTED_ERRORS = 1000
+# Предел одной физической строки: тело без переводов строк не должно собраться в память целиком
+BULK_MAX_LINE_BYTES = 1024 * 1024
+# Предел одной CSV-записи: незакрытая кавычка не должна собрать в память всё тело
+CSV_MAX_RECORD_BYTES = 1024 * 1024
+
+
+class LineTooLongError(ValueError):
+    def __init__(self, line_no: int):
+        super().__init__(f"Line {line_no} is longer than {BULK_MAX_LINE_BYTES} bytes")
+        self.line_no = line_no
+        # Отчёт о строках до неё заполняет import_users
+        self.report = None
+
+
+async def iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    # Тело читается по частям, в памяти держится только незавершённая строка
+    # (не длиннее BULK_MAX_LINE_BYTES плюс одна часть тела).
+    # Строки отдаются вместе с \n: csv.reader нужны переводы строк внутри кавычек
+    buffer = bytearray()
+    line_no = 0
+    async for chunk in stream:
+        # Поиск продолжается с конца прошлой части: длинная строка не сканируется заново
+        scan = len(buffer)
+        buffer += chunk
+        start = 0
+        while (end := buffer.find(b"\n", scan)) != -1:
+            line_no += 1
+            if end - start > BULK_MAX_LINE_BYTES:
+                raise LineTooLongError(line_no)
+            yield line_no, bytes(buffer[start:end + 1])
+            start = scan = end + 1
+        # Удаление из начала bytearray не копирует остаток
+        del buffer[:start]
+        if len(buffer) > BULK_MAX_LINE_BYTES:
+            raise LineTooLongError(line_no + 1)
+    if buffer:
+        yield line_no + 1, bytes(buffer)
+
+
+def _decode(line_no: int, raw_line: bytes) -> str:
+    return raw_line.decode("utf-8-sig" if line_no == 1 else "utf-8", errors="replace")
+
+
+class _LineFeed:
+    # Источник строк для единственного csv.reader: строки записи кладутся в очередь
+    # перед каждым next(reader), поэтому читатель не упирается в недочитанное тело
+
+    def __init__(self):
+        self.lines = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+
+async def iter_csv_rows(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, object]]:
+    # Поле в кавычках может содержать перевод строки: физические строки копятся,
+    # пока число кавычек в записи не станет чётным (кавычки внутри поля удваиваются)
+    feed = _LineFeed()
+    reader = csv.reader(feed)
+    header = None
+    record_line = None
+    quotes = size = 0
+    async for line_no, raw_line in iter_lines(stream):
+        if record_line is None:
+            if not raw_line.strip():
+                continue
+            record_line = line_no
+        feed.lines.append(_decode(line_no, raw_line))
+        quotes += raw_line.count(b'"')
+        size += len(raw_line)
+        if quotes % 2:
+            if size <= CSV_MAX_RECORD_BYTES:
+                continue
+            feed.lines.clear()
+            yield record_line, ValueError("Quoted field is too long or not closed")
+            record_line, quotes, size = None, 0, 0
+            continue
+
+        try:
+            values = next(reader)
+        except csv.Error as error:
+            values = error
+        feed.lines.clear()
+        row_line, record_line, quotes, size = record_line, None, 0, 0
+
+        if isinstance(values, Exception):
+            yield row_line, ValueError(f"Invalid CSV: {values}")
+        elif header is None:
+            header = [name.strip() for name in values]
+        elif len(values) != len(header):
+            yield row_line, ValueError(f"Expected {len(header)} columns, got {len(values)}")
+        else:
+            yield row_line, dict(zip(header, values))
+
+    if record_line is not None:
+        yield record_line, ValueError("Quoted field is not closed")
+
+
+async def iter_rows(stream: AsyncIterator[bytes], fmt: str) -> AsyncIterator[Tuple[int, object]]:
+    if fmt == "csv":
+        async for item in iter_csv_rows(stream):
+            yield item
+        return
+
+    async for line_no, raw_line in iter_lines(stream):
+        line = _decode(line_no, raw_line)
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except json.JSONDecodeError as error:
+            yield line_no, ValueError(f"Invalid JSON: {error.msg}")
+
+
+@lru_cache(maxsize=None)
+def batch_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    # Валидатор списка строится один раз на модель: вся пачка проверяется одним вызовом
+    return TypeAdapter(List[model])
+
+
+def _error_message(errors: List[dict]) -> str:
+    # loc[0] - индекс строки в пачке, дальше путь к полю
+    return "; ".join(
+        f"{'.'.join(map(str, e['loc'][1:]))}: {e['msg']}" if len(e["loc"]) > 1 else e["msg"]
+        for e in errors
+    )
+
+
+def validate_batch(model: Type[BaseModel], rows: List[Tuple[int, object]]) -> Tuple[list, list]:
+    """Проверяет пачку одним вызовом TypeAdapter(list[Model]).
+
+    Возвращает ([(строка, модель)], [(строка, ошибка)]). Если в пачке есть
+    ошибки, валидные строки проверяются ещё одним пакетным вызовом.
+    """
+    adapter = batch_adapter(model)
+    try:
+        return list(zip((line_no for line_no, _ in rows), adapter.validate_python([row for _, row in rows]))), []
+    except ValidationError as error:
+        by_index: dict = {}
+        for item in error.errors():
+            by_index.setdefault(item["loc"][0], []).append(item)
+
+    errors = [(rows[index][0], _error_message(items)) for index, items in sorted(by_index.items())]
+    valid = [row for index, row in enumerate(rows) if index not in by_index]
+    if not valid:
+        return [], errors
+    return list(zip((line_no for line_no, _ in valid), adapter.validate_python([row for _, row in valid]))), errors
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+
+    def error(self, line_no: int, message: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line_no, "error": message})
+
+    def to_dict(self) -> dict:
+        return {
+            "created": self.created,
+            "failed": self.failed,
+            # Ошибки проверки приходят пачкой после ошибок разбора: отчёт - в порядке строк
+            "errors": sorted(self.errors, key=lambda error: error["line"]),
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+async def import_users(stream: AsyncIterator[bytes], fmt: str, store, model: Type[BaseModel]) -> dict:
+    report = ImportReport()
+    batch: List[Tuple[int, object]] = []
+
+    async def flush_batch():
+        users, errors = validate_batch(model, batch)
+        batch.clear()
+        for line_no, message in errors:
+            report.error(line_no, message)
+        results = await store.create_many([(user.name, user.email) for _, user in users])
+        for (line_no, user), record in zip(users, results):
+            if record is None:
+                report.error(line_no, f"Email already registered: {user.email}")
+            else:
+                report.created += 1
+
+    try:
+        async for line_no, row in iter_rows(stream, fmt):
+            if isinstance(row, Exception):
+                report.error(line_no, str(row))
+                continue
+            batch.append((line_no, row))
+            if len(batch) >= BULK_BATCH_SIZE:
+                await flush_batch()
+    except LineTooLongError as error:
+        # Остаток тела не читается; строки до длинной импортированы, как и при полном проходе
+        if batch:
+            await flush_batch()
+        error.report = report.to_dict()
+        raise
+
+    if batch:
+        await flush_batch()
+    return report.to_dict()
+
+
+async def export_users(store, chunk_size: int = BULK_BATCH_SIZE) -> AsyncIterator[bytes]:
+    # Фиксируем список id (дёшево) и читаем записи порциями: между порциями
+    # event loop обслуживает другие запросы, удалённые за это время записи пропускаются
+    user_ids = list(store.ids())
+    for start in range(0, len(user_ids), chunk_size):
+        lines = []
+        for user_id in user_ids[start:start + chunk_size]:
+            record = store.get(user_id)
+            if record is not None:
+                lines.append(json.dumps(record.to_dict(), ensure_ascii=False))
+        if lines:
+            yield ("\n".join(lines) + "\n").encode()
+        await asyncio.sleep(0)
@@ -1,11 +1,37 @@
 from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional
+from contextlib import asynccontextmanager
+from store import UserStore, DuplicateEmailError
+from persistence import UserJournal
+from bulk import import_users, export_users, LineTooLongError
+import os
 
-app = FastAPI(title="Simple FastAPI Demo", version="1.0")
+# Сохранность данных включается переменной USERS_DATA_DIR (каталог для журнала и снимков)
+USERS_DATA_DIR = os.getenv("USERS_DATA_DIR")
+USERS_FSYNC = os.getenv("USERS_FSYNC", "always")  # always, interval
+USERS_SNAPSHOT_EVERY = int(os.getenv("USERS_SNAPSHOT_EVERY", 100000))
+
+journal = UserJournal(USERS_DATA_DIR, USERS_FSYNC, snapshot_every=USERS_SNAPSHOT_EVERY) if USERS_DATA_DIR else None
+users_db = UserStore(journal)
+
+
+@asynccontextmanager
+async def lifespan(main: FastAPI):
+    if journal is not None:
+        print(f"Loaded {journal.load(users_db)} users from {USERS_DATA_DIR}")
+        await journal.start(users_db)
+    yield
+    # Shutdown
+    if journal is not None:
+        await journal.close()
+
+
+app = FastAPI(title="Simple FastAPI Demo", version="1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,9 +44,6 @@ app.add_middleware(
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
-users_db = []
-next_id = 1
-
 
 class User(BaseModel):
     id: Optional[int] = None
@@ -35,44 +58,61 @@ async def read_root(request: Request):
 
 @app.get("/users", response_model=List[User])
 async def get_all_users():
-    return users_db
+    return [user.to_dict() for user in users_db]
+
+
+# Массовые операции объявлены до /users/{user_id}, иначе путь перехватит он
+@app.post("/users/bulk")
+async def bulk_import_users(request: Request):
+    # NDJSON (по умолчанию) или CSV с заголовком name,email; тело читается потоком
+    content_type = request.headers.get("content-type", "")
+    fmt = "csv" if "csv" in content_type else "ndjson"
+    try:
+        return await import_users(request.stream(), fmt, users_db, User)
+    except LineTooLongError as error:
+        raise HTTPException(status_code=413, detail={"error": str(error), "line": error.line_no,
+                                                     "report": error.report})
+
+
+@app.get("/users/export")
+async def bulk_export_users():
+    return StreamingResponse(export_users(users_db), media_type="application/x-ndjson")
 
 
 @app.get("/users/{user_id}")
 async def get_user(user_id: int):
-    for user in users_db:
-        if user["id"] == user_id:
-            return user
-    raise HTTPException(status_code=404, detail="User not found")
+    user = users_db.get(user_id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user.to_dict()
 
 
 @app.post("/users")
 async def create_user(user: User):
-    global next_id
-    user_data = user.model_dump()
-    user_data["id"] = next_id
-    users_db.append(user_data)
-    next_id += 1
-    return user_data
+    try:
+        created = await users_db.create(user.name, user.email)
+    except DuplicateEmailError:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    return created.to_dict()
 
 
 @app.put("/users/{user_id}")
 async def update_user(user_id: int, updated_user: User):
-    for user in users_db:
-        if user["id"] == user_id:
-            user.update(updated_user.model_dump())
-            user["id"] = user_id
-            return user
-    raise HTTPException(status_code=404, detail="User not found")
+    try:
+        user = await users_db.update(user_id, updated_user.name, updated_user.email)
+    except DuplicateEmailError:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user.to_dict()
 
 
 @app.delete("/users/{user_id}")
 async def delete_user(user_id: int):
-    for i, user in enumerate(users_db):
-        if user["id"] == user_id:
-            deleted_user = users_db.pop(i)
-            return {"message": f"User {deleted_user['name']} deleted"}
-    raise HTTPException(status_code=404, detail="User not found")
+    deleted_user = await users_db.delete(user_id)
+    if deleted_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return {"message": f"User {deleted_user.name} deleted"}
 
 
 # uvicorn main:app --reload --host 0.0.0.0 --port 8000
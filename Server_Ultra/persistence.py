@@ -0,0 +1,291 @@
+import asyncio
+import logging
+import os
+import struct
+import zlib
+from typing import Callable, List, Optional, Tuple
+
+OP_CREATE = 1
+OP_UPDATE = 2
+OP_DELETE = 3
+
+# Запись журнала: crc32 | op | id | длина name | длина email, затем name и email в UTF-8
+LOG_RECORD = struct.Struct("<IBQHH")
+# Снимок: magic | версия формата | поколение журнала | next_id | число записей
+SNAPSHOT_HEADER = struct.Struct("<4sHQQQ")
+SNAPSHOT_RECORD = struct.Struct("<QHH")
+SNAPSHOT_MAGIC = b"USNP"
+SNAPSHOT_VERSION = 1
+
+SNAPSHOT_FILE = "users.snapshot"
+
+logger = logging.getLogger(__name__)
+
+
+def encode_log_record(op: int, user_id: int, name: str = "", email: str = "") -> bytes:
+    name_bytes, email_bytes = name.encode(), email.encode()
+    body = struct.pack("<BQHH", op, user_id, len(name_bytes), len(email_bytes)) + name_bytes + email_bytes
+    return struct.pack("<I", zlib.crc32(body)) + body
+
+
+def decode_log(data: bytes) -> Tuple[List[tuple], int]:
+    # Возвращает операции и длину корректной части: хвост после сбоя при записи отбрасывается
+    operations = []
+    offset = 0
+    while offset + LOG_RECORD.size <= len(data):
+        crc, op, user_id, name_len, email_len = LOG_RECORD.unpack_from(data, offset)
+        end = offset + LOG_RECORD.size + name_len + email_len
+        if end > len(data) or zlib.crc32(data[offset + 4:end]) != crc:
+            break
+        name_start = offset + LOG_RECORD.size
+        email_start = name_start + name_len
+        operations.append((op, user_id, data[name_start:email_start].decode(), data[email_start:end].decode()))
+        offset = end
+    return operations, offset
+
+
+class UserJournal:
+    # Журнал операций (append-only) + периодические бинарные снимки.
+    # fsync_mode="always": запрос ждёт fsync, но параллельные записи объединяются в один fsync;
+    # fsync_mode="interval": ответ сразу, fsync раз в flush_interval (можно потерять последние мс)
+    def __init__(self, data_dir: str, fsync_mode: str = "always", flush_interval: float = 0.01,
+                 snapshot_every: int = 100_000):
+        if fsync_mode not in ("always", "interval"):
+            raise ValueError(f"Unknown fsync mode: {fsync_mode}")
+        self.data_dir = data_dir
+        self.fsync_mode = fsync_mode
+        self.flush_interval = flush_interval
+        self.snapshot_every = snapshot_every
+
+        self.generation = 0
+        self._file = None
+        self._buffer: List[bytes] = []
+        self._waiters: List[asyncio.Future] = []
+        # Откат операции в памяти хранилища, если её запись в журнал не удалась
+        self._undo: List[Optional[Callable[[], None]]] = []
+        self._records_since_snapshot = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._io_lock: Optional[asyncio.Lock] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._snapshot_task: Optional[asyncio.Task] = None
+        self._store = None
+
+    def _log_path(self, generation: int) -> str:
+        return os.path.join(self.data_dir, f"users.{generation:08d}.log")
+
+    def _log_generations(self) -> List[int]:
+        generations = []
+        for filename in os.listdir(self.data_dir):
+            if filename.startswith("users.") and filename.endswith(".log"):
+                generations.append(int(filename[len("users."):-len(".log")]))
+        return sorted(generations)
+
+    # ЗАГРУЗКА ПРИ СТАРТЕ
+    def load(self, store) -> int:
+        os.makedirs(self.data_dir, exist_ok=True)
+        snapshot_generation = self._load_snapshot(store)
+
+        generations = [g for g in self._log_generations() if g > snapshot_generation]
+        for generation in generations:
+            path = self._log_path(generation)
+            with open(path, "rb") as log_file:
+                data = log_file.read()
+            operations, valid_length = decode_log(data)
+            for op, user_id, name, email in operations:
+                store.apply(op, user_id, name, email)
+            if valid_length < len(data):
+                # Недописанная запись после аварии - обрезаем, чтобы дописывать с корректного места
+                with open(path, "r+b") as log_file:
+                    log_file.truncate(valid_length)
+            self._records_since_snapshot += len(operations)
+
+        self.generation = generations[-1] if generations else snapshot_generation + 1
+        self._file = self._open_log(self.generation)
+        return len(store)
+
+    def _load_snapshot(self, store) -> int:
+        path = os.path.join(self.data_dir, SNAPSHOT_FILE)
+        if not os.path.exists(path):
+            return 0
+        with open(path, "rb") as snapshot_file:
+            data = snapshot_file.read()
+        magic, version, generation, next_id, count = SNAPSHOT_HEADER.unpack_from(data, 0)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot format in {path}")
+        if zlib.crc32(data[:-4]) != struct.unpack_from("<I", data, len(data) - 4)[0]:
+            raise ValueError(f"Snapshot {path} is corrupted")
+
+        offset = SNAPSHOT_HEADER.size
+        record_size = SNAPSHOT_RECORD.size
+        unpack = SNAPSHOT_RECORD.unpack_from
+        load_record = store.load_record
+        for _ in range(count):
+            user_id, name_len, email_len = unpack(data, offset)
+            offset += record_size
+            name = data[offset:offset + name_len].decode()
+            offset += name_len
+            email = data[offset:offset + email_len].decode()
+            offset += email_len
+            load_record(user_id, name, email)
+        store.set_next_id(next_id)
+        return generation
+
+    # ЗАПИСЬ
+    async def start(self, store):
+        self._store = store
+        self._wakeup = asyncio.Event()
+        self._io_lock = asyncio.Lock()
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    def _open_log(self, generation: int):
+        # Без буфера Python: после неудачной записи в файле нет недописанных данных в памяти
+        return open(self._log_path(generation), "ab", buffering=0)
+
+    def append(self, op: int, user_id: int, name: str = "", email: str = "",
+               undo: Optional[Callable[[], None]] = None) -> Optional[asyncio.Future]:
+        self._buffer.append(encode_log_record(op, user_id, name, email))
+        self._undo.append(undo)
+        self._wakeup.set()
+        if self.fsync_mode != "always":
+            return None
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        return waiter
+
+    async def _flush_loop(self):
+        while True:
+            if self.fsync_mode == "always":
+                await self._wakeup.wait()
+            else:
+                await asyncio.sleep(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as error:
+                # Ожидающие запросы уже получили ошибку; журнал пробует снова со следующей пачкой
+                logger.error(f"User journal write failed: {error}")
+
+    async def flush(self):
+        async with self._io_lock:
+            if not self._buffer:
+                return
+            records = len(self._buffer)
+            await self._write_batch(*self._take_batch())
+
+        self._records_since_snapshot += records
+        if self._records_since_snapshot >= self.snapshot_every and self._snapshot_task is None:
+            self._snapshot_task = asyncio.create_task(self.snapshot())
+
+    def _take_batch(self) -> tuple:
+        batch = b"".join(self._buffer), self._waiters, self._undo
+        self._buffer, self._waiters, self._undo = [], [], []
+        return batch
+
+    async def _write_batch(self, data: bytes, waiters: List[asyncio.Future], undo: list):
+        # Вызывается под _io_lock. write + fsync вне event loop; всё, что пришло
+        # за это время, уйдёт следующей пачкой
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write, self._file, data)
+        except Exception as error:
+            # На диске нет ни этой пачки, ни накопленного за время записи: память
+            # откатывается к состоянию журнала, более поздние операции - первыми.
+            # Откат синхронный и под _io_lock, снимок не увидит промежуточного состояния
+            _, later_waiters, later_undo = self._take_batch()
+            for callback in reversed(undo + later_undo):
+                if callback is not None:
+                    callback()
+            for waiter in waiters + later_waiters:
+                if not waiter.done():
+                    waiter.set_exception(error)
+            raise
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    @staticmethod
+    def _write(log_file, data: bytes):
+        offset = log_file.tell()
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[log_file.write(view):]
+            os.fsync(log_file.fileno())
+        except BaseException:
+            # Обрезаем частично записанную пачку, иначе следующие записи окажутся за
+            # повреждённой и при загрузке будут отброшены вместе с ней
+            try:
+                os.ftruncate(log_file.fileno(), offset)
+            except OSError as error:
+                logger.error(f"Cannot truncate user journal after failed write: {error}")
+            raise
+
+    # СНИМКИ
+    async def snapshot(self):
+        try:
+            store = self._store
+            loop = asyncio.get_running_loop()
+            async with store.lock:
+                async with self._io_lock:
+                    # Переключение на новый журнал и копия состояния - атомарно относительно
+                    # записей и откатов. Копия снимается в потоке: event loop продолжает
+                    # обслуживать чтения, изменения ждут store.lock
+                    await self._rotate()
+                    covered_generation = self.generation - 1
+                    next_id = store.next_id
+                    records = await loop.run_in_executor(None, store.dump)
+
+            await loop.run_in_executor(None, self._write_snapshot, records, next_id, covered_generation)
+            for generation in self._log_generations():
+                if generation <= covered_generation:
+                    os.remove(self._log_path(generation))
+        finally:
+            self._snapshot_task = None
+
+    async def _rotate(self):
+        # Вызывается под _io_lock: дописываем буфер в старый журнал и открываем новый
+        if self._buffer:
+            await self._write_batch(*self._take_batch())
+        self._file.close()
+        self.generation += 1
+        self._file = self._open_log(self.generation)
+        self._records_since_snapshot = 0
+
+    def _write_snapshot(self, records: List[tuple], next_id: int, generation: int):
+        chunks = [SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, generation, next_id, len(records))]
+        pack = SNAPSHOT_RECORD.pack
+        for user_id, name, email in records:
+            name_bytes, email_bytes = name.encode(), email.encode()
+            chunks.append(pack(user_id, len(name_bytes), len(email_bytes)))
+            chunks.append(name_bytes)
+            chunks.append(email_bytes)
+        data = b"".join(chunks)
+
+        path = os.path.join(self.data_dir, SNAPSHOT_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as snapshot_file:
+            snapshot_file.write(data)
+            snapshot_file.write(struct.pack("<I", zlib.crc32(data)))
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.replace(tmp_path, path)
+        if hasattr(os, "O_DIRECTORY"):
+            dir_fd = os.open(self.data_dir, os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    async def close(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+        if self._snapshot_task is not None:
+            await self._snapshot_task
+        await self.flush()
+        # Финальный снимок ускоряет следующий старт
+        if self._records_since_snapshot:
+            await self.snapshot()
+        self._file.close()
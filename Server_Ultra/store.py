@@ -0,0 +1,162 @@
+import asyncio
+from typing import Dict, Iterator, List, Optional, Tuple
+from persistence import OP_CREATE, OP_UPDATE, OP_DELETE
+
+
+class UserRecord:
+    # __slots__: без __dict__ на каждую запись, заметно меньше памяти на миллионах пользователей
+    __slots__ = ("id", "name", "email")
+
+    def __init__(self, user_id: int, name: str, email: str):
+        self.id = user_id
+        self.name = name
+        self.email = email
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "name": self.name, "email": self.email}
+
+
+class DuplicateEmailError(ValueError):
+    pass
+
+
+class UserStore:
+    def __init__(self, journal=None):
+        self._by_id: Dict[int, UserRecord] = {}
+        # Вторичный уникальный индекс по email
+        self._by_email: Dict[str, UserRecord] = {}
+        self.next_id = 1
+        self.lock = asyncio.Lock()
+        # Необязательный журнал для сохранности данных между перезапусками
+        self.journal = journal
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __iter__(self) -> Iterator[UserRecord]:
+        # dict хранит порядок вставки - пользователи идут по возрастанию id
+        return iter(self._by_id.values())
+
+    def ids(self) -> Iterator[int]:
+        return iter(self._by_id.keys())
+
+    def get(self, user_id: int) -> Optional[UserRecord]:
+        return self._by_id.get(user_id)
+
+    def get_by_email(self, email: str) -> Optional[UserRecord]:
+        return self._by_email.get(email)
+
+    def _log(self, op: int, user_id: int, name: str = "", email: str = "", undo=None):
+        if self.journal is None:
+            return None
+        return self.journal.append(op, user_id, name, email, undo)
+
+    # ОТКАТ: журнал вызывает их синхронно, если запись операции на диск не удалась,
+    # чтобы в памяти не осталось того, что пропадёт после перезапуска
+    def _undo_create(self, record: UserRecord):
+        if self._by_id.get(record.id) is record:
+            del self._by_id[record.id]
+        if self._by_email.get(record.email) is record:
+            del self._by_email[record.email]
+
+    def _undo_update(self, record: UserRecord, name: str, email: str):
+        if self._by_email.get(record.email) is record:
+            del self._by_email[record.email]
+        record.name, record.email = name, email
+        if record.id in self._by_id:
+            self._by_email[email] = record
+
+    def _undo_delete(self, record: UserRecord):
+        self._by_id[record.id] = record
+        self._by_email[record.email] = record
+
+    async def create(self, name: str, email: str) -> UserRecord:
+        async with self.lock:
+            if email in self._by_email:
+                raise DuplicateEmailError(email)
+            record = UserRecord(self.next_id, name, email)
+            self.next_id += 1
+            self._by_id[record.id] = record
+            self._by_email[email] = record
+            pending = self._log(OP_CREATE, record.id, name, email, lambda: self._undo_create(record))
+        # fsync ждём вне блокировки, чтобы параллельные записи попали в одну пачку
+        if pending is not None:
+            await pending
+        return record
+
+    async def create_many(self, users: List[Tuple[str, str]]) -> List[Optional[UserRecord]]:
+        # Пачка создаётся под одной блокировкой и подтверждается одним fsync;
+        # None на месте пользователя с уже занятым email
+        results = []
+        pending = None
+        async with self.lock:
+            for name, email in users:
+                if email in self._by_email:
+                    results.append(None)
+                    continue
+                record = UserRecord(self.next_id, name, email)
+                self.next_id += 1
+                self._by_id[record.id] = record
+                self._by_email[email] = record
+                pending = self._log(OP_CREATE, record.id, name, email,
+                                    lambda record=record: self._undo_create(record)) or pending
+                results.append(record)
+        # Пачка целиком попадает в буфер журнала до следующего сброса - достаточно ждать последнюю запись
+        if pending is not None:
+            await pending
+        return results
+
+    async def update(self, user_id: int, name: str, email: str) -> Optional[UserRecord]:
+        async with self.lock:
+            record = self._by_id.get(user_id)
+            if record is None:
+                return None
+            old_name, old_email = record.name, record.email
+            if email != record.email:
+                if email in self._by_email:
+                    raise DuplicateEmailError(email)
+                del self._by_email[record.email]
+                self._by_email[email] = record
+            record.name = name
+            record.email = email
+            pending = self._log(OP_UPDATE, user_id, name, email,
+                                lambda: self._undo_update(record, old_name, old_email))
+        if pending is not None:
+            await pending
+        return record
+
+    async def delete(self, user_id: int) -> Optional[UserRecord]:
+        async with self.lock:
+            record = self._by_id.pop(user_id, None)
+            if record is None:
+                return None
+            del self._by_email[record.email]
+            pending = self._log(OP_DELETE, user_id, undo=lambda: self._undo_delete(record))
+        if pending is not None:
+            await pending
+        return record
+
+    # ВОССТАНОВЛЕНИЕ: вызываются журналом при старте, без блокировки и без записи в журнал
+    def load_record(self, user_id: int, name: str, email: str):
+        record = UserRecord(user_id, name, email)
+        self._by_id[user_id] = record
+        self._by_email[email] = record
+
+    def set_next_id(self, next_id: int):
+        self.next_id = max(self.next_id, next_id)
+
+    def apply(self, op: int, user_id: int, name: str, email: str):
+        if op == OP_CREATE:
+            self.load_record(user_id, name, email)
+            self.set_next_id(user_id + 1)
+        elif op == OP_UPDATE:
+            record = self._by_id[user_id]
+            del self._by_email[record.email]
+            record.name, record.email = name, email
+            self._by_email[email] = record
+        elif op == OP_DELETE:
+            record = self._by_id.pop(user_id)
+            del self._by_email[record.email]
+
+    def dump(self) -> List[tuple]:
+        return [(record.id, record.name, record.email) for record in self._by_id.values()]
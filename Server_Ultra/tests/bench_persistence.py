@@ -0,0 +1,83 @@
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from persistence import UserJournal  # noqa: E402
+from store import UserStore  # noqa: E402
+
+WRITES = int(os.getenv("BENCH_WRITES", 20000))
+CONCURRENCY = int(os.getenv("BENCH_CONCURRENCY", 100))
+RECOVERY_USERS = int(os.getenv("BENCH_RECOVERY_USERS", 1000000))
+# Снимки в тесте записи не делаем, чтобы мерить только журнал
+NO_SNAPSHOTS = 10 ** 12
+
+
+async def write_throughput(name: str, fsync_mode=None):
+    data_dir = tempfile.mkdtemp(prefix="users_bench_")
+    journal = UserJournal(data_dir, fsync_mode, snapshot_every=NO_SNAPSHOTS) if fsync_mode else None
+    store = UserStore(journal)
+    if journal is not None:
+        journal.load(store)
+        await journal.start(store)
+
+    counter = iter(range(WRITES))
+
+    async def client():
+        for i in counter:
+            await store.create(f"User {i}", f"user{i}@example.com")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(CONCURRENCY)))
+    if journal is not None:
+        await journal.flush()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<24} {WRITES / elapsed:>10.0f} writes/s")
+
+    if journal is not None:
+        journal.snapshot_every = NO_SNAPSHOTS
+        await journal.close()
+    shutil.rmtree(data_dir)
+
+
+async def recovery_time():
+    data_dir = tempfile.mkdtemp(prefix="users_bench_")
+
+    journal = UserJournal(data_dir, "interval", snapshot_every=NO_SNAPSHOTS)
+    store = UserStore(journal)
+    journal.load(store)
+    await journal.start(store)
+    for i in range(RECOVERY_USERS):
+        store.load_record(i + 1, f"User {i}", f"user{i}@example.com")
+    store.set_next_id(RECOVERY_USERS + 1)
+    await journal.snapshot()
+    # Хвост журнала поверх снимка: 10% операций после последнего снимка
+    for i in range(RECOVERY_USERS // 10):
+        await store.update(i + 1, f"Renamed {i}", f"renamed{i}@example.com")
+    await journal.flush()
+    journal._flusher.cancel()
+    journal._file.close()
+
+    start = time.perf_counter()
+    restored = UserStore(UserJournal(data_dir))
+    restored.journal.load(restored)
+    elapsed = time.perf_counter() - start
+    restored.journal._file.close()
+    print(f"Recovered {len(restored)} users (snapshot + {RECOVERY_USERS // 10} log records) in {elapsed:.2f}s")
+    shutil.rmtree(data_dir)
+
+
+async def main():
+    print(f"Write throughput: {WRITES} creates, {CONCURRENCY} concurrent clients")
+    await write_throughput("memory only")
+    await write_throughput("journal, fsync interval", "interval")
+    await write_throughput("journal, fsync always", "always")
+    await recovery_time()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
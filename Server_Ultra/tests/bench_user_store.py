@@ -0,0 +1,66 @@
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from store import UserStore  # noqa: E402
+
+SIZES = [int(size) for size in os.getenv("BENCH_USER_SIZES", "1000,100000,1000000").split(",")]
+OPERATIONS = 10000
+
+
+def per_op_us(start: float) -> float:
+    return (time.perf_counter() - start) / OPERATIONS * 1_000_000
+
+
+def list_scan_get(users: list, user_id: int):
+    # Старая реализация: линейный поиск по списку словарей
+    for user in users:
+        if user["id"] == user_id:
+            return user
+
+
+async def bench(size: int):
+    store = UserStore()
+    for i in range(size):
+        await store.create(f"User {i}", f"user{i}@example.com")
+    ids = [random.randint(1, size) for _ in range(OPERATIONS)]
+
+    start = time.perf_counter()
+    for user_id in ids:
+        store.get(user_id)
+    get_us = per_op_us(start)
+
+    start = time.perf_counter()
+    for user_id in ids:
+        await store.update(user_id, "Renamed", f"user{user_id - 1}@example.com")
+    update_us = per_op_us(start)
+
+    start = time.perf_counter()
+    for user_id in set(ids):
+        await store.delete(user_id)
+    delete_us = (time.perf_counter() - start) / len(set(ids)) * 1_000_000
+
+    # Для сравнения - линейный поиск, только на небольшой выборке
+    users_list = [{"id": i, "name": "", "email": ""} for i in range(1, size + 1)]
+    sample = ids[:100]
+    start = time.perf_counter()
+    for user_id in sample:
+        list_scan_get(users_list, user_id)
+    scan_us = (time.perf_counter() - start) / len(sample) * 1_000_000
+
+    print(f"{size:>10} {get_us:>10.2f} {update_us:>10.2f} {delete_us:>10.2f} {scan_us:>14.1f}")
+
+
+async def main():
+    print("Per-operation latency, microseconds")
+    print(f"{'users':>10} {'get':>10} {'update':>10} {'delete':>10} {'list scan get':>14}")
+    for size in SIZES:
+        await bench(size)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
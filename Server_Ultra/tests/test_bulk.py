@@ -0,0 +1,79 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import BaseModel  # noqa: E402
+
+from bulk import BULK_MAX_LINE_BYTES, LineTooLongError, import_users, iter_lines  # noqa: E402
+from store import UserStore  # noqa: E402
+
+CHUNK = 64 * 1024
+
+
+class User(BaseModel):
+    name: str
+    email: str
+
+
+async def chunks(body: bytes):
+    for start in range(0, len(body), CHUNK):
+        yield body[start:start + CHUNK]
+
+
+def test_body_without_newlines_is_not_buffered():
+    sent = 0
+
+    async def endless():
+        # Тело без единого перевода строки: читать его до конца нельзя
+        nonlocal sent
+        while True:
+            sent += CHUNK
+            yield b"x" * CHUNK
+
+    async def run():
+        async for _ in iter_lines(endless()):
+            raise AssertionError("No complete line expected")
+
+    try:
+        asyncio.run(run())
+    except LineTooLongError as error:
+        assert error.line_no == 1
+    else:
+        raise AssertionError("Overlong line was accepted")
+    assert sent <= BULK_MAX_LINE_BYTES + 2 * CHUNK
+
+
+def test_long_line_stops_import_after_earlier_rows():
+    body = (b'{"name": "A", "email": "a@example.com"}\n'
+            b'{"name": "B", "email": "b@example.com"}\n'
+            + b'{"name": "' + b"x" * BULK_MAX_LINE_BYTES + b'"}\n'
+            + b'{"name": "C", "email": "c@example.com"}\n')
+    store = UserStore()
+
+    try:
+        asyncio.run(import_users(chunks(body), "ndjson", store, User))
+    except LineTooLongError as error:
+        assert error.line_no == 3
+        assert error.report["created"] == 2
+    else:
+        raise AssertionError("Overlong line was accepted")
+    assert store.get_by_email("b@example.com") is not None
+    assert store.get_by_email("c@example.com") is None
+
+
+def test_lines_up_to_limit_are_accepted():
+    line = b"y" * BULK_MAX_LINE_BYTES + b"\n"
+
+    async def run():
+        return [raw async for _, raw in iter_lines(chunks(line + b"tail"))]
+
+    assert asyncio.run(run()) == [line, b"tail"]
+
+
+if __name__ == "__main__":
+    for test in (test_body_without_newlines_is_not_buffered, test_long_line_stops_import_after_earlier_rows,
+                 test_lines_up_to_limit_are_accepted):
+        test()
+        print(f"{test.__name__}: ok")
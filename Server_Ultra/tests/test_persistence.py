@@ -0,0 +1,201 @@
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from persistence import UserJournal, LOG_RECORD, SNAPSHOT_FILE, encode_log_record, OP_CREATE  # noqa: E402
+from store import UserStore  # noqa: E402
+
+# Снимки только по явному вызову, если тест не проверяет ротацию
+NO_SNAPSHOTS = 10 ** 12
+
+
+async def open_store(data_dir: str, snapshot_every: int = NO_SNAPSHOTS):
+    journal = UserJournal(data_dir, "always", snapshot_every=snapshot_every)
+    store = UserStore(journal)
+    journal.load(store)
+    await journal.start(store)
+    return store, journal
+
+
+async def crash(journal: UserJournal):
+    # Остановка без close(): ни финального снимка, ни дозаписи - как при падении процесса
+    journal._flusher.cancel()
+    try:
+        await journal._flusher
+    except asyncio.CancelledError:
+        pass
+    if journal._snapshot_task is not None:
+        await journal._snapshot_task
+    journal._file.close()
+
+
+def reload(data_dir: str) -> UserStore:
+    store = UserStore(UserJournal(data_dir))
+    store.journal.load(store)
+    store.journal._file.close()
+    return store
+
+
+def state(store: UserStore) -> list:
+    return sorted(store.dump())
+
+
+def log_path(data_dir: str) -> str:
+    logs = sorted(name for name in os.listdir(data_dir) if name.endswith(".log"))
+    return os.path.join(data_dir, logs[-1])
+
+
+def with_data_dir(test):
+    def run():
+        data_dir = tempfile.mkdtemp(prefix="users_test_")
+        try:
+            asyncio.run(test(data_dir))
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    run.__name__ = test.__name__
+    return run
+
+
+@with_data_dir
+async def test_torn_tail_is_truncated(data_dir):
+    store, journal = await open_store(data_dir)
+    for i in range(10):
+        await store.create(f"User {i}", f"user{i}@example.com")
+    expected = state(store)
+    await crash(journal)
+
+    # Запись оборвалась посередине: заголовок и часть тела
+    path = log_path(data_dir)
+    valid_size = os.path.getsize(path)
+    with open(path, "ab") as log_file:
+        log_file.write(encode_log_record(OP_CREATE, 11, "Torn", "torn@example.com")[:LOG_RECORD.size + 2])
+
+    store, journal = await open_store(data_dir)
+    assert state(store) == expected
+    assert os.path.getsize(path) == valid_size
+
+    # После обрезки новые записи дописываются с корректного места и переживают перезапуск
+    await store.create("After", "after@example.com")
+    expected = state(store)
+    await crash(journal)
+    assert state(reload(data_dir)) == expected
+
+
+@with_data_dir
+async def test_crc_mismatch_drops_record_and_tail(data_dir):
+    store, journal = await open_store(data_dir)
+    for i in range(5):
+        await store.create(f"User {i}", f"user{i}@example.com")
+    expected = state(store)[:-1]
+    await crash(journal)
+
+    # Портим байт в email последней записи: длины целы, не сходится только CRC
+    path = log_path(data_dir)
+    valid_size = os.path.getsize(path) - len(encode_log_record(OP_CREATE, 5, "User 4", "user4@example.com"))
+    with open(path, "r+b") as log_file:
+        log_file.seek(-1, os.SEEK_END)
+        last = log_file.read(1)
+        log_file.seek(-1, os.SEEK_END)
+        log_file.write(bytes([last[0] ^ 0xFF]))
+
+    recovered = reload(data_dir)
+    assert state(recovered) == expected
+    assert recovered.get_by_email("user4@example.com") is None
+    assert os.path.getsize(path) == valid_size
+
+
+@with_data_dir
+async def test_generation_rotation(data_dir):
+    store, journal = await open_store(data_dir, snapshot_every=50)
+    for i in range(120):
+        await store.create(f"User {i}", f"user{i}@example.com")
+    # Снимок пишется в фоне после сброса пачки
+    while journal._snapshot_task is not None:
+        await asyncio.sleep(0.01)
+    expected = state(store)
+    generation = journal.generation
+    await crash(journal)
+
+    logs = sorted(name for name in os.listdir(data_dir) if name.endswith(".log"))
+    assert generation > 1
+    assert SNAPSHOT_FILE in os.listdir(data_dir)
+    # Журналы, покрытые снимком, удалены; остаётся текущее поколение
+    assert logs == [f"users.{generation:08d}.log"]
+    assert state(reload(data_dir)) == expected
+
+
+@with_data_dir
+async def test_snapshot_plus_log_replay(data_dir):
+    store, journal = await open_store(data_dir)
+    users = [await store.create(f"User {i}", f"user{i}@example.com") for i in range(20)]
+    await journal.snapshot()
+
+    # Изменения после снимка есть только в журнале
+    await store.update(users[0].id, "Renamed", "renamed@example.com")
+    await store.delete(users[1].id)
+    await store.create("Late", "late@example.com")
+    expected, next_id = state(store), store.next_id
+    await crash(journal)
+
+    recovered = reload(data_dir)
+    assert state(recovered) == expected
+    assert recovered.next_id == next_id
+    assert recovered.get_by_email("renamed@example.com").id == users[0].id
+    assert recovered.get_by_email("user0@example.com") is None
+    assert recovered.get(users[1].id) is None
+
+    # Испорченный снимок не загружается молча
+    with open(os.path.join(data_dir, SNAPSHOT_FILE), "r+b") as snapshot_file:
+        snapshot_file.seek(-8, os.SEEK_END)
+        snapshot_file.write(b"\x00\x00\x00\x00")
+    try:
+        reload(data_dir)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("Corrupted snapshot was loaded")
+
+
+@with_data_dir
+async def test_failed_write_rolls_back_memory(data_dir):
+    store, journal = await open_store(data_dir)
+    user = await store.create("Kept", "kept@example.com")
+
+    class FailingFile:
+        # Часть пачки успевает попасть в файл, затем ошибка ввода-вывода
+        def __init__(self, log_file):
+            self.log_file = log_file
+
+        def __getattr__(self, name):
+            return getattr(self.log_file, name)
+
+        def write(self, data):
+            self.log_file.write(bytes(data[:LOG_RECORD.size]))
+            raise OSError(5, "Input/output error")
+
+    journal._file = FailingFile(journal._file)
+    results = await asyncio.gather(
+        store.create("Lost", "lost@example.com"),
+        store.update(user.id, "Changed", "changed@example.com"),
+        return_exceptions=True
+    )
+    assert all(isinstance(result, OSError) for result in results)
+    assert state(store) == [(user.id, "Kept", "kept@example.com")]
+    assert store.get_by_email("lost@example.com") is None
+
+    journal._file = journal._file.log_file
+    await store.create("Next", "next@example.com")
+    expected = state(store)
+    await crash(journal)
+    assert state(reload(data_dir)) == expected
+
+
+if __name__ == "__main__":
+    for test in (test_torn_tail_is_truncated, test_crc_mismatch_drops_record_and_tail, test_generation_rotation,
+                 test_snapshot_plus_log_replay, test_failed_write_rolls_back_memory):
+        test()
+        print(f"{test.__name__}: ok")